@@ -57,7 +57,7 @@ from edb.common import verutils
 # The merge conflict there is a nice reminder that you probably need
 # to write a patch in edb/pgsql/patches.py, and then you should preserve
 # the old value.
-EDGEDB_CATALOG_VERSION = 2025_11_03_00_00
+EDGEDB_CATALOG_VERSION = 2026_10_15_03_00
 EDGEDB_MAJOR_VERSION = 8
 
 
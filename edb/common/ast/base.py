@@ -219,6 +219,14 @@ class AST:
             (k, v.factory) for k, v in fields.items()
             if v.factory and not isinstance(getattr(cls, k, None), property)
         )
+        # Fields are copied by writing directly into the __dict__ of the
+        # copy, except for the ones shadowed by properties.
+        cls._property_fields = tuple(
+            k for k in fields if isinstance(getattr(cls, k, None), property)
+        )
+        cls._plain_fields = tuple(
+            k for k in fields if k not in cls._property_fields
+        )
 
         # Push the default values down in the MRO
         for k, v in cls._fields.items():
@@ -254,7 +262,15 @@ class AST:
 
     def __copy__(self):
         copied = self._init_copy()
-        for field, value in iter_fields(self, include_meta=True):
+        dct = copied.__dict__
+        for field in self._plain_fields:
+            value = getattr(self, field, _marker)
+            if value is not _marker:
+                dct[field] = value
+        for field in self._property_fields:
+            value = getattr(self, field, _marker)
+            if value is _marker:
+                continue
             try:
                 object.__setattr__(copied, field, value)
             except AttributeError:
@@ -264,8 +280,16 @@ class AST:
 
     def __deepcopy__(self, memo):
         copied = self._init_copy()
-        for field, value in iter_fields(self, include_meta=True):
-            object.__setattr__(copied, field, copy.deepcopy(value, memo))
+        dct = copied.__dict__
+        for field in self._plain_fields:
+            value = getattr(self, field, _marker)
+            if value is not _marker:
+                dct[field] = _deepcopy_value(value, memo)
+        for field in self._property_fields:
+            value = getattr(self, field, _marker)
+            if value is not _marker:
+                object.__setattr__(
+                    copied, field, _deepcopy_value(value, memo))
         return copied
 
     def _init_copy(self):
@@ -357,6 +381,34 @@ def is_ast_node(obj):
 
 _marker = object()
 
+# Field values that copy.deepcopy() would return as is.
+_ATOMIC_TYPES = frozenset({
+    type(None), bool, int, float, complex, str, bytes, type,
+})
+
+
+def _deepcopy_value(value, memo):
+    if type(value) in _ATOMIC_TYPES:
+        return value
+    elif isinstance(value, AST):
+        copied = memo.get(id(value), _marker)
+        if copied is _marker:
+            copied = value.__deepcopy__(memo)
+            memo[id(value)] = copied
+        return copied
+    elif type(value) is list:
+        # Most of the containers in the trees are lists of nodes, which
+        # are copied without going through the generic copy machinery.
+        # Sharing is preserved the same way copy.deepcopy() does it.
+        copied = memo.get(id(value), _marker)
+        if copied is _marker:
+            copied = []
+            memo[id(value)] = copied
+            copied.extend(_deepcopy_value(el, memo) for el in value)
+        return copied
+    else:
+        return copy.deepcopy(value, memo)
+
 
 def iter_fields(node, *, include_meta=True, exclude_unset=False):
     exclude_meta = not include_meta
@@ -164,6 +164,10 @@ class flags(metaclass=FlagsMeta):
     log_metrics = Flag(
         doc="Log verbose statistics on connections and compiler behavior.")
 
+    compile_allocations = Flag(
+        doc="Count the memory blocks allocated in every compiler phase "
+            "(slows down compilation in large processes).")
+
     disable_docs_edgeql_validation = Flag(
         doc="Disable validation of edgeql in docs (for site build)")
 
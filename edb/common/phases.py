@@ -0,0 +1,115 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Lightweight profiling of the phases of a long operation.
+
+Code marks its phases with the :func:`phase` context manager, which is
+almost free unless a :func:`collect` block is active in the current
+context::
+
+    with phases.collect() as timings:
+        with phases.phase('parse'):
+            ...
+        with phases.phase('compile'):
+            ...
+
+    timings.summary()  # {'parse': (0.012, None), 'compile': ...}
+
+For every phase, the time spent is recorded.  With
+``collect(count_allocations=True)``, the number of memory blocks allocated
+(and not freed yet) is recorded too; this is off by default, as counting
+the blocks walks the whole heap and gets slower as the heap grows.  Phases
+can be nested, in which case the time and allocations of the inner phases
+are not counted in the outer ones.
+"""
+
+from __future__ import annotations
+from typing import Iterator, Optional
+
+import contextlib
+import contextvars
+import sys
+import time
+
+
+class PhaseTimings:
+
+    __slots__ = ('durations', 'allocations', 'count_allocations', '_stack')
+
+    durations: dict[str, float]
+    allocations: dict[str, int]
+    count_allocations: bool
+    # [name, started_at, blocks_at_start, nested_duration, nested_blocks]
+    _stack: list[list]
+
+    def __init__(self, *, count_allocations: bool = False) -> None:
+        self.durations = {}
+        self.allocations = {}
+        self.count_allocations = count_allocations
+        self._stack = []
+
+    def summary(self) -> dict[str, tuple[float, Optional[int]]]:
+        return {
+            name: (duration, self.allocations.get(name))
+            for name, duration in self.durations.items()
+        }
+
+
+_current: contextvars.ContextVar[Optional[PhaseTimings]] = (
+    contextvars.ContextVar('phase_timings', default=None)
+)
+
+
+@contextlib.contextmanager
+def collect(*, count_allocations: bool = False) -> Iterator[PhaseTimings]:
+    timings = PhaseTimings(count_allocations=count_allocations)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+
+    stack = timings._stack
+    count_allocations = timings.count_allocations
+    blocks_at_start = sys.getallocatedblocks() if count_allocations else 0
+    frame = [name, time.perf_counter(), blocks_at_start, 0.0, 0]
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        duration = time.perf_counter() - frame[1]
+        timings.durations[name] = (
+            timings.durations.get(name, 0.0) + duration - frame[3])
+        blocks = 0
+        if count_allocations:
+            blocks = sys.getallocatedblocks() - frame[2]
+            timings.allocations[name] = (
+                timings.allocations.get(name, 0) + blocks - frame[4])
+        if stack:
+            parent = stack[-1]
+            parent[3] += duration
+            parent[4] += blocks
@@ -54,6 +54,7 @@ from edb.edgeql import ast as qlast
 
 from edb.common.ast import visitor as ast_visitor
 from edb.common import ordered
+from edb.common import phases
 from edb.common.typeutils import not_none
 
 from . import astutils
@@ -232,18 +233,19 @@ def fini_expression(
     # The inference context object will be shared between
     # cardinality and multiplicity inferrers.
     inf_ctx = inference.make_ctx(env=ctx.env)
-    cardinality = inference.infer_cardinality(
-        ir, scope_tree=ctx.path_scope, ctx=inf_ctx
-    )
-    multiplicity = inference.infer_multiplicity(
-        ir, scope_tree=ctx.path_scope, ctx=inf_ctx
-    )
+    with phases.phase('inference'):
+        cardinality = inference.infer_cardinality(
+            ir, scope_tree=ctx.path_scope, ctx=inf_ctx
+        )
+        multiplicity = inference.infer_multiplicity(
+            ir, scope_tree=ctx.path_scope, ctx=inf_ctx
+        )
 
-    for extra in extra_exprs:
-        inference.infer_cardinality(
-            extra, scope_tree=ctx.path_scope, ctx=inf_ctx)
-        inference.infer_multiplicity(
-            extra, scope_tree=ctx.path_scope, ctx=inf_ctx)
+        for extra in extra_exprs:
+            inference.infer_cardinality(
+                extra, scope_tree=ctx.path_scope, ctx=inf_ctx)
+            inference.infer_multiplicity(
+                extra, scope_tree=ctx.path_scope, ctx=inf_ctx)
 
     # Fix up weak namespaces
     _rewrite_weak_namespaces(all_exprs, ctx)
@@ -275,7 +277,8 @@ def fini_expression(
 
         return ir.expr
 
-    volatility = inference.infer_volatility(ir, env=ctx.env)
+    with phases.phase('inference'):
+        volatility = inference.infer_volatility(ir, env=ctx.env)
     expr_type = setgen.get_set_type(ir, ctx=ctx)
 
     in_polymorphic_func = (
@@ -68,7 +68,7 @@ class PathId:
     """
 
     __slots__ = ('_path', '_norm_path', '_namespace', '_prefix',
-                 '_is_ptr', '_is_linkprop', '_hash')
+                 '_is_ptr', '_is_linkprop', '_hash', '_derived')
 
     #: Actual path information.
     _path: tuple[
@@ -98,6 +98,11 @@ class PathId:
     #: True if this PathId represents a link property path.
     _is_linkprop: bool
 
+    #: PathIds derived from this one (prefixes, extensions, namespace
+    #: changes), memoized so that repeated derivations return the same
+    #: object.  Not pickled.
+    _derived: Optional[dict[Any, Any]]
+
     def __init__(
         self,
         initializer: Optional[PathId] = None,
@@ -126,18 +131,32 @@ class PathId:
             self._is_linkprop = False
 
         self._hash = -1
+        self._derived = None
 
     def __getstate__(self) -> Any:
         # We need to omit the cached _hash when we pickle because it won't
         # be correct in a different process.
         return tuple([
             getattr(self, k) if k != '_hash' else -1
-            for k in PathId.__slots__
+            for k in _PICKLED_SLOTS
         ])
 
     def __setstate__(self, state: Any) -> None:
-        for k, v in zip(PathId.__slots__, state):
+        for k, v in zip(_PICKLED_SLOTS, state):
             setattr(self, k, v)
+        self._derived = None
+
+    def _get_derived(self, key: Any) -> Any:
+        if self._derived is None:
+            self._derived = {}
+            return None
+        else:
+            return self._derived.get(key)
+
+    def _set_derived(self, key: Any, path_id: Any) -> Any:
+        assert self._derived is not None
+        self._derived[key] = path_id
+        return path_id
 
     @classmethod
     def from_type(
@@ -307,8 +326,17 @@ class PathId:
         return self._hash
 
     def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
         if not isinstance(other, PathId):
             return NotImplemented
+        if (
+            self._hash != -1
+            and other._hash != -1
+            and self._hash != other._hash
+            and self.__class__ is other.__class__
+        ):
+            return False
 
         return (
             self._norm_path == other._norm_path and
@@ -317,6 +345,17 @@ class PathId:
             self._is_ptr == other._is_ptr
         )
 
+    def namespace_free_hash(self) -> int:
+        """Return a hash of this ``PathId`` that ignores the namespaces.
+
+        PathIds that are equal once their namespaces are stripped
+        have the same namespace-free hash.
+        """
+        if (cached := self._get_derived('namespace_free_hash')) is not None:
+            return cached
+        return self._set_derived(
+            'namespace_free_hash', hash((self._norm_path, self._is_ptr)))
+
     def __len__(self) -> int:
         return len(self._path)
 
@@ -363,6 +402,11 @@ class PathId:
         if not self:
             raise ValueError('cannot extend empty PathId')
 
+        key = ('extend', id(ptrref), direction, frozenset(ns))
+        cached = self._get_derived(key)
+        if cached is not None and cached[0] is ptrref:
+            return cached[1]
+
         if direction is s_pointers.PointerDirection.Outbound:
             target_ref = ptrref.out_target
         else:
@@ -399,6 +443,8 @@ class PathId:
         else:
             result._prefix = self._prefix
 
+        # Keep the ptrref alive for as long as its id is used in the key.
+        self._set_derived(key, (ptrref, result))
         return result
 
     def replace_namespace(
@@ -407,14 +453,19 @@ class PathId:
     ) -> PathId:
         """Return a copy of this ``PathId`` with namespace set to *namespace*.
         """
+        namespace = frozenset(namespace)
+        key = ('replace_namespace', namespace)
+        if (cached := self._get_derived(key)) is not None:
+            return cached
+
         result = self.__class__(self)
-        result._namespace = frozenset(namespace)
+        result._namespace = namespace
 
         if result._prefix is not None:
             result._prefix = result._get_minimal_prefix(
                 result._prefix.replace_namespace(namespace))
 
-        return result
+        return self._set_derived(key, result)
 
     def merge_namespace(
         self,
@@ -428,6 +479,10 @@ class PathId:
         new_namespace = self._namespace | frozenset(namespace)
 
         if new_namespace != self._namespace or deep:
+            key = ('merge_namespace', new_namespace, deep)
+            if (cached := self._get_derived(key)) is not None:
+                return cached
+
             result = self.__class__(self)
             result._namespace = new_namespace
             if deep and result._prefix is not None:
@@ -435,7 +490,7 @@ class PathId:
             if result._prefix is not None:
                 result._prefix = result._get_minimal_prefix(result._prefix)
 
-            return result
+            return self._set_derived(key, result)
 
         else:
             return self
@@ -444,14 +499,20 @@ class PathId:
         """Return a copy of this ``PathId`` with a given portion of the
            namespace id removed."""
         if self._namespace and namespace:
-            stripped_ns = self._namespace - set(namespace)
-            result = self.replace_namespace(stripped_ns)
+            namespace = frozenset(namespace)
+            key = ('strip_namespace', namespace)
+            if (cached := self._get_derived(key)) is not None:
+                return cached
+
+            stripped_ns = self._namespace - namespace
+            # Copy, as the result of replace_namespace() is memoized.
+            result = self.__class__(self.replace_namespace(stripped_ns))
 
             if result._prefix is not None:
                 result._prefix = result._get_minimal_prefix(
                     result._prefix.strip_namespace(namespace))
 
-            return result
+            return self._set_derived(key, result)
         else:
             return self
 
@@ -608,9 +669,11 @@ class PathId:
         if self._is_ptr:
             return self
         else:
+            if (cached := self._get_derived('ptr_path')) is not None:
+                return cached
             result = self.__class__(self)
             result._is_ptr = True
-            return result
+            return self._set_derived('ptr_path', result)
 
     def tgt_path(self) -> PathId:
         """If this is a pointer prefix, return the ``PathId`` representing
@@ -621,9 +684,11 @@ class PathId:
         if not self._is_ptr:
             return self
         else:
+            if (cached := self._get_derived('tgt_path')) is not None:
+                return cached
             result = self.__class__(self)
             result._is_ptr = False
-            return result
+            return self._set_derived('tgt_path', result)
 
     def iter_prefixes(self, include_ptr: bool = False) -> Iterator[PathId]:
         """Return an iterator over all prefixes of this ``PathId``.
@@ -635,21 +700,29 @@ class PathId:
            If *include_ptr* is ``True``, then pointer prefixes for each
            step are also included.
         """
+        key = ('iter_prefixes', include_ptr)
+        if (cached := self._get_derived(key)) is not None:
+            return iter(cached)
+
+        prefixes: list[PathId] = []
         if self._prefix is not None:
-            yield from self._prefix.iter_prefixes(include_ptr=include_ptr)
+            prefixes.extend(
+                self._prefix.iter_prefixes(include_ptr=include_ptr))
             start = len(self._prefix)
         else:
-            yield self._get_prefix(1)
+            prefixes.append(self._get_prefix(1))
             start = 1
 
         for i in range(start, len(self._path) - 1, 2):
             path_id = self._get_prefix(i + 2)
             if path_id.is_ptr_path():
-                yield path_id.tgt_path()
+                prefixes.append(path_id.tgt_path())
                 if include_ptr:
-                    yield path_id
+                    prefixes.append(path_id)
             else:
-                yield path_id
+                prefixes.append(path_id)
+
+        return iter(self._set_derived(key, tuple(prefixes)))
 
     def startswith(
         self, path_id: PathId, permissive_ptr_path: bool = False
@@ -764,6 +837,10 @@ class PathId:
             elif prefix_len > size:
                 return self._prefix._get_prefix(size)
 
+        key = ('prefix', size)
+        if (cached := self._get_derived(key)) is not None:
+            return cached
+
         result = self.__class__()
         result._path = self._path[0:size]
         result._norm_path = self._norm_path[0:size]
@@ -776,7 +853,7 @@ class PathId:
             # A link property ref has been chopped off.
             result._is_ptr = True
 
-        return result
+        return self._set_derived(key, result)
 
     def _get_minimal_prefix(
         self,
@@ -789,3 +866,6 @@ class PathId:
                 break
 
         return prefix
+
+
+_PICKLED_SLOTS = tuple(k for k in PathId.__slots__ if k != '_derived')
@@ -73,9 +73,6 @@ class ScopeTreeNode:
     unique_id: Optional[int]
     """A unique identifier used to map scopes on sets."""
 
-    path_id: Optional[pathid.PathId]
-    """Node path id, or None for branch nodes."""
-
     fenced: bool
     """Whether the subtree represents a SET OF argument."""
 
@@ -106,6 +103,13 @@ class ScopeTreeNode:
     implement "semi-detached" semantics used by
     aliases declared in a WITH block."""
 
+    _path_keys: dict[int, int]
+    """The number of path nodes in this subtree (including self) by the
+    namespace-free hash of their path ids.
+
+    Kept up to date as the tree is modified, and used to skip subtrees
+    that can't contain a given path when searching the tree."""
+
     def __init__(
         self,
         *,
@@ -114,6 +118,9 @@ class ScopeTreeNode:
         unique_id: Optional[int]=None,
         optional: bool=False,
     ) -> None:
+        self._parent: Optional[weakref.ReferenceType[ScopeTreeNode]] = None
+        self._path_keys = {}
+        self._path_id: Optional[pathid.PathId] = None
         self.unique_id = unique_id
         self.path_id = path_id
         self.fenced = fenced
@@ -124,7 +131,6 @@ class ScopeTreeNode:
         self.children = []
         self.namespaces = set()
         self.is_group = False
-        self._parent: Optional[weakref.ReferenceType[ScopeTreeNode]] = None
 
     FIELDS = (
         'unique_id', 'path_id', 'fenced', 'unnest_fence', 'factoring_fence',
@@ -135,14 +141,41 @@ class ScopeTreeNode:
     def __getstate__(self) -> Any:
         res = self.__dict__.copy()
         del res['_parent']
+        del res['_path_keys']
+        res['path_id'] = res.pop('_path_id')
         return res
 
     def __setstate__(self, state: Any) -> None:
+        self._parent = None
+        self._path_keys = {}
+        self._path_id = None
         for f, val in state.items():
             setattr(self, f, val)
-        self._parent = None
         for child in self.children:
             child._parent = weakref.ref(self)
+            _add_path_keys(self._path_keys, child._path_keys, 1)
+
+    @property
+    def path_id(self) -> Optional[pathid.PathId]:
+        """Node path id, or None for branch nodes."""
+        return self._path_id
+
+    @path_id.setter
+    def path_id(self, path_id: Optional[pathid.PathId]) -> None:
+        old_key = _path_key(self._path_id)
+        new_key = _path_key(path_id)
+        self._path_id = path_id
+        if old_key != new_key:
+            for node in self.ancestors:
+                if old_key is not None:
+                    _add_path_keys(node._path_keys, {old_key: 1}, -1)
+                if new_key is not None:
+                    _add_path_keys(node._path_keys, {new_key: 1}, 1)
+
+    def may_contain(self, path_id: pathid.PathId) -> bool:
+        """Return False if no node of this subtree (including self) can
+        match *path_id*, regardless of the namespaces."""
+        return path_id.namespace_free_hash() in self._path_keys
 
     def __repr__(self) -> str:
         name = 'ScopeFenceNode' if self.fenced else 'ScopeTreeNode'
@@ -274,6 +307,7 @@ class ScopeTreeNode:
         unfenced_only: bool=False,
         strict: bool=False,
         skip: Optional[ScopeTreeNode]=None,
+        path_id: Optional[pathid.PathId]=None,
     ) -> Iterator[
         tuple[
             ScopeTreeNode,
@@ -293,6 +327,9 @@ class ScopeTreeNode:
                 is useful for avoiding performance pathologies when
                 repeatedly searching descendants while climbing the
                 tree (see find_factorable_nodes).
+            path_id:
+                If specified, skip the subtrees that can't contain a
+                node matching it.
 
         Top-first.
         """
@@ -304,12 +341,14 @@ class ScopeTreeNode:
                 continue
             if child is skip:
                 continue
+            if path_id is not None and not child.may_contain(path_id):
+                continue
             finfo = child.fence_info
             yield child, child.namespaces, finfo
             if child.parent is not self:
                 continue
             desc_ns = child.descendants_and_namespaces_ex(
-                unfenced_only=unfenced_only, strict=True)
+                unfenced_only=unfenced_only, strict=True, path_id=path_id)
             for desc, desc_namespaces, desc_finfo in desc_ns:
                 yield (
                     desc,
@@ -830,20 +869,24 @@ class ScopeTreeNode:
         namespaces: set[pathid.Namespace] = set()
         found = None
         nodes: list[ScopeTreeNode] = []
+        key = path_id.namespace_free_hash()
         for node, ans in self.ancestors_and_namespaces:
-            if (node.path_id is not None
-                    and _paths_equal(node.path_id, path_id, namespaces)):
-                found = node
-                break
-
-            for child in node.children:
-                if (child.path_id is not None
-                        and _paths_equal(child.path_id, path_id, namespaces)):
-                    found = child
+            if key in node._path_keys:
+                if (node.path_id is not None
+                        and _paths_equal(node.path_id, path_id, namespaces)):
+                    found = node
                     break
 
-            if found is not None:
-                break
+                for child in node.children:
+                    if (child.path_id is not None
+                            and key in child._path_keys
+                            and _paths_equal(
+                                child.path_id, path_id, namespaces)):
+                        found = child
+                        break
+
+                if found is not None:
+                    break
 
             namespaces |= ans
 
@@ -884,6 +927,8 @@ class ScopeTreeNode:
         pfx_with_invariant_card: bool = False,
     ) -> Optional[ScopeTreeNode]:
         for child in self.children:
+            if not child.may_contain(path_id):
+                continue
             if child.path_id == path_id:
                 return child
             if (
@@ -913,7 +958,9 @@ class ScopeTreeNode:
         self,
         path_id: pathid.PathId,
     ) -> Optional[ScopeTreeNode]:
-        for descendant, dns, _ in self.strict_descendants_and_namespaces:
+        descendants = self.descendants_and_namespaces_ex(
+            strict=True, path_id=path_id)
+        for descendant, dns, _ in descendants:
             if (descendant.path_id is not None
                     and _paths_equal(descendant.path_id, path_id, dns)):
                 return descendant
@@ -925,7 +972,9 @@ class ScopeTreeNode:
         path_id: pathid.PathId,
     ) -> list[ScopeTreeNodeWithPathId]:
         matched = []
-        for descendant, dns, _ in self.strict_descendants_and_namespaces:
+        descendants = self.descendants_and_namespaces_ex(
+            strict=True, path_id=path_id)
+        for descendant, dns, _ in descendants:
             if (has_path_id(descendant)
                     and _paths_equal(descendant.path_id, path_id, dns)):
                 matched.append(descendant)
@@ -937,7 +986,9 @@ class ScopeTreeNode:
         AbstractSet[pathid.Namespace],
         Optional[FenceInfo],
     ]:
-        for descendant, dns, finfo in self.strict_descendants_and_namespaces:
+        descendants = self.descendants_and_namespaces_ex(
+            strict=True, path_id=path_id)
+        for descendant, dns, finfo in descendants:
             if (descendant.path_id is not None
                     and _paths_equal(descendant.path_id, path_id, dns)):
                 return descendant, dns, finfo
@@ -1002,10 +1053,12 @@ class ScopeTreeNode:
             # For each ancestor, search its descendants for path_id.
             # If we have passed a fence on the way up, only look for
             # unfenced descendants.
-            for descendant, dns, finfo in (
+            descendants = (
                 node.descendants_and_namespaces_ex(
-                    unfenced_only=fence_seen, skip=last)
-            ):
+                    unfenced_only=fence_seen, skip=last, path_id=path_id)
+                if node.may_contain(path_id) else ()
+            )
+            for descendant, dns, finfo in descendants:
                 cns = namespaces | dns
                 if (has_path_id(descendant)
                         and not descendant.is_group
@@ -1085,10 +1138,14 @@ class ScopeTreeNode:
         if current_parent is not None:
             # Make sure no other node refers to us.
             current_parent.children.remove(self)
+            for node in current_parent.ancestors:
+                _add_path_keys(node._path_keys, self._path_keys, -1)
 
         if parent is not None:
             self._parent = weakref.ref(parent)
             parent.children.append(self)
+            for node in parent.ancestors:
+                _add_path_keys(node._path_keys, self._path_keys, 1)
         else:
             self._parent = None
 
@@ -1098,6 +1155,23 @@ class ScopeTreeNodeWithPathId(ScopeTreeNode):
     path_id: pathid.PathId
 
 
+def _path_key(path_id: Optional[pathid.PathId]) -> Optional[int]:
+    return path_id.namespace_free_hash() if path_id is not None else None
+
+
+def _add_path_keys(
+    counts: dict[int, int],
+    keys: Mapping[int, int],
+    sign: int,
+) -> None:
+    for key, n in keys.items():
+        total = counts.get(key, 0) + sign * n
+        if total:
+            counts[key] = total
+        else:
+            del counts[key]
+
+
 def _paths_equal(
     path_id_1: pathid.PathId,
     path_id_2: pathid.PathId,
@@ -2206,7 +2206,10 @@ def _merge_and_prepare_external_rels(
                 # HACK: this is a hacky hack to get the path_id used by the
                 # pointers within the DML statement's namespace
                 out_id = out_id.replace_namespace(subject_namespace)
-                out_id._prefix = out_id._get_prefix(1).replace_namespace(set())
+                prefix = out_id._get_prefix(1).replace_namespace(set())
+                # Derived PathIds are memoized, so patch a fresh copy
+                out_id = irast.PathId(out_id)
+                out_id._prefix = prefix
                 rel.path_outputs[out_id, out_asp] = out
             external_rels[rel_id] = (rel, aspects)
     return external_rels, ir_stmts
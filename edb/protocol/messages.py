@@ -833,6 +833,30 @@ class Execute(ClientMessage):
     arguments = Bytes('Encoded argument data.')
 
 
+class ExecuteBatch(ClientMessage):
+
+    mtype = MessageType('B')
+    message_length = MessageLength
+    annotations = Annotations
+    allowed_capabilities = EnumOf(UInt64, Capability,
+                                  'A bit mask of allowed capabilities.')
+    compilation_flags = EnumOf(UInt64, CompilationFlag,
+                               'A bit mask of query options.')
+    implicit_limit = UInt64('Implicit LIMIT clause on returned sets.')
+    input_language = EnumOf(UInt8, InputLanguage, 'Command source language.')
+    output_format = EnumOf(UInt8, OutputFormat, 'Data output format.')
+    expected_cardinality = EnumOf(UInt8, Cardinality,
+                                  'Expected result cardinality.')
+    command_text = String('Command text.')
+    state_typedesc_id = UUID('State data descriptor ID.')
+    state_data = Bytes('Encoded state data.')
+
+    input_typedesc_id = UUID('Argument data descriptor ID.')
+    output_typedesc_id = UUID('Output data descriptor ID.')
+    argument_sets = ArrayOf(
+        UInt32, Bytes(), 'Encoded argument data of every execution.')
+
+
 class ConnectionParam(Struct):
 
     name = String()
@@ -157,6 +157,7 @@ async def new_connection(
     tls_security: str = 'default',
     credentials: str = None,
     credentials_file: str = None,
+    server_settings: dict[str, str] = None,
     **kwargs
 ):
     connect_config, client_config = con_utils.parse_connect_arguments(
@@ -170,7 +171,7 @@ async def new_connection(
         branch=branch,
         timeout=timeout,
         command_timeout=None,
-        server_settings=None,
+        server_settings=server_settings,
         tls_ca=tls_ca,
         tls_ca_file=tls_ca_file,
         tls_security=tls_security,
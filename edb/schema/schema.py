@@ -25,6 +25,7 @@ from typing import (
     Iterable,
     Iterator,
     Mapping,
+    NamedTuple,
     NoReturn,
     Optional,
     overload,
@@ -701,6 +702,28 @@ class Schema(abc.ABC):
         )
 
 
+_FLAT_SCHEMA_MAPS = (
+    '_id_to_data',
+    '_id_to_type',
+    '_name_to_id',
+    '_shortname_to_id',
+    '_globalname_to_id',
+    '_refs_to',
+)
+
+
+class FlatSchemaDelta(NamedTuple):
+    """Changes between two generations of a FlatSchema.
+
+    *maps* contains ``(attribute, updated_items, deleted_keys)`` for
+    every internal map that differs between the two generations.
+    """
+
+    base_generation: int
+    generation: int
+    maps: tuple[tuple[str, dict[Any, Any], tuple[Any, ...]], ...]
+
+
 class FlatSchema(Schema):
 
     _id_to_data: immu.Map[uuid.UUID, tuple[Any, ...]]
@@ -789,6 +812,50 @@ class FlatSchema(Schema):
 
         return new
 
+    def get_delta(self, base: FlatSchema) -> FlatSchemaDelta:
+        """Compute the changes that turn *base* into this schema.
+
+        Unchanged entries are detected by identity, so this is cheap
+        for schemas derived from *base* through schema mutations.
+        """
+        maps = []
+        for attr in _FLAT_SCHEMA_MAPS:
+            old: immu.Map[Any, Any] = getattr(base, attr)
+            new: immu.Map[Any, Any] = getattr(self, attr)
+            if old is new:
+                continue
+            updated = {
+                k: v for k, v in new.items()
+                if old.get(k, so.NoDefault) is not v
+            }
+            deleted = tuple(k for k in old.keys() if k not in new)
+            if updated or deleted:
+                maps.append((attr, updated, deleted))
+
+        return FlatSchemaDelta(
+            base_generation=base._generation,
+            generation=self._generation,
+            maps=tuple(maps),
+        )
+
+    def apply_delta(self, delta: FlatSchemaDelta) -> FlatSchema:
+        if delta.base_generation != self._generation:
+            raise ValueError(
+                f'cannot apply schema delta: expected base generation '
+                f'{delta.base_generation}, got {self._generation}'
+            )
+
+        new = self._replace()
+        for attr, updated, deleted in delta.maps:
+            mm = getattr(self, attr).mutate()
+            for k in deleted:
+                del mm[k]
+            mm.update(updated)
+            setattr(new, attr, mm.finish())
+        new._generation = delta.generation
+
+        return new
+
     def _update_obj_name(
         self,
         obj_id: uuid.UUID,
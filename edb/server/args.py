@@ -213,6 +213,7 @@ class CompilerPoolMode(enum.StrEnum):
     OnDemand = "on_demand"
     Remote = "remote"
     MultiTenant = "fixed_multi_tenant"
+    Threaded = "threaded"
 
     def __init__(self, name):
         self.pool_class = None
@@ -227,6 +228,7 @@ class ServerConfig(NamedTuple):
 
     data_dir: pathlib.Path
     backend_dsn: str
+    backend_replica_dsns: tuple[str, ...]
     backend_adaptive_ha: bool
     tenant_id: Optional[str]
     ignore_other_tenants: bool
@@ -661,6 +663,14 @@ server_options = typeutils.chain_decorators([
         help='DSN of a remote backend cluster, if using one. '
              'Also supports HA clusters, for example: stolon+consul+http://'
              'localhost:8500/test_cluster'),
+    click.option(
+        '--backend-replica-dsn', 'backend_replica_dsns', type=str,
+        multiple=True, default=(),
+        envvar="GEL_SERVER_BACKEND_REPLICA_DSN", cls=EnvvarResolver,
+        help='DSN of a read replica of the backend cluster, specify '
+             'multiple times for more than one replica. Read-only queries '
+             'are sent to replicas if the replica_max_staleness setting '
+             'allows it.'),
     click.option(
         '--enable-backend-adaptive-ha', 'backend_adaptive_ha', is_flag=True,
         help='If backend adaptive HA is enabled, the Gel server will '
@@ -846,8 +856,11 @@ server_options = typeutils.chain_decorators([
              'pool will not scale and sticks to --compiler-pool-size, while '
              '"on_demand" means the pool will maintain at least 1 worker and '
              'automatically scale up (to --compiler-pool-size workers ) and '
-             'down to the demand. Defaults to "fixed" in production mode and '
-             '"on_demand" in development mode.',
+             'down to the demand. "threaded" runs --compiler-pool-size '
+             'compilers in threads of the server process instead, which is '
+             'only worthwhile on free-threaded Python builds. Defaults to '
+             '"fixed" in production mode and "on_demand" in development '
+             'mode.',
     ),
     click.option(
         '--compiler-pool-addr',
@@ -1625,6 +1638,9 @@ def parse_args(**kwargs: Any):
                 opt = "--" + name.replace("_", "-")
                 abort(f"The {opt} and --multitenant-config-file options "
                       f"are mutually exclusive.")
+        if kwargs['backend_replica_dsns']:
+            abort("The --backend-replica-dsn and --multitenant-config-file "
+                  "options are mutually exclusive.")
         if kwargs['compiler_pool_mode'] is not CompilerPoolMode.MultiTenant:
             abort("must use --compiler-pool-mode=fixed_multi_tenant "
                   "in multi-tenant mode")
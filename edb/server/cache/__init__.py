@@ -19,7 +19,8 @@
 
 from __future__ import annotations
 
-from .stmt_cache import StatementsCache
+from .stmt_cache import StatementsCache, CostAwareStatementsCache
+from .result_cache import ResultCache
 
 
-__all__ = ('StatementsCache',)
+__all__ = ('StatementsCache', 'CostAwareStatementsCache', 'ResultCache')
@@ -0,0 +1,128 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Cache of the results of read-only queries.
+
+Every entry is tagged with the tables the query reads (identified by
+the ids of the object types the tables belong to), and is dropped as
+soon as a write to any of those tables is committed.  The cache is
+bounded by the total size of the cached results; the entries are
+evicted by the same cost-aware policy as compiled queries, where the
+cost of an entry is the time it took the backend to produce it.
+"""
+
+
+from __future__ import annotations
+from typing import Any, Hashable, Iterable, NamedTuple, Optional
+
+from .stmt_cache import CostAwareStatementsCache
+
+
+# Rough per-entry bookkeeping overhead, in bytes.
+ENTRY_OVERHEAD = 200
+
+
+class _Entry(NamedTuple):
+
+    data: bytes
+    tables: frozenset[str]
+    size: int
+    cost: float
+
+
+def _weigher(entry: _Entry) -> tuple[int, float]:
+    return entry.size, entry.cost
+
+
+class ResultCache:
+
+    def __init__(self, *, maxbytes: int) -> None:
+        self.maxbytes = maxbytes
+        # Entries bigger than that would push most of the cache out.
+        self.max_entry_size = maxbytes // 4
+        self._entries = CostAwareStatementsCache(
+            maxsize=2 ** 31 - 1,
+            maxbytes=maxbytes,
+            weigher=_weigher,
+        )
+        self._by_table: dict[str, set[Hashable]] = {}
+        # Bumped on every invalidation, so that results of queries that
+        # were running concurrently with a write are not stored.
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._entries.nbytes
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        entry = self._entries.get(key, None)
+        return entry.data if entry is not None else None
+
+    def store(
+        self,
+        key: Hashable,
+        data: bytes,
+        *,
+        key_size: int,
+        tables: frozenset[str],
+        cost: float,
+        generation: int,
+    ) -> None:
+        """Cache *data* unless a write was committed since *generation*."""
+        if generation != self.generation:
+            return
+        size = len(data) + key_size + ENTRY_OVERHEAD
+        if size > self.max_entry_size:
+            return
+
+        self._unlink(key, self._entries.pop(key, None))
+        self._entries[key] = _Entry(data, tables, size, cost)
+        for table in tables:
+            self._by_table.setdefault(table, set()).add(key)
+
+        while self._entries.needs_cleanup():
+            evicted_key, evicted = self._entries.cleanup_one()
+            self._unlink(evicted_key, evicted)
+
+    def invalidate(self, tables: Optional[Iterable[str]]) -> None:
+        """Drop the entries reading any of *tables* (all if None)."""
+        self.generation += 1
+        if tables is None:
+            self.clear()
+            return
+        for table in tables:
+            for key in self._by_table.pop(table, ()):
+                self._unlink(key, self._entries.pop(key, None))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_table.clear()
+
+    def _unlink(self, key: Hashable, entry: Any) -> None:
+        if entry is None:
+            return
+        for table in entry.tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
@@ -29,3 +29,36 @@ cdef class StatementsCache:
     cpdef needs_cleanup(self)
     cpdef cleanup_one(self)
     cpdef resize(self, int maxsize)
+
+
+cdef class _CostAwareEntry:
+
+    cdef:
+        object value
+        long long size
+        double cost
+        unsigned long long hits
+        unsigned long long seq
+
+
+cdef class CostAwareStatementsCache:
+
+    cdef:
+        object _dict
+        list _heap
+        int _maxsize
+        long long _maxbytes
+        long long _nbytes
+        double _clock
+        unsigned long long _counter
+        object _weigher
+        object _dict_move_to_end
+        object _dict_get
+
+    cdef _push(self, key, _CostAwareEntry entry)
+    cdef _compact(self)
+    cpdef get(self, key, default)
+    cpdef needs_cleanup(self)
+    cpdef cleanup_one(self)
+    cpdef resize(self, int maxsize)
+    cpdef set_maxbytes(self, long long maxbytes)
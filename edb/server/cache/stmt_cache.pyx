@@ -18,6 +18,7 @@
 
 
 import collections
+import heapq
 
 
 cdef object _LRU_MARKER = object()
@@ -103,3 +104,198 @@ cdef class StatementsCache:
 
     def __iter__(self):
         return iter(self._dict)
+
+
+cdef class _CostAwareEntry:
+
+    def __init__(self, value, long long size, double cost):
+        self.value = value
+        self.size = size if size > 0 else 1
+        self.cost = cost
+        self.hits = 1
+        self.seq = 0
+
+
+cdef class CostAwareStatementsCache:
+
+    # A Greedy-Dual-Size-Frequency (GDSF) cache.  Every entry gets a
+    # priority of
+    #
+    #     H = L + hits * cost / size
+    #
+    # where *cost* is how expensive the entry is to re-create (for
+    # compiled queries, the time the compiler spent on it), *size* is
+    # the memory it occupies, and *L* is the "inflation" clock: the
+    # priority of the most recently evicted entry.  The entry with the
+    # lowest priority is evicted first, so small, expensive and hot
+    # entries survive while large one-off entries go first.  Because *L*
+    # only grows, entries that stopped being used eventually age out
+    # regardless of how hot they once were.
+    #
+    # Priorities are kept in a binary heap with lazy invalidation: a hit
+    # pushes a fresh heap item and the stale one is skipped on eviction.
+    # The entries dict is additionally kept in LRU order (just like in
+    # StatementsCache), so that `items()` iterates from the least to the
+    # most recently used entry.
+    #
+    # The cache is bounded by both the number of entries (*maxsize*) and,
+    # optionally, by the total estimated size of entries (*maxbytes*).
+    # *weigher* is a callable returning a `(size, cost)` tuple for a
+    # value being inserted.
+
+    def __init__(self, *, maxsize, maxbytes=0, weigher):
+        self.resize(maxsize)
+        self.set_maxbytes(maxbytes)
+        self._weigher = weigher
+        self._dict = collections.OrderedDict()
+        self._dict_move_to_end = self._dict.move_to_end
+        self._dict_get = self._dict.get
+        self._heap = []
+        self._nbytes = 0
+        self._clock = 0.0
+        self._counter = 0
+
+    cdef _push(self, key, _CostAwareEntry entry):
+        self._counter += 1
+        entry.seq = self._counter
+        heapq.heappush(
+            self._heap,
+            (
+                self._clock + entry.hits * entry.cost / entry.size,
+                entry.seq,
+                key,
+            ),
+        )
+        if len(self._heap) > 2 * len(self._dict) + 64:
+            self._compact()
+
+    cdef _compact(self):
+        cdef _CostAwareEntry entry
+        heap = []
+        for priority, seq, key in self._heap:
+            entry = self._dict_get(key, None)
+            if entry is not None and entry.seq == seq:
+                heap.append((priority, seq, key))
+        heapq.heapify(heap)
+        self._heap = heap
+
+    cpdef get(self, key, default):
+        cdef _CostAwareEntry entry
+        entry = self._dict_get(key, None)
+        if entry is None:
+            return default
+        entry.hits += 1
+        self._push(key, entry)
+        self._dict_move_to_end(key)  # last=True
+        return entry.value
+
+    cpdef needs_cleanup(self):
+        return len(self._dict) > self._maxsize or (
+            self._maxbytes > 0
+            and self._nbytes > self._maxbytes
+            and len(self._dict) > 0
+        )
+
+    cpdef cleanup_one(self):
+        cdef _CostAwareEntry entry
+        while self._heap:
+            priority, seq, key = heapq.heappop(self._heap)
+            entry = self._dict_get(key, None)
+            if entry is None or entry.seq != seq:
+                # Stale heap item, the entry was either removed or
+                # has since been pushed with a higher priority.
+                continue
+            self._clock = priority
+            del self._dict[key]
+            self._nbytes -= entry.size
+            return key, entry.value
+        raise KeyError('cleanup_one(): cache is empty')
+
+    cpdef resize(self, int maxsize):
+        if maxsize <= 0:
+            raise ValueError(
+                f'maxsize is expected to be greater than 0, got {maxsize}')
+        self._maxsize = maxsize
+
+    cpdef set_maxbytes(self, long long maxbytes):
+        if maxbytes < 0:
+            raise ValueError(
+                f'maxbytes is expected to be non-negative, got {maxbytes}')
+        self._maxbytes = maxbytes
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def items(self):
+        cdef _CostAwareEntry entry
+        rv = []
+        for key, entry in self._dict.items():
+            rv.append((key, entry.value))
+        return rv
+
+    def most_used(self, int limit):
+        """Return up to *limit* (key, value) pairs, most hit first."""
+        cdef _CostAwareEntry entry
+        entries = []
+        for key, entry in self._dict.items():
+            entries.append((entry.hits, entry.seq, key, entry.value))
+        return [
+            (key, value)
+            for _, _, key, value in heapq.nlargest(limit, entries)
+        ]
+
+    def clear(self):
+        self._dict.clear()
+        self._heap.clear()
+        self._nbytes = 0
+
+    def pop(self, key, default=_LRU_MARKER):
+        cdef _CostAwareEntry entry
+        entry = self._dict.pop(key, None)
+        if entry is None:
+            if default is _LRU_MARKER:
+                raise KeyError(key)
+            return default
+        self._nbytes -= entry.size
+        return entry.value
+
+    def __getitem__(self, key):
+        cdef _CostAwareEntry entry
+        entry = self._dict[key]
+        entry.hits += 1
+        self._push(key, entry)
+        self._dict_move_to_end(key)  # last=True
+        return entry.value
+
+    def __setitem__(self, key, o):
+        cdef _CostAwareEntry entry
+        cdef _CostAwareEntry old
+
+        size, cost = self._weigher(o)
+        entry = _CostAwareEntry(o, size, cost)
+        old = self._dict_get(key, None)
+        if old is not None:
+            # Keep the accumulated frequency of the replaced entry
+            entry.hits = old.hits
+            self._nbytes -= old.size
+            self._dict[key] = entry
+            self._dict_move_to_end(key)  # last=True
+        else:
+            self._dict[key] = entry
+        self._nbytes += entry.size
+        self._push(key, entry)
+
+    def __delitem__(self, key):
+        cdef _CostAwareEntry entry
+        entry = self._dict.pop(key)
+        self._nbytes -= entry.size
+
+    def __contains__(self, key):
+        return key in self._dict
+
+    def __len__(self):
+        return len(self._dict)
+
+    def __iter__(self):
+        return iter(self._dict)
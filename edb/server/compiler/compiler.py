@@ -53,6 +53,7 @@ from edb.server import instdata
 
 from edb import edgeql
 from edb.common import debug
+from edb.common import phases
 from edb import graphql
 from edb.common import turbo_uuid
 from edb.common import verutils
@@ -677,24 +678,32 @@ class Compiler:
             cache_key=request.get_cache_key(),
         )
 
-        match request.input_language:
-            case enums.InputLanguage.EDGEQL:
-                assert isinstance(request.source, edgeql.Source)
-                unit_group = compile(ctx=ctx, source=request.source)
-            case enums.InputLanguage.GRAPHQL:
-                assert isinstance(request.source, graphql.Source)
-                unit_group = compile_graphql(
-                    ctx=ctx,
-                    source=request.source,
-                    variables=request.key_params,
-                )
-            case enums.InputLanguage.SQL:
-                assert isinstance(request.source, pg_parser.Source)
-                unit_group = compile_sql_as_unit_group(
-                    ctx=ctx, source=request.source)
-            case _:
-                raise NotImplementedError(
-                    f"unnsupported input language: {request.input_language}")
+        started_at = time.monotonic()
+        with phases.collect(
+            count_allocations=debug.flags.compile_allocations,
+        ) as timings:
+            match request.input_language:
+                case enums.InputLanguage.EDGEQL:
+                    assert isinstance(request.source, edgeql.Source)
+                    unit_group = compile(ctx=ctx, source=request.source)
+                case enums.InputLanguage.GRAPHQL:
+                    assert isinstance(request.source, graphql.Source)
+                    unit_group = compile_graphql(
+                        ctx=ctx,
+                        source=request.source,
+                        variables=request.key_params,
+                    )
+                case enums.InputLanguage.SQL:
+                    assert isinstance(request.source, pg_parser.Source)
+                    unit_group = compile_sql_as_unit_group(
+                        ctx=ctx, source=request.source)
+                case _:
+                    raise NotImplementedError(
+                        f"unnsupported input language: "
+                        f"{request.input_language}")
+        unit_group.compile_phases = timings.summary()
+
+        unit_group.compile_duration = time.monotonic() - started_at
 
         tx_started = False
         for unit in unit_group:
@@ -795,24 +804,29 @@ class Compiler:
             cache_key=request.get_cache_key(),
         )
 
-        match request.input_language:
-            case enums.InputLanguage.EDGEQL:
-                assert isinstance(request.source, edgeql.Source)
-                unit_group = compile(ctx=ctx, source=request.source)
-            case enums.InputLanguage.GRAPHQL:
-                assert isinstance(request.source, graphql.Source)
-                unit_group = compile_graphql(
-                    ctx=ctx,
-                    source=request.source,
-                    variables=request.key_params,
-                )
-            case enums.InputLanguage.SQL:
-                assert isinstance(request.source, pg_parser.Source)
-                unit_group = compile_sql_as_unit_group(
-                    ctx=ctx, source=request.source)
-            case _:
-                raise NotImplementedError(
-                    f"unnsupported input language: {request.input_language}")
+        with phases.collect(
+            count_allocations=debug.flags.compile_allocations,
+        ) as timings:
+            match request.input_language:
+                case enums.InputLanguage.EDGEQL:
+                    assert isinstance(request.source, edgeql.Source)
+                    unit_group = compile(ctx=ctx, source=request.source)
+                case enums.InputLanguage.GRAPHQL:
+                    assert isinstance(request.source, graphql.Source)
+                    unit_group = compile_graphql(
+                        ctx=ctx,
+                        source=request.source,
+                        variables=request.key_params,
+                    )
+                case enums.InputLanguage.SQL:
+                    assert isinstance(request.source, pg_parser.Source)
+                    unit_group = compile_sql_as_unit_group(
+                        ctx=ctx, source=request.source)
+                case _:
+                    raise NotImplementedError(
+                        f"unnsupported input language: "
+                        f"{request.input_language}")
+        unit_group.compile_phases = timings.summary()
 
         return unit_group, ctx.state
 
@@ -1586,6 +1600,25 @@ def _get_schema_version(user_schema: s_schema.Schema) -> uuid.UUID:
     return ver.get_version(user_schema)
 
 
+def _get_user_schema_delta(
+    ctx: CompileContext,
+    user_schema: s_schema.Schema,
+    user_schema_pickle: bytes,
+) -> Optional[tuple[uuid.UUID, bytes]]:
+    # Workers that already hold the schema this was compiled against
+    # can be synced with just the changes instead of the full pickle.
+    base = ctx.state.root_user_schema
+    if (
+        not isinstance(base, s_schema.FlatSchema)
+        or not isinstance(user_schema, s_schema.FlatSchema)
+    ):
+        return None
+    delta = pickle.dumps(user_schema.get_delta(base), -1)
+    if len(delta) * 2 > len(user_schema_pickle):
+        return None
+    return _get_schema_version(base), delta
+
+
 def _compile_ql_script(
     ctx: CompileContext,
     eql: str,
@@ -1851,12 +1884,13 @@ def _compile_ql_query(
     schema = current_tx.get_schema(base_schema)
 
     options = _get_compile_options(ctx, is_explain=is_explain)
-    ir = qlcompiler.compile_ast_to_ir(
-        ql,
-        schema=schema,
-        script_info=script_info,
-        options=options,
-    )
+    with phases.phase('ir'):
+        ir = qlcompiler.compile_ast_to_ir(
+            ql,
+            schema=schema,
+            script_info=script_info,
+            options=options,
+        )
     result_cardinality = enums.cardinality_from_ir_value(ir.cardinality)
 
     # This low-hanging-fruit is temporary; persistent cache should cover all
@@ -1869,26 +1903,30 @@ def _compile_ql_query(
     )
     cache_mode = ctx.get_cache_mode()
 
-    sql_res = pg_compiler.compile_ir_to_sql_tree(
-        ir,
-        expected_cardinality_one=ctx.expected_cardinality_one,
-        output_format=_convert_format(ctx.output_format),
-        json_parameters=options.json_parameters,
-        backend_runtime_params=ctx.backend_runtime_params,
-        is_explain=options.is_explain,
-        cache_as_function=(use_persistent_cache
-                       and cache_mode is config.QueryCacheMode.PgFunc),
-        versioned_stdlib=True,
-    )
+    with phases.phase('relgen'):
+        sql_res = pg_compiler.compile_ir_to_sql_tree(
+            ir,
+            expected_cardinality_one=ctx.expected_cardinality_one,
+            output_format=_convert_format(ctx.output_format),
+            json_parameters=options.json_parameters,
+            backend_runtime_params=ctx.backend_runtime_params,
+            is_explain=options.is_explain,
+            cache_as_function=(use_persistent_cache
+                               and cache_mode is config.QueryCacheMode.PgFunc),
+            versioned_stdlib=True,
+        )
 
-    sql_text = pg_codegen.generate_source(sql_res.ast)
+    with phases.phase('codegen'):
+        sql_text = pg_codegen.generate_source(sql_res.ast)
     func_call_sql = None
 
     pg_debug.dump_ast_and_query(sql_res.ast, ir)
 
     if use_persistent_cache and cache_mode is config.QueryCacheMode.PgFunc:
-        cache_sql, func_call_ast = _build_cache_function(ctx, ir, sql_res)
-        func_call_sql = pg_codegen.generate_source(func_call_ast)
+        with phases.phase('codegen'):
+            cache_sql, func_call_ast = _build_cache_function(
+                ctx, ir, sql_res)
+            func_call_sql = pg_codegen.generate_source(func_call_ast)
     elif (
         use_persistent_cache and cache_mode is config.QueryCacheMode.RegInline
     ):
@@ -2022,6 +2060,13 @@ def _compile_ql_query(
     else:
         query_asts = None
 
+    read_tables = write_tables = None
+    if isinstance(ir, irast.Statement) and not is_explain:
+        if ir.dml_exprs or ir.volatility is qltypes.Volatility.Modifying:
+            write_tables = _get_write_tables(ir)
+        else:
+            read_tables = _get_read_tables(ir)
+
     return dbstate.Query(
         sql=(sql_info_prefix + sql_text).encode(defines.EDGEDB_ENCODING),
         sql_hash=sql_hash,
@@ -2043,9 +2088,90 @@ def _compile_ql_query(
         query_asts=query_asts,
         warnings=ir.warnings,
         unsafe_isolation_dangers=ir.unsafe_isolation_dangers,
+        read_tables=read_tables,
+        write_tables=write_tables,
     )
 
 
+def _get_table_types(
+    schema: s_schema.Schema,
+    stype: s_objtypes.ObjectType,
+) -> set[s_objtypes.ObjectType]:
+    # The object types whose tables hold the objects of *stype*.
+    # The components of union and intersection types are referenced
+    # separately.
+    if stype.is_compound_type(schema):
+        return set()
+    stype = stype.get_nearest_non_derived_parent(schema)
+    return {
+        t for t in (stype, *stype.descendants(schema))
+        if not t.get_abstract(schema)
+    }
+
+
+def _get_read_tables(ir: irast.Statement) -> Optional[frozenset[str]]:
+    """Return the tables a query reads, if its results can be cached."""
+    if ir.volatility.is_volatile():
+        return None
+
+    schema = ir.schema
+    tables: set[s_objtypes.ObjectType] = set()
+    for ref in ir.schema_refs:
+        if isinstance(ref, s_func.VolatilitySubject):
+            # Anything not immutable may depend on more than the
+            # tables, e.g. on the current time.
+            if ref.get_volatility(schema) is not qltypes.Volatility.Immutable:
+                return None
+        elif isinstance(ref, s_objtypes.ObjectType):
+            tables.update(_get_table_types(schema, ref))
+
+    for stype in tables:
+        # The standard types (introspection, system objects, etc.)
+        # are not modified by DML.
+        module = s_name.UnqualName(stype.get_name(schema).module)
+        if module in s_schema.STD_MODULES:
+            return None
+
+    return frozenset(str(stype.id) for stype in tables)
+
+
+def _get_write_tables(ir: irast.Statement) -> Optional[frozenset[str]]:
+    """Return the tables a DML query may write to, if known."""
+    schema = ir.schema
+    tables: set[s_objtypes.ObjectType] = set()
+    for ref in ir.schema_refs:
+        if isinstance(ref, s_func.VolatilitySubject):
+            if ref.get_volatility(schema) is qltypes.Volatility.Modifying:
+                # The DML in the function body is not visible here.
+                return None
+        elif isinstance(ref, s_objtypes.ObjectType):
+            tables.update(_get_table_types(schema, ref))
+
+    # Deleting objects also deletes links pointing to them and, with
+    # "on target delete delete source", the objects on the other end
+    # of those, and so on.
+    todo = list(tables)
+    while todo:
+        stype = todo.pop()
+        targets = [stype, *stype.get_ancestors(schema).objects(schema)]
+        for target in list(targets):
+            targets.extend(schema.get_referrers(
+                target, scls_type=s_objtypes.ObjectType,
+                field_name='union_of'))
+        for target in targets:
+            for link in schema.get_referrers(
+                target, scls_type=s_links.Link, field_name='target'
+            ):
+                source = link.get_source(schema)
+                if not isinstance(source, s_objtypes.ObjectType):
+                    continue
+                new = _get_table_types(schema, source) - tables
+                tables.update(new)
+                todo.extend(new)
+
+    return frozenset(str(stype.id) for stype in tables)
+
+
 def _build_cache_function(
     ctx: CompileContext,
     ir: irast.Statement,
@@ -2909,7 +3035,8 @@ def _try_compile(
         if text.startswith(sentinel):
             time.sleep(float(text[len(sentinel):text.index("\n")]))
 
-    statements = edgeql.parse_block(source)
+    with phases.phase('parse'):
+        statements = edgeql.parse_block(source)
     return _try_compile_ast(statements=statements, source=source, ctx=ctx)
 
 
@@ -3126,6 +3253,8 @@ def _make_query_unit(
         unit.server_param_conversions = comp.server_param_conversions
 
         unit.cacheable = comp.cacheable
+        unit.read_tables = comp.read_tables
+        unit.write_tables = comp.write_tables
 
         if comp.is_explain:
             unit.is_explain = True
@@ -3155,6 +3284,9 @@ def _make_query_unit(
             if comp.user_schema is not None:
                 final_user_schema = comp.user_schema
                 unit.user_schema = pickle.dumps(comp.user_schema, -1)
+                unit.user_schema_delta = _get_user_schema_delta(
+                    ctx, comp.user_schema, unit.user_schema
+                )
                 unit.user_schema_version = (
                     _get_schema_version(comp.user_schema)
                 )
@@ -3185,6 +3317,9 @@ def _make_query_unit(
             if comp.user_schema is not None:
                 final_user_schema = comp.user_schema
                 unit.user_schema = pickle.dumps(comp.user_schema, -1)
+                unit.user_schema_delta = _get_user_schema_delta(
+                    ctx, comp.user_schema, unit.user_schema
+                )
                 unit.user_schema_version = (
                     _get_schema_version(comp.user_schema)
                 )
@@ -3227,6 +3362,9 @@ def _make_query_unit(
             if comp.user_schema is not None:
                 final_user_schema = comp.user_schema
                 unit.user_schema = pickle.dumps(comp.user_schema, -1)
+                unit.user_schema_delta = _get_user_schema_delta(
+                    ctx, comp.user_schema, unit.user_schema
+                )
                 unit.user_schema_version = (
                     _get_schema_version(comp.user_schema)
                 )
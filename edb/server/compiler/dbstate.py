@@ -133,6 +133,13 @@ class Query(BaseQuery):
 
     cacheable: bool = True
     is_explain: bool = False
+
+    # Ids of the object types whose tables the query reads, or None if
+    # its results must not be kept in the result cache.
+    read_tables: Optional[frozenset[str]] = None
+    # Ids of the object types whose tables the query may write to, or
+    # None if that is not known.  Only meaningful for DML.
+    write_tables: Optional[frozenset[str]] = None
     query_asts: Any = None
     run_and_rollback: bool = False
 
@@ -293,6 +300,10 @@ class QueryUnit:
     # True if it is safe to cache this unit.
     cacheable: bool = False
 
+    # See Query.read_tables and Query.write_tables.
+    read_tables: Optional[frozenset[str]] = None
+    write_tables: Optional[frozenset[str]] = None
+
     # If non-None, contains a name of the DB that is about to be
     # created/deleted. If it's the former, the IO process needs to
     # introspect the new db. If it's the later, the server should
@@ -357,6 +368,9 @@ class QueryUnit:
     # If present, represents the future schema state after
     # the command is run. The schema is pickled.
     user_schema: Optional[bytes] = None
+    # If present, the version of the user schema this unit was compiled
+    # against, and the pickled FlatSchemaDelta from it to user_schema.
+    user_schema_delta: Optional[tuple[uuid.UUID, bytes]] = None
     # If present, represents updated metrics about feature use induced
     # by the new user_schema.
     feature_used_metrics: Optional[dict[str, float]] = None
@@ -470,6 +484,15 @@ class QueryUnitGroup:
 
     graphql_key_variables: Optional[list[str]] = None
 
+    # Time (in seconds) the compiler spent producing this group, used by
+    # the I/O server to estimate the cost of evicting it from the cache.
+    compile_duration: float = 0.0
+
+    # Time (in seconds) and the number of memory blocks allocated by every
+    # compilation phase (see edb.common.phases), keyed by the phase name.
+    # The blocks are only counted with the compile_allocations debug flag.
+    compile_phases: Optional[dict[str, tuple[float, Optional[int]]]] = None
+
     @property
     def units(self) -> list[QueryUnit]:
         if self._unpacked_units is None:
@@ -488,6 +511,39 @@ class QueryUnitGroup:
     def __getitem__(self, item: int) -> QueryUnit:
         return self.units[item]
 
+    def clone(self) -> QueryUnitGroup:
+        """Make a copy that doesn't share per-database cache state.
+
+        Serialized units are unpacked anew by the copy, so that it can
+        be switched to the function cache independently of the original.
+        """
+        return dataclasses.replace(
+            self,
+            _units=list(self._units),
+            _unpacked_units=None,
+            cache_state=0,
+            tx_seq_id=0,
+        )
+
+    def get_estimated_size(self) -> int:
+        """Estimate the memory footprint of the group in bytes.
+
+        Cacheable units are kept serialized, so their size is exact;
+        for the rest we count the SQL and the type descriptors, which
+        dominate the size of a QueryUnit.
+        """
+        size = len(self.out_type_data) + len(self.in_type_data)
+        for unit in self._units:
+            if isinstance(unit, bytes):
+                size += len(unit)
+            else:
+                size += len(unit.sql)
+                if unit.cache_sql is not None:
+                    size += sum(len(sql) for sql in unit.cache_sql)
+                if unit.introspection_sql is not None:
+                    size += len(unit.introspection_sql)
+        return size
+
     def maybe_get_serialized(self, item: int) -> bytes | None:
         unit = self._units[item]
         if isinstance(unit, bytes):
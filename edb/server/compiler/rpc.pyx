@@ -313,7 +313,12 @@ cdef class CompilationRequest:
             self.inline_typenames == other.inline_typenames and
             self.inline_objectids == other.inline_objectids and
             self.role_name == other.role_name and
-            self.branch_name == other.branch_name and
+            (
+                # See _serialize_comp_req() on why branch_name only
+                # matters for SQL
+                self.input_language is not IN_LANG_SQL or
+                self.branch_name == other.branch_name
+            ) and
             self.key_params == other.key_params
         )
 
@@ -589,6 +594,11 @@ cdef _serialize_comp_req(req: CompilationRequest):
 
     branch_name = req.branch_name.encode("utf-8")
     out.write_len_prefixed_bytes(branch_name)
-    hash_obj.update(branch_name)
+    # Only SQL queries depend on the branch name (current_database()),
+    # EdgeQL and GraphQL are compiled identically for any branch.  Keeping
+    # the branch name out of the cache key allows branches with the same
+    # schema to share compiled queries.
+    if req.input_language is IN_LANG_SQL:
+        hash_obj.update(branch_name)
 
     return hash_obj, out
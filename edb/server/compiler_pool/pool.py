@@ -20,9 +20,11 @@
 from __future__ import annotations
 from typing import (
     Any,
+    Awaitable,
     Callable,
     cast,
     Hashable,
+    Iterator,
     Mapping,
     NamedTuple,
     Optional,
@@ -31,6 +33,7 @@ from typing import (
 
 import asyncio
 import collections
+import concurrent.futures
 import dataclasses
 import functools
 import hmac
@@ -62,6 +65,7 @@ from edb.server import metrics
 
 from . import amsg
 from . import queue
+from . import shared_schema
 from . import state
 
 if TYPE_CHECKING:
@@ -72,6 +76,8 @@ if TYPE_CHECKING:
     from edb.server.compiler import dbstate
     from edb.server.compiler import sertypes
 
+    from . import thread_worker
+
 SyncStateCallback = Callable[[], None]
 SyncFinalizer = Callable[[], None]
 Config = immutables.Map[str, config.SettingValue]
@@ -106,8 +112,34 @@ ADAPTIVE_SCALE_DOWN_WAIT_TIME: float = 60.0
 WORKER_PKG: str = __name__.rpartition('.')[0] + '.'
 DEFAULT_CLIENT: str = 'default'
 HIGH_RSS_GRACE_PERIOD: tuple[int, int] = (20 * 3600, 30 * 3600)
+# User schemas at least this large are handed to local workers through
+# shared memory instead of the worker pipe; 0 disables.
+SHARED_SCHEMA_MIN_SIZE: int = int(
+    os.getenv("GEL_COMPILER_SHARED_SCHEMA_MIN_SIZE", 1024 * 1024)
+)
+# Number of workers each branch is routed to by preference; 0 disables
+# the affinity routing.
+AFFINITY_CHOICES: int = int(os.getenv("GEL_COMPILER_AFFINITY_CHOICES", 2))
+# Workers that recently served more than this many times their fair share
+# of the requests are not preferred by the affinity routing, so that the
+# branches homed there spill over to the other workers.
+AFFINITY_LOAD_FACTOR: float = float(
+    os.getenv("GEL_COMPILER_AFFINITY_LOAD_FACTOR", 1.25)
+)
 CURRENT_COMPILER_PROTOCOL = 2
 
+# Scheduling classes of the calls that are not compiling a query, so
+# that e.g. a burst of dumps can't starve the interactive compiles.
+_CALL_PRIORITIES: dict[str, queue.Priority] = {
+    'describe_database_dump': queue.Priority.INTROSPECTION,
+    'parse_global_schema': queue.Priority.INTROSPECTION,
+    'parse_user_schema_db_config': queue.Priority.INTROSPECTION,
+    'compile_structured_config': queue.Priority.INTROSPECTION,
+    'analyze_explain_output': queue.Priority.INTROSPECTION,
+    'describe_database_restore': queue.Priority.DDL,
+    'validate_schema_equivalence': queue.Priority.DDL,
+}
+
 
 logger = logging.getLogger("edb.server")
 log_metrics = logging.getLogger("edb.server.metrics")
@@ -124,6 +156,27 @@ def _pickle_memoized(obj: Any) -> bytes:
     return pickle.dumps(obj, -1)
 
 
+def _make_coalescing_key(arg: Any) -> Hashable:
+    # Turn compile arguments into a hashable key for in-flight
+    # deduplication.  Anything that isn't understood here is left as-is
+    # and, if unhashable, simply disables coalescing for the request.
+    if isinstance(arg, (list, tuple)):
+        return (type(arg), tuple(_make_coalescing_key(v) for v in arg))
+    elif isinstance(arg, dict):
+        return (dict, tuple(
+            (k, _make_coalescing_key(v)) for k, v in arg.items()
+        ))
+    elif dataclasses.is_dataclass(arg) and not isinstance(arg, type):
+        return (type(arg), tuple(
+            _make_coalescing_key(getattr(arg, f.name))
+            for f in dataclasses.fields(arg)
+        ))
+    elif callable(getattr(arg, 'cache_key', None)):
+        return (type(arg), arg.cache_key())
+    else:
+        return arg
+
+
 class BaseWorker:
 
     _dbs: collections.OrderedDict[str, state.PickledDatabaseState]
@@ -337,6 +390,7 @@ class AbstractPool[
     _schema_class_layout: s_refl.SchemaClassLayout
     _dbindex: Optional[dbview.DatabaseIndex] = None
     _last_active_time: float
+    _inflight_compiles: dict[Hashable, asyncio.Task[Any]]
 
     def __init__(
         self,
@@ -356,6 +410,7 @@ class AbstractPool[
         self._schema_class_layout = kwargs["schema_class_layout"]
         self._dbindex = kwargs.get("dbindex")
         self._last_active_time = 0
+        self._inflight_compiles = {}
 
     def _get_init_args(self) -> tuple[InitArgs_T, InitArgsPickle_T]:
         assert self._dbindex is not None
@@ -393,6 +448,20 @@ class AbstractPool[
     def get_template_pid(self) -> Optional[int]:
         return None
 
+    def _pack_user_schema(
+        self, user_schema_pickle: bytes
+    ) -> tuple[bytes | state.SharedSchemaRef, SyncFinalizer]:
+        return user_schema_pickle, lambda: None
+
+    def _get_user_schema_delta(
+        self,
+        worker: BaseWorker_T,
+        dbname: str,
+        base_pickle: bytes,
+        user_schema_pickle: bytes,
+    ) -> Optional[bytes]:
+        return None
+
     async def _compute_compile_preargs(
         self,
         method_name: str,
@@ -473,15 +542,19 @@ class AbstractPool[
         preargs: list[Any] = [method_name, dbname]
         to_update: dict[str, Any] = {}
         branch_cache_hit = True
+        fini: SyncFinalizer = lambda: None
 
         if worker_db is None:
             branch_cache_hit = False
             evicted_dbs = worker.prepare_evict_db(
                 self._worker_branch_limit - 1
             )
+            user_schema_arg, fini = self._pack_user_schema(
+                user_schema_pickle
+            )
             preargs.extend([
                 evicted_dbs,
-                user_schema_pickle,
+                user_schema_arg,
                 _pickle_memoized(reflection_cache),
                 global_schema_pickle,
                 _pickle_memoized(database_config),
@@ -500,7 +573,19 @@ class AbstractPool[
 
             if worker_db.user_schema_pickle is not user_schema_pickle:
                 branch_cache_hit = False
-                preargs.append(user_schema_pickle)
+                delta = self._get_user_schema_delta(
+                    worker,
+                    dbname,
+                    worker_db.user_schema_pickle,
+                    user_schema_pickle,
+                )
+                if delta is not None:
+                    preargs.append(state.UserSchemaDelta(delta))
+                else:
+                    user_schema_arg, fini = self._pack_user_schema(
+                        user_schema_pickle
+                    )
+                    preargs.append(user_schema_arg)
                 to_update['user_schema_pickle'] = user_schema_pickle
             else:
                 preargs.append(None)
@@ -543,7 +628,7 @@ class AbstractPool[
         else:
             callback = None
 
-        return tuple(preargs), callback, lambda: None
+        return tuple(preargs), callback, fini
 
     def _report_branch_request(
         self,
@@ -558,6 +643,8 @@ class AbstractPool[
         *,
         condition: Optional[queue.AcquireCondition[BaseWorker_T]] = None,
         weighter: Optional[queue.Weighter[BaseWorker_T]] = None,
+        priority: queue.Priority = queue.Priority.INTERACTIVE,
+        dbname: Optional[str] = None,
         **compiler_args: Any,
     ) -> BaseWorker_T:
         raise NotImplementedError
@@ -570,6 +657,62 @@ class AbstractPool[
     ) -> None:
         raise NotImplementedError
 
+    async def _call_coalesced(
+        self,
+        method_name: str,
+        method: Callable[..., Awaitable[Any]],
+        dbname: str,
+        user_schema_pickle: bytes,
+        global_schema_pickle: bytes,
+        reflection_cache: state.ReflectionCache,
+        database_config: Config,
+        system_config: Config,
+        *compile_args: Any,
+        **compiler_args: Any,
+    ) -> Any:
+        # Identical compile requests arriving while one is already being
+        # compiled (e.g. a burst of connections after a deploy) await the
+        # same result instead of each occupying a worker.  Schemas and
+        # configs are compared by identity: they are kept alive by the
+        # running task, so their ids are stable while the key is in use.
+        args = (
+            dbname,
+            user_schema_pickle,
+            global_schema_pickle,
+            reflection_cache,
+            database_config,
+            system_config,
+            *compile_args,
+        )
+        key = (
+            method_name,
+            dbname,
+            id(user_schema_pickle),
+            id(global_schema_pickle),
+            id(reflection_cache),
+            id(database_config),
+            id(system_config),
+            _make_coalescing_key(compile_args),
+            _make_coalescing_key(compiler_args),
+        )
+        try:
+            task = self._inflight_compiles.get(key)
+        except TypeError:
+            return await method(*args, **compiler_args)
+
+        if task is None:
+            task = self._loop.create_task(method(*args, **compiler_args))
+            self._inflight_compiles[key] = task
+            task.add_done_callback(
+                lambda _: self._inflight_compiles.pop(key, None)
+            )
+        else:
+            metrics.compiler_pool_coalesced_requests.inc(1.0, method_name)
+
+        # Shield the shared task so that a cancelled caller (e.g. a
+        # disconnected client) doesn't fail the other waiters.
+        return await asyncio.shield(task)
+
     async def compile(
         self,
         dbname: str,
@@ -580,9 +723,33 @@ class AbstractPool[
         system_config: Config,
         *compile_args: Any,
         **compiler_args: Any,
+    ) -> tuple[dbstate.QueryUnitGroup, bytes, int]:
+        return await self._call_coalesced(
+            "compile",
+            self._compile,
+            dbname,
+            user_schema_pickle,
+            global_schema_pickle,
+            reflection_cache,
+            database_config,
+            system_config,
+            *compile_args,
+            **compiler_args,
+        )
+
+    async def _compile(
+        self,
+        dbname: str,
+        user_schema_pickle: bytes,
+        global_schema_pickle: bytes,
+        reflection_cache: state.ReflectionCache,
+        database_config: Config,
+        system_config: Config,
+        *compile_args: Any,
+        **compiler_args: Any,
     ) -> tuple[dbstate.QueryUnitGroup, bytes, int]:
         fini = lambda: None
-        worker = await self._acquire_worker(**compiler_args)
+        worker = await self._acquire_worker(dbname=dbname, **compiler_args)
         try:
             preargs, sync_state, fini = await self._compute_compile_preargs(
                 "compile",
@@ -643,11 +810,13 @@ class AbstractPool[
         # is faster than `==`.
         worker = await self._acquire_worker(
             condition=lambda w: (w._last_pickled_state is pickled_state),
+            dbname=dbname,
             compiler_args=compiler_args,
         )
 
         dbname_arg = None
         user_schema_pickle_arg = None
+        release_user_schema: SyncFinalizer = lambda: None
         if worker._last_pickled_state is pickled_state:
             # Since we know that this particular worker already has the
             # state, we don't want to waste resources transferring the
@@ -662,7 +831,9 @@ class AbstractPool[
             ):
                 dbname_arg = dbname
             else:
-                user_schema_pickle_arg = user_schema_pickle
+                user_schema_pickle_arg, release_user_schema = (
+                    self._pack_user_schema(user_schema_pickle)
+                )
 
         try:
             units, new_pickled_state = await worker.call(
@@ -677,6 +848,7 @@ class AbstractPool[
             return units, new_pickled_state, 0
 
         finally:
+            release_user_schema()
             # Put the worker at the end of the queue so that the chance
             # of reusing it later (and maximising the chance of
             # the w._last_pickled_state is pickled_state` check returning
@@ -700,7 +872,7 @@ class AbstractPool[
         ]
     ]:
         fini = lambda: None
-        worker = await self._acquire_worker(**compiler_args)
+        worker = await self._acquire_worker(dbname=dbname, **compiler_args)
         try:
             preargs, sync_state, fini = await self._compute_compile_preargs(
                 "compile_notebook",
@@ -733,9 +905,35 @@ class AbstractPool[
         system_config: Config,
         *compile_args: Any,
         **compiler_args: Any,
+    ) -> graphql.TranspiledOperation:
+        return await self._call_coalesced(
+            "compile_graphql",
+            self._compile_graphql,
+            dbname,
+            user_schema_pickle,
+            global_schema_pickle,
+            reflection_cache,
+            database_config,
+            system_config,
+            *compile_args,
+            **compiler_args,
+        )
+
+    async def _compile_graphql(
+        self,
+        dbname: str,
+        user_schema_pickle: bytes,
+        global_schema_pickle: bytes,
+        reflection_cache: state.ReflectionCache,
+        database_config: Config,
+        system_config: Config,
+        *compile_args: Any,
+        **compiler_args: Any,
     ) -> graphql.TranspiledOperation:
         fini = lambda: None
-        worker = await self._acquire_worker(**compiler_args)
+        worker = await self._acquire_worker(
+            priority=queue.Priority.GRAPHQL, dbname=dbname, **compiler_args
+        )
         try:
             preargs, sync_state, fini = await self._compute_compile_preargs(
                 "compile_graphql",
@@ -768,9 +966,33 @@ class AbstractPool[
         system_config: Config,
         *compile_args: Any,
         **compiler_args: Any,
+    ) -> list[dbstate.SQLQueryUnit]:
+        return await self._call_coalesced(
+            "compile_sql",
+            self._compile_sql,
+            dbname,
+            user_schema_pickle,
+            global_schema_pickle,
+            reflection_cache,
+            database_config,
+            system_config,
+            *compile_args,
+            **compiler_args,
+        )
+
+    async def _compile_sql(
+        self,
+        dbname: str,
+        user_schema_pickle: bytes,
+        global_schema_pickle: bytes,
+        reflection_cache: state.ReflectionCache,
+        database_config: Config,
+        system_config: Config,
+        *compile_args: Any,
+        **compiler_args: Any,
     ) -> list[dbstate.SQLQueryUnit]:
         fini = lambda: None
-        worker = await self._acquire_worker(**compiler_args)
+        worker = await self._acquire_worker(dbname=dbname, **compiler_args)
         try:
             preargs, sync_state, fini = await self._compute_compile_preargs(
                 "compile_sql",
@@ -795,7 +1017,9 @@ class AbstractPool[
     # We use a helper function instead of just fully generating the
     # functions in order to make the backtraces a little better.
     async def _simple_call(self, name: str, *args: Any, **kwargs: Any) -> Any:
-        worker = await self._acquire_worker()
+        worker = await self._acquire_worker(
+            priority=_CALL_PRIORITIES.get(name, queue.Priority.INTERACTIVE),
+        )
         try:
             return await worker.call(
                 name,
@@ -963,6 +1187,8 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
     _worker_mod: str = "worker"
     _workers_queue: queue.WorkerQueue[Worker_T]
     _workers: dict[int, Worker_T]
+    _share_user_schemas: bool = True
+    _shared_schemas: Optional[shared_schema.SharedSchemaStore] = None
 
     _poolsock_name: str
     _pool_size: int
@@ -972,6 +1198,8 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
     _running: Optional[bool]
     _stats_spawned: int
     _stats_killed: int
+    _affinity_ring: Optional[queue.AffinityRing]
+    _affinity_ring_pids: tuple[int, ...]
 
     def __init__(
         self,
@@ -1003,6 +1231,55 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
         self._stats_spawned = 0
         self._stats_killed = 0
 
+        self._affinity_ring = None
+        self._affinity_ring_pids = ()
+
+        if self._share_user_schemas and SHARED_SCHEMA_MIN_SIZE > 0:
+            self._shared_schemas = shared_schema.SharedSchemaStore(
+                runstate_dir=runstate_dir,
+                min_size=SHARED_SCHEMA_MIN_SIZE,
+                get_live_pickles=self._iter_live_user_schemas,
+            )
+
+    def _iter_live_user_schemas(self) -> Iterator[bytes]:
+        if self._dbindex is not None:
+            for db in self._dbindex.iter_dbs():
+                if db.user_schema_pickle is not None:
+                    yield db.user_schema_pickle
+
+    def _pack_user_schema(
+        self, user_schema_pickle: bytes
+    ) -> tuple[bytes | state.SharedSchemaRef, SyncFinalizer]:
+        if self._shared_schemas is None:
+            return user_schema_pickle, lambda: None
+        return self._shared_schemas.acquire(user_schema_pickle)
+
+    def _get_user_schema_delta(
+        self,
+        worker: Worker_T,
+        dbname: str,
+        base_pickle: bytes,
+        user_schema_pickle: bytes,
+    ) -> Optional[bytes]:
+        # Only a delta from the immediately preceding schema is kept,
+        # workers holding anything older get a full sync.
+        if self._dbindex is None:
+            return None
+        db = self._dbindex.maybe_get_db(dbname)
+        if (
+            db is None
+            or db.user_schema_delta is None
+            or db.user_schema_pickle is not user_schema_pickle
+        ):
+            return None
+        delta_base, delta = db.user_schema_delta
+        if delta_base is not base_pickle:
+            return None
+        metrics.compiler_process_branch_actions.inc(
+            1, str(worker.get_pid()), DEFAULT_CLIENT, 'schema-delta'
+        )
+        return delta
+
     def _report_branch_request(
         self, worker: Worker_T, cache_hit: bool, client: str = DEFAULT_CLIENT
     ) -> None:
@@ -1014,6 +1291,8 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
             metrics.compiler_process_branch_actions.inc(
                 1, pid, client, 'cache-hit'
             )
+        else:
+            metrics.compiler_pool_schema_sync_misses.inc(1.0, client)
 
     def is_running(self) -> bool:
         return bool(self._running)
@@ -1149,6 +1428,9 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
 
         await self._stop()
 
+        if self._shared_schemas is not None:
+            self._shared_schemas.close()
+
     async def _stop(self) -> None:
         raise NotImplementedError
 
@@ -1174,13 +1456,26 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
         *,
         condition: Optional[queue.AcquireCondition[Worker_T]] = None,
         weighter: Optional[queue.Weighter[Worker_T]] = None,
+        priority: queue.Priority = queue.Priority.INTERACTIVE,
+        dbname: Optional[str] = None,
         **compiler_args: Any,
     ) -> Worker_T:
         start_time = time.monotonic()
+        # Requests are queued fairly per tenant (if any) and branch
+        flow = (compiler_args.get("client_id"), dbname)
+        candidates: tuple[Hashable, ...] = ()
+        if weighter is None and dbname is not None and AFFINITY_CHOICES:
+            candidates = self._get_affinity_candidates(dbname)
+            weighter = functools.partial(
+                self._affinity_weighter, dbname, candidates
+            )
         try:
             while (
                 worker := await self._workers_queue.acquire(
-                    condition=condition, weighter=weighter
+                    condition=condition,
+                    weighter=weighter,
+                    priority=priority,
+                    flow=flow,
                 )
             ).get_pid() not in self._workers:
                 # The worker was disconnected; skip to the next one.
@@ -1192,11 +1487,51 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
             metrics.compiler_pool_queue_errors.inc(1.0, "ise")
             raise
         else:
-            metrics.compiler_pool_wait_time.observe(
-                time.monotonic() - start_time
+            wait_time = time.monotonic() - start_time
+            metrics.compiler_pool_wait_time.observe(wait_time)
+            metrics.compiler_pool_queue_wait_time.observe(
+                wait_time, priority.name.lower()
             )
+            if candidates:
+                assert self._affinity_ring is not None
+                self._affinity_ring.add_load(worker.get_pid())
+                metrics.compiler_pool_affinity_routing.inc(
+                    1.0,
+                    "home" if worker.get_pid() in candidates else "spill",
+                )
             return worker
 
+    def _get_affinity_candidates(self, dbname: str) -> tuple[Hashable, ...]:
+        # Branches are mapped to workers with a consistent hash ring, so
+        # that each worker keeps serving (and caching) the same subset
+        # of branches even as workers come and go.
+        pids = tuple(self._workers)
+        if self._affinity_ring is None or pids != self._affinity_ring_pids:
+            self._affinity_ring = queue.AffinityRing(pids)
+            self._affinity_ring_pids = pids
+        return self._affinity_ring.get_candidates(dbname, AFFINITY_CHOICES)
+
+    def _affinity_weighter(
+        self,
+        dbname: str,
+        candidates: tuple[Hashable, ...],
+        worker: Worker_T,
+    ) -> queue.Comparable:
+        # Of the idle workers, prefer one that already has the branch,
+        # then one of its home workers in ring order.  Taking any idle
+        # worker when the home ones are busy (power of two choices), or
+        # when they are overloaded even though idle right now, bounds
+        # the load of the home workers of hot branches.
+        assert self._affinity_ring is not None
+        pid = worker.get_pid()
+        overloaded = self._affinity_ring.is_overloaded(
+            pid, AFFINITY_LOAD_FACTOR)
+        try:
+            affinity = len(candidates) - candidates.index(pid)
+        except ValueError:
+            affinity = 0
+        return not overloaded, dbname in worker._dbs, affinity
+
     def _release_worker(
         self,
         worker: Worker_T,
@@ -1215,6 +1550,11 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
         return dict(
             worker_pids=list(self._workers.keys()),
             template_pid=self.get_template_pid(),
+            shared_schemas_size=(
+                self._shared_schemas.get_total_size()
+                if self._shared_schemas is not None
+                else 0
+            ),
         )
 
     def refresh_metrics(self) -> None:
@@ -1796,6 +2136,238 @@ class RemotePool(AbstractPool[RemoteWorker, InitArgs, RemoteInitArgsPickle]):
         return await super().health_check()
 
 
+class ThreadWorker(BaseWorker):
+    _manager: ThreadPool
+    _state: thread_worker.WorkerState
+
+    def __init__(
+        self,
+        manager: ThreadPool,
+        worker_state: thread_worker.WorkerState,
+        *args: Any,
+    ) -> None:
+        super().__init__(*args)
+        self._manager = manager
+        self._state = worker_state
+
+    async def call(
+        self,
+        method_name: str,
+        *args: Any,
+        sync_state: Optional[SyncStateCallback] = None,
+    ) -> Any:
+        assert not self._closed
+        # The state is shared, so there's nothing to sync
+        assert sync_state is None
+
+        try:
+            return await self._manager._run_in_thread(
+                self._state.call, method_name, *args
+            )
+        finally:
+            self._last_used = time.monotonic()
+
+    def close(self) -> None:
+        self._closed = True
+
+
+@srvargs.CompilerPoolMode.Threaded.assign_implementation
+class ThreadPool(AbstractPool[ThreadWorker, InitArgs, bytes]):
+    """In-process compiler pool running the compilers in threads.
+
+    All workers share one compiler and unpickle each schema only once,
+    and the requests and results are not pickled, which saves memory
+    and IPC overhead compared to the process pools.  The compilation
+    is CPU-bound Python code, so this is only useful on free-threaded
+    builds of CPython.
+    """
+
+    _pool_size: int
+    _running: Optional[bool]
+    _executor: Optional[concurrent.futures.ThreadPoolExecutor]
+    _workers_queue: queue.WorkerQueue[ThreadWorker]
+    _workers: list[ThreadWorker]
+    _schemas: Optional[thread_worker.SchemaCache]
+    _num_running_calls: int
+
+    def __init__(
+        self,
+        *,
+        pool_size: int,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._pool_size = pool_size
+        self._running = None
+        self._executor = None
+        self._workers_queue = queue.WorkerQueue(self._loop)
+        self._workers = []
+        self._schemas = None
+        self._num_running_calls = 0
+
+    async def start(self) -> None:
+        from . import thread_worker
+
+        if self._running is not None:
+            raise RuntimeError(
+                'the compiler pool has already been started once')
+
+        if getattr(sys, "_is_gil_enabled", lambda: True)():
+            logger.warning(
+                "the threaded compiler pool is used with the GIL enabled, "
+                "compilation will not run in parallel"
+            )
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._pool_size,
+            thread_name_prefix="gel-compiler",
+        )
+        # Every worker might be compiling for a different branch, plus
+        # the global schema.
+        self._schemas = thread_worker.SchemaCache(
+            self._pool_size * self._worker_branch_limit + 1
+        )
+        compiler_ = await self._run_in_thread(
+            thread_worker.new_compiler,
+            self._backend_runtime_params,
+            self._std_schema,
+            self._refl_schema,
+            self._schema_class_layout,
+        )
+        # The global schema and config are passed along with every
+        # request, the workers don't keep their own copies.
+        init_args = self._make_init_args(
+            pickle.dumps(None, -1), immutables.Map()
+        )
+        for _ in range(self._pool_size):
+            worker = ThreadWorker(
+                self,
+                thread_worker.WorkerState(
+                    compiler_, self._std_schema, self._schemas
+                ),
+                *init_args,
+            )
+            self._workers.append(worker)
+            self._workers_queue.release(worker)
+
+        self._running = True
+        logger.info(
+            "started %d in-process compiler workers", self._pool_size
+        )
+
+    async def stop(self) -> None:
+        if not self._running:
+            return
+        self._running = False
+
+        for worker in self._workers:
+            worker.close()
+        self._workers.clear()
+        self._workers_queue = queue.WorkerQueue(self._loop)
+
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await self._loop.run_in_executor(
+                None, functools.partial(executor.shutdown, wait=True)
+            )
+
+    async def _run_in_thread(
+        self, func: Callable[..., Any], *args: Any
+    ) -> Any:
+        assert self._executor is not None
+        self._num_running_calls += 1
+        try:
+            return await self._loop.run_in_executor(
+                self._executor, functools.partial(func, *args)
+            )
+        finally:
+            self._num_running_calls -= 1
+            if self._num_running_calls == 0:
+                from . import thread_worker
+                thread_worker.clear_caches()
+
+    async def _acquire_worker(
+        self,
+        *,
+        condition: Optional[queue.AcquireCondition[ThreadWorker]] = None,
+        weighter: Optional[queue.Weighter[ThreadWorker]] = None,
+        priority: queue.Priority = queue.Priority.INTERACTIVE,
+        dbname: Optional[str] = None,
+        **compiler_args: Any,
+    ) -> ThreadWorker:
+        start_time = time.monotonic()
+        try:
+            worker = await self._workers_queue.acquire(
+                condition=condition,
+                weighter=weighter,
+                priority=priority,
+                flow=dbname,
+            )
+        except TimeoutError:
+            metrics.compiler_pool_queue_errors.inc(1.0, "timeout")
+            raise
+        except Exception:
+            metrics.compiler_pool_queue_errors.inc(1.0, "ise")
+            raise
+        else:
+            wait_time = time.monotonic() - start_time
+            metrics.compiler_pool_wait_time.observe(wait_time)
+            metrics.compiler_pool_queue_wait_time.observe(
+                wait_time, priority.name.lower()
+            )
+            return worker
+
+    def _release_worker(
+        self,
+        worker: ThreadWorker,
+        *,
+        put_in_front: bool = True,
+    ) -> None:
+        if not worker._closed:
+            self._workers_queue.release(worker, put_in_front=put_in_front)
+        self._maybe_update_last_active_time()
+
+    async def _compute_compile_preargs(
+        self,
+        method_name: str,
+        worker: ThreadWorker,
+        dbname: str,
+        user_schema_pickle: bytes,
+        global_schema_pickle: bytes,
+        reflection_cache: state.ReflectionCache,
+        database_config: Config,
+        system_config: Config,
+    ) -> tuple[PreArgs, Optional[SyncStateCallback], SyncFinalizer]:
+        # Workers share all the state, so it's passed by reference as-is
+        # and schemas are only unpickled when seen for the first time.
+        preargs = (
+            method_name,
+            user_schema_pickle,
+            reflection_cache,
+            global_schema_pickle,
+            database_config,
+            system_config,
+        )
+        return preargs, None, lambda: None
+
+    def get_debug_info(self) -> dict[str, Any]:
+        return dict(
+            size=self._pool_size,
+            free=self._workers_queue.qsize(),
+            cached_schemas=(
+                len(self._schemas) if self._schemas is not None else 0
+            ),
+        )
+
+    def get_size_hint(self) -> int:
+        return self._pool_size
+
+    async def health_check(self) -> bool:
+        if not self._running:
+            return False
+        return await super().health_check()
+
+
 @dataclasses.dataclass
 class TenantSchema:
     client_id: int
@@ -1960,6 +2532,7 @@ class MultiTenantWorker(
 class MultiTenantPool(FixedPoolImpl[MultiTenantWorker, MultiTenantInitArgs]):
     _worker_class = MultiTenantWorker
     _worker_mod = "multitenant_worker"
+    _share_user_schemas = False
 
     def __init__(self, *, cache_size: int, **kwargs: Any) -> None:
         super().__init__(**kwargs)
@@ -2280,6 +2853,7 @@ class MultiTenantPool(FixedPoolImpl[MultiTenantWorker, MultiTenantInitArgs]):
         worker = await self._acquire_worker(
             condition=lambda w: (w._last_pickled_state is pickled_state),
             weighter=cast(queue.Weighter, weighter),
+            dbname=dbname,
             **compiler_args,
         )
 
@@ -19,7 +19,11 @@
 from __future__ import annotations
 
 import asyncio
+import bisect
 import collections
+import enum
+import heapq
+import itertools
 import typing
 
 
@@ -44,45 +48,120 @@ class Weighter(typing.Protocol[W2]):
         ...
 
 
+class Priority(enum.IntEnum):
+    """Scheduling class of a request waiting for a worker."""
+
+    INTERACTIVE = 0
+    GRAPHQL = 1
+    DDL = 2
+    INTROSPECTION = 3
+
+
+# Relative share of workers each scheduling class gets when requests of
+# several classes are waiting at the same time.
+PRIORITY_WEIGHTS: dict[Priority, float] = {
+    Priority.INTERACTIVE: 8.0,
+    Priority.GRAPHQL: 4.0,
+    Priority.DDL: 2.0,
+    Priority.INTROSPECTION: 1.0,
+}
+
+# Forget finish tags of idle flows once there are that many of them.
+_MAX_IDLE_FLOWS = 1024
+
+# Points of every worker on the affinity ring, more points spread the
+# keys more evenly between the workers.
+AFFINITY_VNODES = 64
+_MAX_CACHED_CANDIDATES = 4096
+# The loads of the nodes are halved once that many requests per node were
+# recorded, so that only the recent load counts.
+AFFINITY_LOAD_WINDOW = 64
+
+
+class _Waiter(typing.NamedTuple):
+    tag: float
+    seq: int
+    future: asyncio.Future[None]
+
+
 class WorkerQueue[W]:
+    """Queue of idle workers with weighted fair queuing of waiters.
+
+    When no worker is available, waiters are served in the order of
+    their virtual finish tags (start-time fair queuing): every flow --
+    a (priority class, flow key) pair, the key usually identifying the
+    tenant and branch -- advances its own tag by ``1 / weight`` on each
+    request.  A burst of requests from one flow thus only delays that
+    flow, and classes share the workers proportionally to their weights
+    instead of in the arrival order.
+    """
 
     loop: asyncio.AbstractEventLoop
 
-    _waiters: collections.deque[asyncio.Future[None]]
+    _waiters: list[_Waiter]
     _queue: collections.deque[W]
+    _flow_tags: dict[typing.Hashable, float]
+    _vtime: float
 
     def __init__(
         self,
         loop: asyncio.AbstractEventLoop,
     ) -> None:
         self._loop = loop
-        self._waiters = collections.deque()
+        self._waiters = []
         self._queue = collections.deque()
+        self._flow_tags = {}
+        self._vtime = 0.0
+        self._seq = itertools.count()
+
+    def _make_waiter(
+        self,
+        priority: Priority,
+        flow: typing.Hashable,
+    ) -> _Waiter:
+        key = (priority, flow)
+        tag = (
+            max(self._vtime, self._flow_tags.get(key, 0.0))
+            + 1.0 / PRIORITY_WEIGHTS[priority]
+        )
+        self._flow_tags[key] = tag
+        return _Waiter(tag, next(self._seq), self._loop.create_future())
+
+    def _prune_flows(self) -> None:
+        if not self._waiters:
+            self._flow_tags.clear()
+        elif len(self._flow_tags) > _MAX_IDLE_FLOWS:
+            self._flow_tags = {
+                key: tag
+                for key, tag in self._flow_tags.items()
+                if tag > self._vtime
+            }
 
     async def acquire(
         self,
         *,
         condition: typing.Optional[AcquireCondition[W]] = None,
         weighter: typing.Optional[Weighter[W]] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        flow: typing.Hashable = None,
     ) -> W:
         # There can be a race between a waiter scheduled for to wake up
         # and a worker being stolen (due to quota being enforced,
         # for example).  In which case the waiter might get finally
         # woken up with an empty queue -- hence we use a `while` loop here.
-        attempts = 0
+        entry = None
         while not self._queue:
-            waiter = self._loop.create_future()
-
-            attempts += 1
-            if attempts > 1:
+            if entry is None:
+                # On the first attempt the waiter is placed according
+                # to the finish tag of its flow.
+                entry = self._make_waiter(priority, flow)
+            else:
                 # If the waiter was woken up only to discover that
                 # it needs to wait again, we don't want it to lose
-                # its place in the waiters queue.
-                self._waiters.appendleft(waiter)
-            else:
-                # On the first attempt the waiter goes to the end
-                # of the waiters queue.
-                self._waiters.append(waiter)
+                # its place in the waiters queue, so the tag is kept.
+                entry = entry._replace(future=self._loop.create_future())
+            heapq.heappush(self._waiters, entry)
+            waiter = entry.future
 
             try:
                 await waiter
@@ -90,11 +169,13 @@ class WorkerQueue[W]:
                 if not waiter.done():
                     waiter.cancel()
                 try:
-                    self._waiters.remove(waiter)
+                    self._waiters.remove(entry)
                 except ValueError:
                     # The waiter could be removed from self._waiters
                     # by a previous release() call.
                     pass
+                else:
+                    heapq.heapify(self._waiters)
                 if self._queue and not waiter.cancelled():
                     # We were woken up by release(), but can't take
                     # the call.  Wake up the next in line.
@@ -137,7 +218,91 @@ class WorkerQueue[W]:
 
     def _wakeup_next_waiter(self) -> None:
         while self._waiters:
-            waiter = self._waiters.popleft()
-            if not waiter.done():
-                waiter.set_result(None)
+            entry = heapq.heappop(self._waiters)
+            if not entry.future.done():
+                self._vtime = max(self._vtime, entry.tag)
+                entry.future.set_result(None)
                 break
+        self._prune_flows()
+
+
+class AffinityRing:
+    """Consistent hash ring mapping keys (e.g. branches) to nodes (workers).
+
+    Adding or removing a node only remaps the keys that were next to
+    its points on the ring, so the other nodes keep serving (and
+    caching) the same keys.  The recent load of every node is tracked
+    too, so that the keys of an overloaded node can be spilled over to
+    the others (consistent hashing with bounded loads).
+    """
+
+    _ring: list[tuple[int, typing.Hashable]]
+    _hashes: list[int]
+    _num_nodes: int
+    _candidates: dict[tuple[typing.Hashable, int], tuple[typing.Hashable, ...]]
+    _loads: dict[typing.Hashable, int]
+    _total_load: int
+
+    def __init__(
+        self,
+        nodes: typing.Iterable[typing.Hashable],
+        *,
+        vnodes: int = AFFINITY_VNODES,
+    ) -> None:
+        node_set = set(nodes)
+        self._ring = sorted(
+            (hash((node, i)), node)
+            for node in node_set
+            for i in range(vnodes)
+        )
+        self._hashes = [h for h, _ in self._ring]
+        self._num_nodes = len(node_set)
+        self._candidates = {}
+        self._loads = {}
+        self._total_load = 0
+
+    def get_candidates(
+        self,
+        key: typing.Hashable,
+        num: int,
+    ) -> tuple[typing.Hashable, ...]:
+        """Return up to *num* distinct nodes for *key* by preference."""
+        cache_key = (key, num)
+        rv = self._candidates.get(cache_key)
+        if rv is not None:
+            return rv
+
+        num = min(num, self._num_nodes)
+        result: list[typing.Hashable] = []
+        if num:
+            idx = bisect.bisect(self._hashes, hash(key))
+            for i in range(len(self._ring)):
+                node = self._ring[(idx + i) % len(self._ring)][1]
+                if node not in result:
+                    result.append(node)
+                    if len(result) == num:
+                        break
+
+        if len(self._candidates) >= _MAX_CACHED_CANDIDATES:
+            self._candidates.clear()
+        rv = self._candidates[cache_key] = tuple(result)
+        return rv
+
+    def add_load(self, node: typing.Hashable) -> None:
+        """Record a request served by *node*."""
+        self._loads[node] = self._loads.get(node, 0) + 1
+        self._total_load += 1
+        if self._total_load >= AFFINITY_LOAD_WINDOW * self._num_nodes:
+            self._loads = {n: load // 2 for n, load in self._loads.items()}
+            self._total_load = sum(self._loads.values())
+
+    def is_overloaded(self, node: typing.Hashable, factor: float) -> bool:
+        """Whether *node* served more than *factor* times its fair share.
+
+        The fair share is never less than one request, so that a few
+        requests don't spread a key over all the nodes.
+        """
+        if not self._num_nodes:
+            return False
+        fair_share = max(self._total_load / self._num_nodes, 1.0)
+        return self._loads.get(node, 0) > factor * fair_share
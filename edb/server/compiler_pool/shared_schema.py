@@ -0,0 +1,195 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Transfer of pickled user schemas to local compiler workers via mmap.
+
+Instead of writing a (potentially multi-megabyte) pickled user schema
+into the pipe of every worker that needs it, the pool publishes it once
+into a file in a memory-backed directory (``/dev/shm`` when available)
+and sends a small :class:`state.SharedSchemaRef` instead.  Workers map
+the file read-only and unpickle straight from the shared pages, and
+reuse the unpickled schema for every branch referring to the same
+generation.  Only the pickle bytes are shared: every worker still
+deserializes its own copy of the schema.
+"""
+
+from __future__ import annotations
+from typing import Callable, Iterable
+
+import dataclasses
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+
+from edb.schema import schema as s_schema
+
+from . import state
+
+
+_DIR_PREFIX = "gel-schema-"
+
+
+@dataclasses.dataclass
+class _Segment:
+    # The published pickle is referenced to keep its id() stable
+    user_schema_pickle: bytes
+    ref: state.SharedSchemaRef
+    in_flight: int = 0
+
+
+class SharedSchemaStore:
+    """Pool-side registry of user schemas published into shared memory."""
+
+    _dir: str
+    _min_size: int
+    _generation: int
+    _segments: dict[int, _Segment]
+    _get_live_pickles: Callable[[], Iterable[bytes]]
+
+    def __init__(
+        self,
+        *,
+        runstate_dir: str,
+        min_size: int,
+        get_live_pickles: Callable[[], Iterable[bytes]],
+    ) -> None:
+        base_dir = "/dev/shm" if os.path.isdir("/dev/shm") else runstate_dir
+        _remove_stale_dirs(base_dir)
+        self._dir = tempfile.mkdtemp(
+            prefix=f"{_DIR_PREFIX}{os.getpid()}-", dir=base_dir)
+        self._min_size = min_size
+        self._generation = 0
+        self._segments = {}
+        self._get_live_pickles = get_live_pickles
+
+    def acquire(
+        self, user_schema_pickle: bytes
+    ) -> tuple[bytes | state.SharedSchemaRef, Callable[[], None]]:
+        """Return what to send to a worker in place of the pickle.
+
+        The returned callback must be called once the worker request is
+        done, after which the segment may be released if the schema is
+        no longer used by any branch.
+        """
+        if len(user_schema_pickle) < self._min_size:
+            return user_schema_pickle, lambda: None
+
+        segment = self._segments.get(id(user_schema_pickle))
+        if segment is None:
+            self._prune()
+            segment = self._publish(user_schema_pickle)
+        segment.in_flight += 1
+
+        def release() -> None:
+            segment.in_flight -= 1
+            if segment.in_flight == 0:
+                self._prune()
+
+        return segment.ref, release
+
+    def _publish(self, user_schema_pickle: bytes) -> _Segment:
+        self._generation += 1
+        path = os.path.join(self._dir, str(self._generation))
+        with open(path, "wb") as f:
+            f.write(user_schema_pickle)
+        segment = _Segment(
+            user_schema_pickle=user_schema_pickle,
+            ref=state.SharedSchemaRef(
+                path=path,
+                size=len(user_schema_pickle),
+                generation=self._generation,
+            ),
+        )
+        self._segments[id(user_schema_pickle)] = segment
+        return segment
+
+    def _prune(self) -> None:
+        live = {id(p) for p in self._get_live_pickles()}
+        for key, segment in list(self._segments.items()):
+            if segment.in_flight == 0 and key not in live:
+                del self._segments[key]
+                try:
+                    os.unlink(segment.ref.path)
+                except OSError:
+                    pass
+
+    def get_total_size(self) -> int:
+        return sum(s.ref.size for s in self._segments.values())
+
+    def close(self) -> None:
+        self._segments.clear()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def _remove_stale_dirs(base_dir: str) -> None:
+    # Remove the directories left behind by servers that didn't shut
+    # down cleanly, recognized by the PID of their owner.
+    try:
+        names = os.listdir(base_dir)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith(_DIR_PREFIX):
+            continue
+        pid, _, _ = name[len(_DIR_PREFIX):].partition("-")
+        try:
+            os.kill(int(pid), 0)
+        except ValueError:
+            continue
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(base_dir, name), ignore_errors=True)
+        except OSError:
+            # The process exists, but is owned by someone else
+            pass
+
+
+# Worker side: unpickled schemas by generation, shared by all branches
+# of the worker referring to the same generation.
+_loaded: dict[int, s_schema.Schema] = {}
+
+
+def load_user_schema(
+    data: bytes | state.SharedSchemaRef,
+) -> s_schema.Schema:
+    if not isinstance(data, state.SharedSchemaRef):
+        return pickle.loads(data)
+
+    schema = _loaded.get(data.generation)
+    if schema is None:
+        with open(data.path, "rb") as f:
+            with mmap.mmap(
+                f.fileno(), data.size, access=mmap.ACCESS_READ
+            ) as buf:
+                schema = pickle.loads(buf)
+        _loaded[data.generation] = schema
+    return schema
+
+
+def retain_user_schemas(schemas: Iterable[s_schema.Schema]) -> None:
+    """Forget unpickled schemas not used by any of the given *schemas*.
+
+    Must be called after every load_user_schema(), with all the schemas
+    the worker still holds on to, so that schemas of stale generations
+    don't accumulate.
+    """
+    live = {id(schema) for schema in schemas}
+    for generation, schema in list(_loaded.items()):
+        if id(schema) not in live:
+            del _loaded[generation]
@@ -51,6 +51,20 @@ class PickledDatabaseState(typing.NamedTuple):
         )
 
 
+class SharedSchemaRef(typing.NamedTuple):
+    """A pickled user schema published by the pool into a shared file."""
+
+    path: str
+    size: int
+    generation: int
+
+
+class UserSchemaDelta(typing.NamedTuple):
+    """A pickled FlatSchemaDelta from the user schema a worker holds."""
+
+    delta: bytes
+
+
 class FailedStateSync(Exception):
     pass
 
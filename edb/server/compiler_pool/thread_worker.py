@@ -0,0 +1,282 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""In-process compiler workers for the threaded compiler pool.
+
+This is the counterpart of ``worker.py`` for ``ThreadPool``: instead of
+every worker process holding its own copy of the std, global and user
+schemas, all threads share one compiler and unpickle each schema
+once.  Only the per-connection transaction state is kept per worker.
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Mapping, Optional
+
+import collections
+import pickle
+import threading
+import traceback
+
+import immutables
+
+from edb import graphql
+from edb.common import lru
+from edb.pgsql import params as pgparams
+from edb.schema import reflection as s_refl
+from edb.schema import schema as s_schema
+from edb.server import compiler
+from edb.server import config
+
+from . import state
+from . import worker
+from . import worker_proc
+
+
+Config = immutables.Map[str, config.SettingValue]
+
+
+def new_compiler(
+    backend_runtime_params: pgparams.BackendRuntimeParams,
+    std_schema: s_schema.Schema,
+    refl_schema: s_schema.Schema,
+    schema_class_layout: s_refl.SchemaClassLayout,
+) -> compiler.Compiler:
+    return compiler.new_compiler(
+        std_schema,
+        refl_schema,
+        schema_class_layout,
+        backend_runtime_params=backend_runtime_params,
+        config_spec=None,
+    )
+
+
+class SchemaCache:
+    """Unpickled schemas shared by all threads, keyed by pickle identity.
+
+    The pickles are referenced by the cache entries, so their ids are
+    stable for as long as the entries are alive.
+    """
+
+    _maxsize: int
+    _lock: threading.Lock
+    _entries: collections.OrderedDict[int, tuple[bytes, s_schema.Schema]]
+
+    def __init__(self, maxsize: int) -> None:
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def get(self, schema_pickle: bytes) -> s_schema.Schema:
+        key = id(schema_pickle)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        # Unpickle without holding the lock; if another thread raced us
+        # to it, the first result wins so that only one copy is kept.
+        schema = pickle.loads(schema_pickle)
+        with self._lock:
+            entry = self._entries.setdefault(key, (schema_pickle, schema))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+        return entry[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class WorkerState:
+    """State of one worker of the threaded pool.
+
+    A worker is only ever used by one thread at a time, the compiler and
+    the schema cache are shared.
+    """
+
+    _compiler: compiler.Compiler
+    _std_schema: s_schema.Schema
+    _schemas: SchemaCache
+    _last_state: Optional[compiler.dbstate.CompilerConnectionState]
+    _last_state_pickle: Optional[bytes]
+
+    def __init__(
+        self,
+        compiler_: compiler.Compiler,
+        std_schema: s_schema.Schema,
+        schemas: SchemaCache,
+    ) -> None:
+        self._compiler = compiler_
+        self._std_schema = std_schema
+        self._schemas = schemas
+        self._last_state = None
+        self._last_state_pickle = None
+
+    def compile(
+        self,
+        user_schema: bytes,
+        reflection_cache: state.ReflectionCache,
+        global_schema: bytes,
+        database_config: Config,
+        system_config: Config,
+        *compile_args: Any,
+        **compile_kwargs: Any,
+    ) -> tuple[compiler.QueryUnitGroup, Optional[bytes]]:
+        units, cstate = self._compiler.compile_serialized_request(
+            self._schemas.get(user_schema),
+            self._schemas.get(global_schema),
+            reflection_cache,
+            database_config,
+            system_config,
+            *compile_args,
+            **compile_kwargs
+        )
+
+        # The transaction state is still pickled: the I/O side may
+        # fall back to any earlier state (e.g. on a failed query),
+        # so it must not change under it.
+        self._last_state = cstate
+        self._last_state_pickle = None
+        if cstate is not None:
+            self._last_state_pickle = pickle.dumps(cstate, -1)
+
+        return units, self._last_state_pickle
+
+    def compile_in_tx(
+        self,
+        dbname: Optional[str],
+        user_schema: Optional[bytes],
+        cstate: Any,
+        *args: Any,
+        **kwargs: Any,
+    ) -> tuple[compiler.QueryUnitGroup, Optional[bytes]]:
+        prev_last_state_key = None
+        if cstate == state.REUSE_LAST_STATE_MARKER:
+            assert self._last_state is not None
+            cstate = self._last_state
+            prev_last_state_key = cstate.get_state_key()
+        else:
+            cstate = pickle.loads(cstate)
+            self._last_state_pickle = None
+            assert user_schema is not None
+            cstate.set_root_user_schema(self._schemas.get(user_schema))
+        units, cstate = self._compiler.compile_serialized_request_in_tx(
+            cstate, *args, **kwargs)
+
+        self._last_state = cstate
+
+        if (
+            prev_last_state_key is None
+            or self._last_state_pickle is None
+            or prev_last_state_key != cstate.get_state_key()
+        ):
+            self._last_state_pickle = pickle.dumps(cstate, -1)
+
+        return units, self._last_state_pickle
+
+    def compile_notebook(
+        self,
+        user_schema: bytes,
+        reflection_cache: state.ReflectionCache,
+        global_schema: bytes,
+        database_config: Config,
+        system_config: Config,
+        *compile_args: Any,
+        **compile_kwargs: Any,
+    ):
+        return self._compiler.compile_notebook(
+            self._schemas.get(user_schema),
+            self._schemas.get(global_schema),
+            reflection_cache,
+            database_config,
+            system_config,
+            *compile_args,
+            **compile_kwargs
+        )
+
+    def compile_graphql(
+        self,
+        user_schema: bytes,
+        reflection_cache: state.ReflectionCache,
+        global_schema: bytes,
+        database_config: Config,
+        system_config: Config,
+        session_config: Mapping[str, Any],
+        *compile_args: Any,
+        **compile_kwargs: Any,
+    ) -> tuple[compiler.QueryUnitGroup, graphql.TranspiledOperation]:
+        return worker.compile_graphql_operation(
+            self._compiler,
+            self._std_schema,
+            self._schemas.get(user_schema),
+            self._schemas.get(global_schema),
+            reflection_cache,
+            database_config,
+            system_config,
+            session_config,
+            *compile_args,
+            **compile_kwargs
+        )
+
+    def compile_sql(
+        self,
+        user_schema: bytes,
+        reflection_cache: state.ReflectionCache,
+        global_schema: bytes,
+        database_config: Config,
+        system_config: Config,
+        *compile_args: Any,
+        **compile_kwargs: Any,
+    ):
+        return self._compiler.compile_sql(
+            self._schemas.get(user_schema),
+            self._schemas.get(global_schema),
+            reflection_cache,
+            database_config,
+            system_config,
+            *compile_args,
+            **compile_kwargs
+        )
+
+    def get_handler(self, methname: str) -> Callable[..., Any]:
+        if methname in {
+            "compile",
+            "compile_in_tx",
+            "compile_notebook",
+            "compile_graphql",
+            "compile_sql",
+        }:
+            return getattr(self, methname)
+        else:
+            return getattr(self._compiler, methname)
+
+    def call(self, methname: str, *args: Any) -> Any:
+        try:
+            return self.get_handler(methname)(*args)
+        except Exception as ex:
+            # Mirror what worker_proc does for process workers and don't
+            # let the traceback keep heavy objects like schemas alive.
+            ex.__formatted_error__ = traceback.format_exc()  # type: ignore
+            worker_proc.clear_exception_frames(ex)
+            raise
+
+
+def clear_caches() -> None:
+    # Called when no compilation is running, see worker_proc.worker()
+    lru.clear_lru_caches()
@@ -33,6 +33,7 @@ from edb.server import compiler
 from edb.server import config
 from edb.server import defines
 
+from . import shared_schema
 from . import state
 from . import worker_proc
 
@@ -86,7 +87,9 @@ def __init_worker__(
 def __sync__(
     dbname: str,
     evicted_dbs: list[str],
-    user_schema: Optional[bytes],
+    user_schema: Optional[
+        bytes | state.SharedSchemaRef | state.UserSchemaDelta
+    ],
     reflection_cache: Optional[bytes],
     global_schema: Optional[bytes],
     database_config: Optional[bytes],
@@ -108,7 +111,9 @@ def __sync__(
             assert user_schema is not None
             assert reflection_cache is not None
             assert database_config is not None
-            user_schema_unpacked = pickle.loads(user_schema)
+            user_schema_unpacked = shared_schema.load_user_schema(
+                user_schema
+            )
             reflection_cache_unpacked = pickle.loads(reflection_cache)
             database_config_unpacked = pickle.loads(database_config)
             db = state.DatabaseState(
@@ -121,8 +126,16 @@ def __sync__(
         else:
             updates = {}
 
-            if user_schema is not None:
-                updates['user_schema'] = pickle.loads(user_schema)
+            if isinstance(user_schema, state.UserSchemaDelta):
+                base_schema = db.user_schema
+                assert isinstance(base_schema, s_schema.FlatSchema)
+                updates['user_schema'] = base_schema.apply_delta(
+                    pickle.loads(user_schema.delta)
+                )
+            elif user_schema is not None:
+                updates['user_schema'] = shared_schema.load_user_schema(
+                    user_schema
+                )
             if reflection_cache is not None:
                 updates['reflection_cache'] = pickle.loads(reflection_cache)
             if database_config is not None:
@@ -138,6 +151,11 @@ def __sync__(
         if system_config is not None:
             INSTANCE_CONFIG = pickle.loads(system_config)
 
+        if evicted_dbs or user_schema is not None:
+            shared_schema.retain_user_schemas(
+                db.user_schema for db in DBS.values()
+            )
+
     except Exception as ex:
         raise state.FailedStateSync(
             f'failed to sync worker state: {type(ex).__name__}({ex})') from ex
@@ -187,7 +205,11 @@ def compile(
 
 
 def compile_in_tx(
-    dbname: Optional[str], user_schema: Optional[bytes], cstate, *args, **kwargs
+    dbname: Optional[str],
+    user_schema: Optional[bytes | state.SharedSchemaRef],
+    cstate,
+    *args,
+    **kwargs,
 ):
     global LAST_STATE, LAST_STATE_PICKLE
 
@@ -201,7 +223,11 @@ def compile_in_tx(
         LAST_STATE_PICKLE = None
         if dbname is None:
             assert user_schema is not None
-            cstate.set_root_user_schema(pickle.loads(user_schema))
+            root_user_schema = shared_schema.load_user_schema(user_schema)
+            shared_schema.retain_user_schemas(
+                [root_user_schema, *(db.user_schema for db in DBS.values())]
+            )
+            cstate.set_root_user_schema(root_user_schema)
         else:
             cstate.set_root_user_schema(DBS[dbname].user_schema)
     units, cstate = COMPILER.compile_serialized_request_in_tx(
@@ -276,12 +302,38 @@ def compile_graphql(
         system_config,
     )
 
-    gql_op = graphql.compile_graphql(
+    return compile_graphql_operation(
+        COMPILER,
         STD_SCHEMA,
         db.user_schema,
         GLOBAL_SCHEMA,
+        db.reflection_cache,
         db.database_config,
         INSTANCE_CONFIG,
+        session_config,
+        *compile_args,
+        **compile_kwargs
+    )
+
+
+def compile_graphql_operation(
+    compiler_: compiler.Compiler,
+    std_schema: s_schema.Schema,
+    user_schema: s_schema.Schema,
+    global_schema: s_schema.Schema,
+    reflection_cache: state.ReflectionCache,
+    database_config: immutables.Map[str, config.SettingValue],
+    system_config: immutables.Map[str, config.SettingValue],
+    session_config: Mapping[str, Any],
+    *compile_args: Any,
+    **compile_kwargs: Any,
+) -> tuple[compiler.QueryUnitGroup, graphql.TranspiledOperation]:
+    gql_op = graphql.compile_graphql(
+        std_schema,
+        user_schema,
+        global_schema,
+        database_config,
+        system_config,
         *compile_args,
         **compile_kwargs
     )
@@ -290,7 +342,7 @@ def compile_graphql(
         edgeql.generate_source(gql_op.edgeql_ast, pretty=True),
     )
 
-    cfg_ser = COMPILER.state.compilation_config_serializer
+    cfg_ser = compiler_.state.compilation_config_serializer
     request = compiler.CompilationRequest(
         source=source,
         protocol_version=defines.CURRENT_PROTOCOL,
@@ -307,12 +359,12 @@ def compile_graphql(
         session_config=session_config,
     )
 
-    unit_group, _ = COMPILER.compile(
-        user_schema=db.user_schema,
-        global_schema=GLOBAL_SCHEMA,
-        reflection_cache=db.reflection_cache,
-        database_config=db.database_config,
-        system_config=INSTANCE_CONFIG,
+    unit_group, _ = compiler_.compile(
+        user_schema=user_schema,
+        global_schema=global_schema,
+        reflection_cache=reflection_cache,
+        database_config=database_config,
+        system_config=system_config,
         request=request,
     )
 
@@ -16,6 +16,7 @@
 # limitations under the License.
 #
 import logging
+import os
 
 MIN_CONN_TIME_THRESHOLD = 0.01
 MIN_QUERY_TIME_THRESHOLD = 0.001
@@ -23,5 +24,32 @@ MIN_LOG_TIME_THRESHOLD = 1
 MIN_IDLE_TIME_BEFORE_GC = 120
 CONNECT_FAILURE_RETRIES = 3
 STATS_COLLECT_INTERVAL = 0.1
+# How many of the most recently used connections are checked for the one
+# preferred by an acquirer.
+MAX_PREFERRED_CONN_SCAN = 16
+
+# Every PREWARM_INTERVAL seconds, the pool records the peak demand for
+# connections of every branch and opens connections ahead of the demand
+# predicted for the next interval (0 disables pre-warming.)  Branches that
+# are in use keep at least MIN_WARM_CONNS connections open.
+PREWARM_INTERVAL = float(os.getenv("GEL_SERVER_CONNPOOL_PREWARM_INTERVAL", 60))
+MIN_WARM_CONNS = int(os.getenv("GEL_SERVER_CONNPOOL_MIN_WARM_CONNS", 0))
+
+# What to do with connections pinned by clients that sit idle in a
+# transaction while other clients are waiting for a connection:
+#   "never" - keep them until the transaction ends or times out;
+#   "over-ratio" - abort the idle transactions of the branches where more
+#       than MAX_PINNED_RATIO of the connections are pinned;
+#   "always" - abort any idle transaction.
+IDLE_TX_ABORT_POLICY = os.getenv("GEL_SERVER_IDLE_TX_ABORT_POLICY", "never")
+if IDLE_TX_ABORT_POLICY not in ("never", "over-ratio", "always"):
+    raise ValueError(
+        f"invalid GEL_SERVER_IDLE_TX_ABORT_POLICY: {IDLE_TX_ABORT_POLICY!r}, "
+        f"expected one of: never, over-ratio, always"
+    )
+MAX_PINNED_RATIO = float(os.getenv("GEL_SERVER_MAX_PINNED_CONN_RATIO", 0.5))
+# Transactions idle for less than that are never aborted.
+MIN_IDLE_TX_TIME_BEFORE_ABORT = float(
+    os.getenv("GEL_SERVER_MIN_IDLE_TX_TIME_BEFORE_ABORT", 1.0))
 
 logger = logging.getLogger("edb.server")
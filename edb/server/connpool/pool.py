@@ -27,6 +27,7 @@ import time
 
 from . import rolavg
 from . import config
+from . import prewarm
 from .config import logger
 
 CP1 = typing.TypeVar('CP1', covariant=True)
@@ -59,6 +60,7 @@ class BlockSnapshot:
     npending: int
     nwaiters: int
     quota: int
+    npinned: int = 0
 
 
 @dataclasses.dataclass
@@ -87,6 +89,7 @@ class ConnectionState:
     in_use_since: float = 0
     in_use: bool = False
     in_stack_since: float = 0
+    pinned: bool = False
 
 
 class Block[C]:
@@ -117,6 +120,7 @@ class Block[C]:
     last_connect_timestamp: float
 
     conn_acquired_num: int
+    conn_pinned_num: int
     conn_waiters_num: int
     conn_waiters: collections.deque[asyncio.Future[None]]
     conn_stack: collections.deque[C]
@@ -126,6 +130,9 @@ class Block[C]:
     nwaiters_avg: rolavg.RollingAverage
     suppressed: bool
 
+    demand_peak: int  # since the last pre-warming, see Pool._prewarm()
+    warm_target: int  # number of idle connections to keep from GC
+
     _cached_calibrated_demand: float
 
     _is_log_batching: bool
@@ -146,6 +153,7 @@ class Block[C]:
         self.loop = loop
 
         self.conn_acquired_num = 0
+        self.conn_pinned_num = 0
         self.conn_waiters_num = 0
         self.conn_waiters = collections.deque()
         self.conn_stack = collections.deque()
@@ -155,6 +163,9 @@ class Block[C]:
         self.nwaiters_avg = rolavg.RollingAverage(history_size=3)
         self.suppressed = False
 
+        self.demand_peak = 0
+        self.warm_target = 0
+
         self._is_log_batching = False
         self._last_log_timestamp = 0
         self._log_events = {}
@@ -178,6 +189,12 @@ class Block[C]:
         # Number of future connections that are still pending in connecting
         return self.pending_conns
 
+    def count_pinned_conns(self) -> int:
+        # Number of acquired connections that are held by clients across
+        # requests, e.g. for the duration of a transaction, as opposed to
+        # the ones that are released after every request
+        return self.conn_pinned_num
+
     def count_conns_over_quota(self) -> int:
         # How many connections over the quota
         return max(self.count_conns() - self.quota, 0)
@@ -219,7 +236,12 @@ class Block[C]:
 
         return self.conn_stack.popleft()
 
-    async def try_acquire(self, *, attempts: int = 1) -> typing.Optional[C]:
+    async def try_acquire(
+        self,
+        *,
+        attempts: int = 1,
+        prefer: typing.Optional[typing.Callable[[C], int]] = None,
+    ) -> typing.Optional[C]:
         self.conn_waiters_num += 1
         try:
             # Skip the waiters' queue if we can grab a connection from the
@@ -265,15 +287,44 @@ class Block[C]:
 
             # Yield the most recently used connection from the top of the stack
             if self.conn_stack:
-                return self.conn_stack.pop()
+                return self._pop_conn(prefer)
             else:
                 return None
         finally:
             self.conn_waiters_num -= 1
 
-    async def acquire(self) -> C:
+    def _pop_conn(
+        self, prefer: typing.Optional[typing.Callable[[C], int]]
+    ) -> C:
+        # If the caller prefers some connections over the others (e.g. the
+        # ones with some state already set up), `prefer` scores them and the
+        # best scoring one near the top of the stack is returned; the most
+        # recently used connection wins the ties.
+        if prefer is not None:
+            stack = self.conn_stack
+            best_score = 0
+            best_pos = 1
+            for i in range(
+                1, min(len(stack), config.MAX_PREFERRED_CONN_SCAN) + 1
+            ):
+                score = prefer(stack[-i])
+                if score > best_score:
+                    best_score = score
+                    best_pos = i
+            if best_pos > 1:
+                conn = stack[-best_pos]
+                del stack[-best_pos]
+                return conn
+        return self.conn_stack.pop()
+
+    async def acquire(
+        self,
+        prefer: typing.Optional[typing.Callable[[C], int]] = None,
+    ) -> C:
         attempts = 1
-        while (c := await self.try_acquire(attempts=attempts)) is None:
+        while (
+            c := await self.try_acquire(attempts=attempts, prefer=prefer)
+        ) is None:
             attempts += 1
         return c
 
@@ -440,6 +491,7 @@ class BasePool[C]:
                     npending=block.count_pending_conns(),
                     nwaiters=block.count_waiters(),
                     quota=block.quota,
+                    npinned=block.count_pinned_conns(),
                 )
             )
 
@@ -507,6 +559,9 @@ class BasePool[C]:
         assert not block.count_conns()
         assert not block.quota
         self._blocks.pop(block.dbname)
+        # The demand history of the branch is kept, so that the block can
+        # be brought back by pre-warming before the demand returns.  It is
+        # dropped together with the branch, see prune_inactive_connections().
 
     def _get_block(self, dbname: str) -> Block[C]:
         block = self._blocks.get(dbname)
@@ -536,6 +591,7 @@ class BasePool[C]:
             if getattr(e, 'fields', {}).get('C') == '3D000':
                 # 3D000 - INVALID CATALOG NAME, database does not exist
                 # Skip retry and propagate the error immediately
+                self._demand_history.pop(block.dbname, None)
                 if block.connect_failures_num <= config.CONNECT_FAILURE_RETRIES:
                     block.connect_failures_num = (
                         config.CONNECT_FAILURE_RETRIES + 1)
@@ -678,6 +734,9 @@ class Pool[C](BasePool[C]):
     _to_drop: list[Block[C]]
     _gc_interval: float  # minimum seconds between GC runs
     _gc_requests: int  # number of GC requests
+    _prewarm_interval: float
+    _hprewarm: typing.Optional[asyncio.TimerHandle]
+    _demand_history: dict[str, prewarm.DemandHistory]
 
     def __init__(
         self,
@@ -687,6 +746,7 @@ class Pool[C](BasePool[C]):
         max_capacity: int,
         stats_collector: typing.Optional[StatsCollector]=None,
         min_idle_time_before_gc: float = config.MIN_IDLE_TIME_BEFORE_GC,
+        prewarm_interval: float = config.PREWARM_INTERVAL,
     ) -> None:
         super().__init__(
             connect=connect,
@@ -705,6 +765,15 @@ class Pool[C](BasePool[C]):
         self._to_drop = []
         self._gc_interval = min_idle_time_before_gc
         self._gc_requests = 0
+        self._prewarm_interval = prewarm_interval
+        self._hprewarm = None
+        self._demand_history = {}
+
+    async def close(self) -> None:
+        if self._hprewarm is not None:
+            self._hprewarm.cancel()
+            self._hprewarm = None
+        await super().close()
 
     def _maybe_schedule_tick(self) -> None:
         if self._first_tick:
@@ -1087,7 +1156,11 @@ class Pool[C](BasePool[C]):
 
         return None, None
 
-    async def _acquire(self, dbname: str) -> C:
+    async def _acquire(
+        self,
+        dbname: str,
+        prefer: typing.Optional[typing.Callable[[C], int]],
+    ) -> C:
         block = self._get_block(dbname)
         block.suppressed = False
 
@@ -1116,7 +1189,7 @@ class Pool[C](BasePool[C]):
                 # Block has no connections at all, or not enough connections.
                 self._schedule_new_conn(block)
 
-            return await block.acquire()
+            return await block.acquire(prefer)
 
         if not block_nconns:
             # This is a block without any connections.
@@ -1124,15 +1197,15 @@ class Pool[C](BasePool[C]):
             # reallocated for this block.
             if not self._try_steal_conn(block):
                 self._new_blocks_waitlist[block] = True
-            return await block.acquire()
+            return await block.acquire(prefer)
 
         if block_nconns < block.quota:
             # Let's see if we can steal a connection from some block
             # that's over quota and open a new one.
             self._try_steal_conn(block)
-            return await block.acquire()
+            return await block.acquire(prefer)
 
-        return await block.acquire()
+        return await block.acquire(prefer)
 
     def _run_gc(self) -> None:
         loop = self._get_loop()
@@ -1156,20 +1229,104 @@ class Pool[C](BasePool[C]):
         # within 1-2 GC intervals.
         only_older_than = time.monotonic() - self._gc_interval
         for block in self._blocks.values():
-            while (conn := block.try_steal(only_older_than)) is not None:
+            while (
+                block.count_conns() > block.warm_target and
+                (conn := block.try_steal(only_older_than)) is not None
+            ):
                 self._schedule_discard(block, conn)
 
-    async def acquire(self, dbname: str) -> C:
+    def _prewarm(self) -> None:
+        # Runs every `_prewarm_interval` seconds: records the peak demand of
+        # every block since the last run, and opens the connections that the
+        # demand predicted for the next interval is going to need, so that
+        # the first requests after a quiet period don't have to wait for new
+        # connections. The predicted demand also protects the idle
+        # connections from GC.
+        self._hprewarm = None
+        if not self._running:
+            return
+        loop = self._get_loop()
+        self._hprewarm = loop.call_later(self._prewarm_interval, self._prewarm)
+
+        now = time.time()
+        for dbname, block in self._blocks.items():
+            if block.suppressed:
+                continue
+            history = self._demand_history.get(dbname)
+            if history is None:
+                history = prewarm.DemandHistory(
+                    interval=self._prewarm_interval)
+                self._demand_history[dbname] = history
+            history.add(block.demand_peak, timestamp=now)
+            block.demand_peak = block.conn_acquired_num
+
+        # The branches that went quiet have no block anymore, but their
+        # history is kept to bring the block back before the demand
+        # returns (e.g. at the same time the next day) - until they have
+        # been quiet for long enough for the history to forget them.
+        for dbname, history in tuple(self._demand_history.items()):
+            if dbname not in self._blocks:
+                history.add(0, timestamp=now)
+                if history.is_idle():
+                    del self._demand_history[dbname]
+
+        if self._is_starving:
+            # The pool cannot even satisfy the current demand.
+            return
+
+        needs_gc = False
+        for dbname, history in self._demand_history.items():
+            if (
+                dbname not in self._blocks
+                and history.predict(timestamp=now) > 0
+            ):
+                self._new_block(dbname)
+
+        for dbname, block in self._blocks.items():
+            if block.suppressed:
+                block.warm_target = 0
+                continue
+            history = self._demand_history.get(dbname)
+            target = config.MIN_WARM_CONNS
+            if history is not None:
+                target = max(history.predict(timestamp=now), target)
+
+            block.warm_target = target
+            if block.count_conns() > target:
+                needs_gc = True
+            while (
+                block.count_conns() < target and
+                self._cur_capacity < self._max_capacity
+            ):
+                self._schedule_new_conn(block, 'pre-warmed')
+
+        if needs_gc:
+            self._request_gc()
+
+    async def acquire(
+        self,
+        dbname: str,
+        *,
+        prefer: typing.Optional[typing.Callable[[C], int]] = None,
+    ) -> C:
+        # If given, `prefer` tells which of the idle connections should be
+        # given out first, see Block._pop_conn().
         self._nacquires += 1
         self._maybe_schedule_tick()
+        if self._hprewarm is None and self._prewarm_interval > 0:
+            self._hprewarm = self._get_loop().call_later(
+                self._prewarm_interval, self._prewarm)
         try:
-            conn = await self._acquire(dbname)
+            conn = await self._acquire(dbname, prefer)
         finally:
             self._nacquires -= 1
 
         block = self._blocks[dbname]
         assert not block.conns[conn].in_use
         block.inc_acquire_counter()
+        demand = block.conn_acquired_num + block.count_waiters()
+        if demand > block.demand_peak:
+            block.demand_peak = demand
         block.conns[conn].in_use = True
         block.conns[conn].in_use_since = time.monotonic()
 
@@ -1202,6 +1359,9 @@ class Pool[C](BasePool[C]):
         block.querytime_avg.add(time.monotonic() - conn_state.in_use_since)
         conn_state.in_use = False
         conn_state.in_use_since = 0
+        if conn_state.pinned:
+            conn_state.pinned = False
+            block.conn_pinned_num -= 1
 
         self._maybe_schedule_tick()
 
@@ -1222,6 +1382,9 @@ class Pool[C](BasePool[C]):
         block.release(conn)
 
         # Only request for GC if the connection is released unused
+        self._request_gc()
+
+    def _request_gc(self) -> None:
         self._gc_requests += 1
         if self._gc_requests == 1:
             # Only schedule GC for the very first request - following
@@ -1239,6 +1402,9 @@ class Pool[C](BasePool[C]):
         # actually tries to connect.
         # TODO: Is it possible to safely drop the block?
         block.suppressed = True
+        # The branch is about to be dropped or copied, its past demand
+        # must not cause any new connections to it.
+        self._demand_history.pop(dbname, None)
 
         conns = []
         while (conn := block.try_steal()) is not None:
@@ -1263,6 +1429,7 @@ class Pool[C](BasePool[C]):
             for conn in block.conns:
                 coros.append(self._disconnect(conn, block))
             block.conns.clear()
+            block.conn_pinned_num = 0
             self._log_to_snapshot(
                 dbname=block.dbname, event='disconnect', value=0)
         await asyncio.gather(*coros, return_exceptions=True)
@@ -1274,6 +1441,52 @@ class Pool[C](BasePool[C]):
             for conn in block.conns:
                 yield conn
 
+    def pin(self, dbname: str, conn: C) -> None:
+        # Mark an acquired connection as held by its client beyond the
+        # current request (e.g. until the end of a transaction).  Pinned
+        # connections are only accounted for here; release() unpins them.
+        block = self._blocks[dbname]
+        conn_state = block.conns[conn]
+        if not conn_state.in_use:
+            raise RuntimeError(
+                f'cannot pin connection {conn!r}: the connection was '
+                f'never acquired from the pool'
+            )
+        if not conn_state.pinned:
+            conn_state.pinned = True
+            block.conn_pinned_num += 1
+
+    def is_pinned(self, dbname: str, conn: C) -> bool:
+        block = self._blocks.get(dbname)
+        if block is None:
+            return False
+        conn_state = block.conns.get(conn)
+        return conn_state is not None and conn_state.pinned
+
+    def count_conns(self, dbname: str) -> int:
+        block = self._blocks.get(dbname)
+        return block.count_conns() if block is not None else 0
+
+    def count_pinned_conns(self, dbname: str) -> int:
+        block = self._blocks.get(dbname)
+        return block.count_pinned_conns() if block is not None else 0
+
+    def is_saturated(self, dbname: str) -> bool:
+        # Whether acquiring a connection to the given database would have to
+        # wait for some other connection to be released (or transferred.)
+        if self._cur_capacity < self._max_capacity:
+            return False
+        block = self._blocks.get(dbname)
+        return block is None or not block.count_queued_conns()
+
+    def iterate_pinned_connections(self) -> typing.Iterator[tuple[str, C]]:
+        for block in self._blocks.values():
+            if not block.conn_pinned_num:
+                continue
+            for conn, conn_state in block.conns.items():
+                if conn_state.pinned:
+                    yield block.dbname, conn
+
 
 class _NaivePool[C](BasePool[C]):
     """Implements a rather naive and flawed balancing algorithm.
@@ -50,6 +50,7 @@ class BlockSnapshot:
     npending: int
     nwaiters: int
     quota: int
+    npinned: int = 0
 
 
 @dataclasses.dataclass
@@ -94,8 +95,10 @@ class Pool[C: typing.Hashable]:
     _acquires: dict[int, asyncio.Future[int]]
     _prunes: dict[int, asyncio.Future[None]]
     _conns: dict[int, C]
+    _conn_dbnames: dict[int, str]
     _errors: dict[int, BaseException]
     _conns_held: dict[C, int]
+    _conns_pinned: dict[C, str]
     _loop: asyncio.AbstractEventLoop
     _counts: typing.Any
     _stats_collector: typing.Optional[StatsCollector]
@@ -126,8 +129,10 @@ class Pool[C: typing.Hashable]:
         self._next_conn_id = 0
         self._acquires = {}
         self._conns = {}
+        self._conn_dbnames = {}
         self._errors = {}
         self._conns_held = {}
+        self._conns_pinned = {}
         self._prunes = {}
 
         self._loop = asyncio.get_running_loop()
@@ -226,6 +231,7 @@ class Pool[C: typing.Hashable]:
         self._cur_capacity += 1
         try:
             self._conns[id] = await self._connect(db)
+            self._conn_dbnames[id] = db
             self._successful_connects += 1
             if self._pool:
                 self._pool._completed(id)
@@ -237,6 +243,7 @@ class Pool[C: typing.Hashable]:
     async def _perform_disconnect(self, id: int) -> None:
         try:
             conn = self._conns.pop(id)
+            self._conn_dbnames.pop(id, None)
             await self._disconnect(conn)
             self._successful_disconnects += 1
             self._cur_capacity -= 1
@@ -253,10 +260,12 @@ class Pool[C: typing.Hashable]:
             # implicit expectation that the connection will GC after disconnect
             # but before reconnect.
             conn = self._conns.pop(id)
+            self._conn_dbnames.pop(id, None)
             await self._disconnect(conn)
             self._successful_disconnects += 1
             try:
                 self._conns[id] = await self._connect(db)
+                self._conn_dbnames[id] = db
                 self._successful_connects += 1
                 if self._pool:
                     self._pool._completed(id)
@@ -274,9 +283,17 @@ class Pool[C: typing.Hashable]:
     async def _perform_prune(self, id: int) -> None:
         self._prunes[id].set_result(None)
 
-    async def acquire(self, dbname: str) -> C:
+    async def acquire(
+        self,
+        dbname: str,
+        *,
+        prefer: typing.Optional[typing.Callable[[C], int]] = None,
+    ) -> C:
         """Acquire a connection from the database. This connection must be
-        released."""
+        released.
+
+        `prefer` is accepted for compatibility with the other pool, but the
+        connection is picked by the Rust pool regardless."""
         if not self._task:
             raise asyncio.CancelledError()
         for i in range(config.CONNECT_FAILURE_RETRIES + 1):
@@ -316,6 +333,7 @@ class Pool[C: typing.Hashable]:
         """Releases a connection back into the pool, discarding or returning it
         in the background."""
         id = self._conns_held.pop(conn)
+        self._conns_pinned.pop(conn, None)
         if discard:
             self._pool._discard(id)
         else:
@@ -347,6 +365,42 @@ class Pool[C: typing.Hashable]:
         for conn in self._conns.values():
             yield conn
 
+    def pin(self, dbname: str, conn: C) -> None:
+        if conn not in self._conns_held:
+            raise RuntimeError(
+                f'cannot pin connection {conn!r}: the connection was '
+                f'never acquired from the pool'
+            )
+        self._conns_pinned[conn] = dbname
+
+    def is_pinned(self, dbname: str, conn: C) -> bool:
+        return conn in self._conns_pinned
+
+    def count_conns(self, dbname: str) -> int:
+        if not self._counts:
+            return 0
+        stats = self._counts['blocks'].get(dbname)
+        return stats['value'][_rust.METRIC_ACTIVE] if stats else 0
+
+    def count_pinned_conns(self, dbname: str) -> int:
+        return sum(1 for db in self._conns_pinned.values() if db == dbname)
+
+    def is_saturated(self, dbname: str) -> bool:
+        # Whether acquiring a connection to the given database would have to
+        # wait for some other connection to be released (or reconnected.)
+        # The Rust pool normally keeps all of its capacity open, so the idle
+        # connections have to be taken into account.
+        if self._cur_capacity < self._max_capacity:
+            return False
+        return not any(
+            db == dbname and self._conns[id] not in self._conns_held
+            for id, db in self._conn_dbnames.items()
+        )
+
+    def iterate_pinned_connections(self) -> typing.Iterator[tuple[str, C]]:
+        for conn, dbname in self._conns_pinned.items():
+            yield dbname, conn
+
     def _build_snapshot(self, *, now: float) -> Snapshot:
         blocks: list[BlockSnapshot] = []
         if self._counts:
@@ -361,6 +415,7 @@ class Pool[C: typing.Hashable]:
                     + v[_rust.METRIC_RECONNECTING],
                     nwaiters=v[_rust.METRIC_WAITING],
                     quota=stats['target'],
+                    npinned=self.count_pinned_conns(dbname),
                 )
                 blocks.append(block_snapshot)
             pass
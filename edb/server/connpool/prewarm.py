@@ -0,0 +1,91 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2020-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import annotations
+
+import collections
+import math
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# How fast the demand seen at some time of the day replaces the demand seen
+# at the same time of the previous days.
+DAILY_WEIGHT = 0.5
+
+
+class DemandHistory:
+    # The peak number of connections used by a block in every interval of
+    # time (a "slot"), kept for predicting the demand in the next slot.
+    #
+    # Two predictions are made, and the higher one wins:
+    #   - the recent trend: the demand of the last slot, extrapolated with
+    #     the average change over the last few slots;
+    #   - the time of the day: the (weighted) average demand seen in the
+    #     same slot on the previous days, so that e.g. the connections for
+    #     the morning peak are opened before it starts.
+
+    __slots__ = ('_interval', '_slots_per_day', '_recent', '_daily')
+
+    _interval: float
+    _slots_per_day: int
+    _recent: collections.deque[int]
+    _daily: dict[int, float]
+
+    def __init__(self, *, interval: float, trend_history: int = 5) -> None:
+        self._interval = interval
+        self._slots_per_day = max(round(SECONDS_PER_DAY / interval), 1)
+        self._recent = collections.deque(maxlen=trend_history)
+        self._daily = {}
+
+    def _slot_of_day(self, timestamp: float) -> int:
+        return int(timestamp // self._interval) % self._slots_per_day
+
+    def add(self, peak: int, *, timestamp: float) -> None:
+        # Record the peak demand of the slot that ended at the timestamp.
+        self._recent.append(peak)
+
+        slot = self._slot_of_day(timestamp - self._interval)
+        prev = self._daily.get(slot)
+        if prev is None:
+            avg = float(peak)
+        else:
+            avg = prev + DAILY_WEIGHT * (peak - prev)
+        if avg < 0.5:
+            # Wouldn't predict any demand anyway.
+            self._daily.pop(slot, None)
+        else:
+            self._daily[slot] = avg
+
+    def predict(self, *, timestamp: float) -> int:
+        # Predict the peak demand of the slot starting at the timestamp.
+        trend = 0.0
+        if self._recent:
+            last = self._recent[-1]
+            if len(self._recent) > 1:
+                slope = (last - self._recent[0]) / (len(self._recent) - 1)
+            else:
+                slope = 0
+            trend = max(last + slope, 0)
+
+        daily = self._daily.get(self._slot_of_day(timestamp), 0.0)
+
+        return math.ceil(round(max(trend, daily), 3))
+
+    def is_idle(self) -> bool:
+        # No demand was seen recently, nor is expected at any time of the day.
+        return not self._daily and not any(self._recent)
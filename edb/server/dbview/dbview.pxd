@@ -70,7 +70,7 @@ cdef class DatabaseIndex:
 cdef class Database:
 
     cdef:
-        stmt_cache.StatementsCache _eql_to_compiled
+        stmt_cache.CostAwareStatementsCache _eql_to_compiled
         object _cache_locks
         object _sql_to_compiled
         DatabaseIndex _index
@@ -84,6 +84,10 @@ cdef class Database:
         object _cache_notify_task
         object _cache_notify_queue
 
+        readonly object result_cache
+        object _result_cache_notify_task
+        object _result_cache_notify_queue
+
         uint64_t _tx_seq
         object _active_tx_list
         object _func_cache_gt_tx_seq
@@ -93,6 +97,8 @@ cdef class Database:
         readonly object dbver
         readonly object db_config
         readonly bytes user_schema_pickle
+        readonly object user_schema_delta
+        object _schema_fingerprint
         readonly object reflection_cache
         readonly object backend_ids
         readonly object backend_oid_to_id
@@ -101,6 +107,8 @@ cdef class Database:
         readonly int dml_queries_executed
 
     cdef _invalidate_caches(self)
+    cdef on_tables_written(self, tables)
+    cdef get_schema_fingerprint(self)
     cdef _cache_compiled_query(self, key, compiled)
     cdef _new_view(self, query_cache, protocol_version, role_name)
     cdef _remove_view(self, view)
@@ -124,6 +132,7 @@ cdef class Database:
         db_config=?,
         start_stop_extensions=?,
     )
+    cdef _set_and_signal_new_user_schema_from_unit(self, query_unit)
     cpdef start_stop_extensions(self)
     cdef get_state_serializer(self, protocol_version)
     cpdef set_state_serializer(self, protocol_version, serializer)
@@ -172,6 +181,7 @@ cdef class DatabaseConnectionView:
         object _in_tx_user_config_spec
         object _in_tx_global_schema_pickle
         object _in_tx_new_types
+        object _in_tx_write_tables
         int _in_tx_dbver
         bint _in_tx
         uint64_t _in_tx_capabilities
@@ -206,6 +216,7 @@ cdef class DatabaseConnectionView:
     cdef cache_compiled_query(self, object key, object query_unit_group)
     cdef lookup_compiled_query(self, object key)
     cdef as_compiled(self, query_req, query_unit_group, bint use_metrics=?)
+    cdef _report_compile_phases(self, query_req, unit_group, duration)
 
     cdef tx_error(self)
 
@@ -52,6 +52,8 @@ class Database:
     extensions: set[str]
     user_config_spec: config.Spec
     dml_queries_executed: int
+    user_schema_pickle: Optional[bytes]
+    user_schema_delta: Optional[tuple[bytes, bytes]]
 
     @property
     def server(self) -> server.Server:
@@ -104,6 +106,16 @@ class Database:
     def hydrate_cache(self, query_cache: list[tuple[bytes, ...]]) -> None:
         ...
 
+    def get_hot_queries(self, limit: int) -> list[bytes]:
+        ...
+
+    async def precompile_queries(
+        self,
+        requests: list[bytes],
+        concurrency: int,
+    ) -> int:
+        ...
+
     def invalidate_cache_entries(self, to_invalidate: list[uuid.UUID]) -> None:
         ...
 
@@ -116,6 +128,9 @@ class Database:
     def get_query_cache_size(self) -> int:
         ...
 
+    def get_query_cache_memory(self) -> int:
+        ...
+
     async def introspection(self) -> None:
         ...
 
@@ -23,6 +23,7 @@ from typing import (
 import asyncio
 import base64
 import copy
+import hashlib
 import json
 import logging
 import os.path
@@ -41,7 +42,7 @@ from edb import edgeql
 from edb.edgeql import qltypes
 from edb.schema import schema as s_schema
 from edb.schema import name as s_name
-from edb.server import compiler, defines, config, metrics, pgcon
+from edb.server import cache, compiler, defines, config, metrics, pgcon
 from edb.server.compiler import dbstate, enums, sertypes
 from edb.server.protocol import execute
 from edb.pgsql import dbops
@@ -93,6 +94,23 @@ cdef TYPES_SQL_ONLY = immutables.Map({
     194: "00000000-0000-0000-0000-000000000101", # pg_node_tree -> str
  })
 
+# Compilation cost (in seconds) assumed for compiled queries that don't
+# carry their own, e.g. the ones restored from the persistent cache.
+cdef double MIN_COMPILE_COST = 0.001
+
+# Compilations taking longer than that many seconds are logged along with
+# the time spent in every compilation phase; 0 disables the log.
+cdef double SLOW_COMPILE_LOG_THRESHOLD = float(
+    os.getenv("GEL_SERVER_SLOW_COMPILE_LOG_THRESHOLD", 0))
+
+
+def _weigh_compiled_query(query_unit_group):
+    return (
+        query_unit_group.get_estimated_size(),
+        max(query_unit_group.compile_duration, MIN_COMPILE_COST),
+    )
+
+
 cdef next_dbver():
     global VER_COUNTER
     VER_COUNTER += 1
@@ -145,8 +163,8 @@ cdef class CompiledQuery:
 
 cdef class Database:
 
-    # Global LRU cache of compiled queries
-    _eql_to_compiled: stmt_cache.StatementsCache[uuid.UUID, dbstate.QueryUnitGroup]
+    # Global cache of compiled queries, weighted by size and compile cost
+    _eql_to_compiled: stmt_cache.CostAwareStatementsCache[uuid.UUID, dbstate.QueryUnitGroup]
 
     def __init__(
         self,
@@ -173,14 +191,27 @@ cdef class Database:
 
         self._introspection_lock = asyncio.Lock()
 
-        self._eql_to_compiled = stmt_cache.StatementsCache(
-            maxsize=self.lookup_config('query_cache_size')
+        max_memory = self.lookup_config('query_cache_max_memory')
+        self._eql_to_compiled = stmt_cache.CostAwareStatementsCache(
+            maxsize=self.lookup_config('query_cache_size'),
+            maxbytes=max_memory.to_nbytes() if max_memory is not None else 0,
+            weigher=_weigh_compiled_query,
         )
         self._cache_locks = {}
         self._sql_to_compiled = lru.LRUMapping(
             maxsize=self.lookup_config('query_cache_size')
         )
 
+        self.result_cache = None
+        result_cache_memory = self.lookup_config(
+            'query_result_cache_max_memory')
+        if (
+            result_cache_memory is not None
+            and result_cache_memory.to_nbytes() > 0
+        ):
+            self.result_cache = cache.ResultCache(
+                maxbytes=result_cache_memory.to_nbytes())
+
         # Tracks the active transactions and their creation sequence. The
         # sequence ID is incremental-only. ID 0 is reserved as a non-exist ID.
         self._tx_seq = 0  # most-recently used transaction sequence ID
@@ -192,6 +223,8 @@ cdef class Database:
 
         self.db_config = db_config
         self.user_schema_pickle = user_schema_pickle
+        self.user_schema_delta = None
+        self._schema_fingerprint = None
         if ext_config_settings is not None:
             self.user_config_spec = config.FlatSpec(*ext_config_settings)
         self.reflection_cache = reflection_cache
@@ -213,6 +246,14 @@ cdef class Database:
         self._cache_notify_queue = asyncio.Queue()
         self._cache_notify_task = asyncio.create_task(
             self.monitor(self.cache_notifier, 'cache_notifier'))
+        # Queue of sets of tables written to by committed transactions,
+        # None meaning "any table".
+        self._result_cache_notify_task = None
+        self._result_cache_notify_queue = asyncio.Queue()
+        if self.result_cache is not None:
+            self._result_cache_notify_task = asyncio.create_task(
+                self.monitor(
+                    self.result_cache_notifier, 'result_cache_notifier'))
 
         self.dml_queries_executed = 0
 
@@ -231,6 +272,9 @@ cdef class Database:
         if self._cache_notify_task:
             self._cache_notify_task.cancel()
             self._cache_notify_task = None
+        if self._result_cache_notify_task:
+            self._result_cache_notify_task.cancel()
+            self._result_cache_notify_task = None
         self._set_extensions(set())
         self._set_feature_used_metrics({})
         self.start_stop_extensions()
@@ -354,6 +398,44 @@ cdef class Database:
             max_batch_size=100,
         )
 
+    async def result_cache_notifier(self):
+        await asyncutil.debounce(
+            lambda: self._result_cache_notify_queue.get(),
+            self._signal_tables_written,
+            max_wait=0.2,
+            delay_amt=0.05,
+            max_batch_size=100,
+        )
+
+    async def _signal_tables_written(self, batch):
+        tables = set()
+        for written in batch:
+            if written is None:
+                tables = None
+                break
+            tables.update(written)
+        # Table ids take up about 40 bytes each in the event, which
+        # must fit in 8000 bytes.
+        if tables is not None and len(tables) > 150:
+            tables = None
+        await self.tenant.signal_sysevent(
+            'result-cache-changes',
+            dbname=self.name,
+            tables=list(tables) if tables is not None else None,
+        )
+
+    cdef on_tables_written(self, tables):
+        # Called when a transaction writing to *tables* (any, if None)
+        # has been committed.
+        if self.result_cache is None:
+            return
+        self.result_cache.invalidate(tables)
+        self._result_cache_notify_queue.put_nowait(tables)
+
+    def invalidate_result_cache(self, tables):
+        if self.result_cache is not None:
+            self.result_cache.invalidate(tables)
+
     cdef _set_extensions(self, extensions):
         # Update metrics about extension use
         tname = self.tenant.get_instance_name()
@@ -415,6 +497,7 @@ cdef class Database:
         self.dbver = next_dbver()
 
         self.user_schema_pickle = new_schema_pickle
+        self.user_schema_delta = None
         self._set_extensions(extensions)
         self.user_config_spec = config.FlatSpec(*ext_config_settings)
 
@@ -431,6 +514,32 @@ cdef class Database:
         if start_stop_extensions:
             self.start_stop_extensions()
 
+    cdef _set_and_signal_new_user_schema_from_unit(self, query_unit):
+        delta = query_unit.user_schema_delta
+        if (
+            delta is not None
+            and self.user_schema_pickle is not None
+            and delta[0] == self.schema_version
+        ):
+            # Compiler workers still holding the current schema can be
+            # synced with just the delta; keep the current pickle so
+            # that the compiler pool can tell which ones these are.
+            delta = (self.user_schema_pickle, delta[1])
+        else:
+            delta = None
+
+        self._set_and_signal_new_user_schema(
+            query_unit.user_schema,
+            query_unit.user_schema_version,
+            query_unit.extensions,
+            query_unit.ext_config_settings,
+            query_unit.feature_used_metrics,  # XXX? does this get set?
+            pickle.loads(query_unit.cached_reflection)
+                if query_unit.cached_reflection is not None
+                else None,
+        )
+        self.user_schema_delta = delta
+
     cpdef start_stop_extensions(self):
         if "ai" in self.extensions:
             ai_ext.start_extension(self.tenant, self.name)
@@ -470,8 +579,36 @@ cdef class Database:
 
     cdef _invalidate_caches(self):
         self._sql_to_compiled.clear()
+        if self.result_cache is not None:
+            # The cached results are keyed by the hash of the SQL, the
+            # arguments and the session state, which don't necessarily
+            # change with the schema, so they must be dropped here.
+            self.result_cache.clear()
+        self._schema_fingerprint = None
         self._index.invalidate_caches()
 
+    cdef get_schema_fingerprint(self):
+        # A content hash of everything in the schema a compiled query
+        # depends on.  Branches (of any tenant) with the same fingerprint
+        # compile identical requests identically, so they can share
+        # compiled queries through the server-wide shared cache.  The
+        # backend parameters the compiler looks at (capabilities such
+        # as edb_stat_statements, the Postgres version...) are a part of
+        # the fingerprint, as tenants on different backends may compile
+        # the same request differently.
+        if self._schema_fingerprint is None:
+            h = hashlib.blake2b(self.user_schema_pickle, digest_size=16)
+            h.update(self._index._global_schema_pickle)
+            params = self.tenant.get_backend_runtime_params().instance_params
+            h.update(repr((
+                int(params.capabilities),
+                tuple(params.version),
+                params.ext_schema,
+                sorted((params.existing_exts or {}).items()),
+            )).encode())
+            self._schema_fingerprint = h.digest()
+        return self._schema_fingerprint
+
     cdef _cache_compiled_query(self, key, compiled: dbstate.QueryUnitGroup):
         # `dbver` must be the schema version `compiled` was compiled upon
         assert compiled.cacheable
@@ -570,6 +707,77 @@ cdef class Database:
                 "skipped %d incompatible cache items", -warning_count
             )
 
+    def get_hot_queries(self, limit):
+        """Return the most used cached requests, serialized."""
+        return [
+            query_req.serialize()
+            for query_req, _ in self._eql_to_compiled.most_used(limit)
+            # SQL queries require _amend_typedesc_in_sql() with a
+            # backend connection, so they cannot be precompiled.
+            if query_req.input_language != enums.InputLanguage.SQL
+        ]
+
+    async def precompile_queries(self, requests, concurrency):
+        """Compile and cache serialized requests in the background.
+
+        Used to warm up the query cache from the hot query manifest
+        after the branch is introspected.  Requests failing to
+        compile (e.g. because the schema changed) are skipped, and
+        compiling stops once the schema changes.
+        """
+        compiler_pool = self.server.get_compiler_pool()
+        concurrency_control = asyncio.Semaphore(concurrency)
+        user_schema = self.user_schema_pickle
+        schema_version = self.schema_version
+        compiled = 0
+
+        async def precompile(data):
+            nonlocal compiled
+            async with concurrency_control:
+                if self.schema_version != schema_version:
+                    return
+                try:
+                    query_req = rpc.CompilationRequest.deserialize(
+                        data,
+                        "<unknown>",
+                        self.server.compilation_config_serializer,
+                    )
+                    database_config = self.db_config
+                    system_config = (
+                        self._index.get_compilation_system_config())
+                    query_req.set_schema_version(schema_version)
+                    query_req.set_database_config(database_config)
+                    query_req.set_system_config(system_config)
+                    if query_req in self._eql_to_compiled:
+                        return
+                    unit_group, _, _ = await compiler_pool.compile(
+                        self.name,
+                        user_schema,
+                        self._index.get_global_schema_pickle(),
+                        self.reflection_cache,
+                        database_config,
+                        system_config,
+                        query_req.serialize(),
+                        "<unknown>",
+                        client_id=self.tenant.client_id,
+                        client_name=self.tenant.get_instance_name(),
+                    )
+                except Exception:
+                    # ignore requests that cannot be compiled anymore
+                    return
+                if (
+                    unit_group.cacheable
+                    and self.schema_version == schema_version
+                ):
+                    self._cache_compiled_query(query_req, unit_group)
+                    compiled += 1
+
+        async with asyncio.TaskGroup() as g:
+            for data in requests:
+                g.create_task(precompile(data))
+
+        return compiled
+
     def invalidate_cache_entry_object(self, obj):
         self._eql_to_compiled.pop(obj, None)
 
@@ -587,6 +795,9 @@ cdef class Database:
     def get_query_cache_size(self):
         return len(self._eql_to_compiled) + len(self._sql_to_compiled)
 
+    def get_query_cache_memory(self):
+        return self._eql_to_compiled.nbytes
+
     async def introspection(self):
         if self.user_schema_pickle is None:
             async with self._introspection_lock:
@@ -673,6 +884,7 @@ cdef class DatabaseConnectionView:
         self._in_tx_user_schema_version = None
         self._in_tx_global_schema_pickle = None
         self._in_tx_new_types = {}
+        self._in_tx_write_tables = set()
         self._in_tx_user_config_spec = None
         self._in_tx_state_serializer = None
         self._tx_error = False
@@ -1177,6 +1389,14 @@ cdef class DatabaseConnectionView:
 
     cdef _apply_in_tx(self, query_unit):
         self._in_tx_capabilities |= query_unit.capabilities
+        if (
+            query_unit.capabilities & DML_CAPABILITIES
+            and self._in_tx_write_tables is not None
+        ):
+            if query_unit.write_tables is None:
+                self._in_tx_write_tables = None
+            else:
+                self._in_tx_write_tables.update(query_unit.write_tables)
         if query_unit.system_config:
             self._in_tx_with_sysconfig = True
         if query_unit.database_config:
@@ -1213,19 +1433,12 @@ cdef class DatabaseConnectionView:
         if not self._in_tx:
             if query_unit.capabilities & DML_CAPABILITIES:
                 self._db.dml_queries_executed += 1
+                self._db.on_tables_written(query_unit.write_tables)
             if new_types:
                 self._db._update_backend_ids(new_types)
             if query_unit.user_schema is not None:
-                self._db._set_and_signal_new_user_schema(
-                    query_unit.user_schema,
-                    query_unit.user_schema_version,
-                    query_unit.extensions,
-                    query_unit.ext_config_settings,
-                    query_unit.feature_used_metrics,
-                    pickle.loads(query_unit.cached_reflection)
-                        if query_unit.cached_reflection is not None
-                        else None,
-                )
+                self._db._set_and_signal_new_user_schema_from_unit(
+                    query_unit)
                 side_effects |= SideEffects.SchemaChanges
             if query_unit.system_config:
                 side_effects |= SideEffects.InstanceConfigChanges
@@ -1258,19 +1471,12 @@ cdef class DatabaseConnectionView:
 
             if self._in_tx_capabilities & DML_CAPABILITIES:
                 self._db.dml_queries_executed += 1
+                self._db.on_tables_written(self._in_tx_write_tables)
             if self._in_tx_new_types:
                 self._db._update_backend_ids(self._in_tx_new_types)
             if query_unit.user_schema is not None:
-                self._db._set_and_signal_new_user_schema(
-                    query_unit.user_schema,
-                    query_unit.user_schema_version,
-                    query_unit.extensions,
-                    query_unit.ext_config_settings,
-                    query_unit.feature_used_metrics,  # XXX? does this get set?
-                    pickle.loads(query_unit.cached_reflection)
-                        if query_unit.cached_reflection is not None
-                        else None,
-                )
+                self._db._set_and_signal_new_user_schema_from_unit(
+                    query_unit)
                 side_effects |= SideEffects.SchemaChanges
             if self._in_tx_with_sysconfig:
                 side_effects |= SideEffects.InstanceConfigChanges
@@ -1309,6 +1515,8 @@ cdef class DatabaseConnectionView:
         self._modaliases = self._in_tx_modaliases
         self._globals = self._in_tx_globals
 
+        if self._in_tx_capabilities & DML_CAPABILITIES:
+            self._db.on_tables_written(self._in_tx_write_tables)
         if self._in_tx_new_types:
             self._db._update_backend_ids(self._in_tx_new_types)
         if user_schema is not None:
@@ -1399,8 +1607,11 @@ cdef class DatabaseConnectionView:
         async with asyncio.TaskGroup() as g:
             req: rpc.CompilationRequest
             cnt = 0
-            # Reversed so that we compile more recently used first.
-            for req, grp in reversed(self._db._eql_to_compiled.items()):
+            # Most used first, so that the timeout cuts off the least
+            # valuable entries.
+            for req, grp in self._db._eql_to_compiled.most_used(
+                len(self._db._eql_to_compiled)
+            ):
                 if (
                     len(grp) == 1
                     # Only recompile queries from the *latest* version,
@@ -1479,6 +1690,8 @@ cdef class DatabaseConnectionView:
                     query_req, query_unit_group, use_metrics)
 
         lock = None
+        shared_key = None
+        compiled_by = 'compiler'
         schema_version = self.schema_version
 
         # Lock on the query compilation to avoid other coroutines running
@@ -1518,21 +1731,40 @@ cdef class DatabaseConnectionView:
                     return self.as_compiled(
                         query_req, query_unit_group, use_metrics)
 
-            try:
-                query_unit_group = await self._compile(query_req)
-            except (errors.EdgeQLSyntaxError, errors.InternalServerError):
-                raise
-            except errors.EdgeDBError:
-                if self.in_tx_error():
-                    # Because we are in an error state it's more reasonable
-                    # to fail with TransactionError("commands ignored")
-                    # rather than with a potentially more cryptic error.
-                    # An exception from this rule are syntax errors and
-                    # ISEs, because these could arise while the user is
-                    # trying to properly rollback this failed transaction.
-                    self.raise_in_tx_error()
-                else:
+                # Another branch with an identical schema might have
+                # compiled this query already.  SQL is not shared as it
+                # depends on the branch name.
+                if (
+                    not cached_globally
+                    and not self.in_tx()
+                    and query_req.input_language
+                        is not enums.InputLanguage.SQL
+                ):
+                    shared_key = (self._db.get_schema_fingerprint(), query_req)
+                    query_unit_group = (
+                        self.server.shared_compile_cache.get(shared_key)
+                    )
+                    if query_unit_group is not None:
+                        query_unit_group = query_unit_group.clone()
+                        compiled_by = 'shared_cache'
+
+            if query_unit_group is None:
+                try:
+                    query_unit_group = await self._compile(query_req)
+                except (errors.EdgeQLSyntaxError, errors.InternalServerError):
                     raise
+                except errors.EdgeDBError:
+                    if self.in_tx_error():
+                        # Because we are in an error state it's more
+                        # reasonable to fail with TransactionError("commands
+                        # ignored") rather than with a potentially more
+                        # cryptic error.  An exception from this rule are
+                        # syntax errors and ISEs, because these could arise
+                        # while the user is trying to properly rollback this
+                        # failed transaction.
+                        self.raise_in_tx_error()
+                    else:
+                        raise
 
             self.check_capabilities(
                 query_unit_group,
@@ -1571,6 +1803,12 @@ cdef class DatabaseConnectionView:
                     )
                 else:
                     self.cache_compiled_query(query_req, query_unit_group)
+                    if shared_key is not None and compiled_by == 'compiler':
+                        # Store a pristine copy, as the per-branch one is
+                        # going to be switched to the function cache.
+                        self.server.shared_compile_cache[shared_key] = (
+                            query_unit_group.clone()
+                        )
         finally:
             if lock is not None:
                 lock.release()
@@ -1614,7 +1852,7 @@ cdef class DatabaseConnectionView:
         if use_metrics:
             if query_req.input_language is enums.InputLanguage.EDGEQL:
                 metrics.edgeql_query_compilations.inc(
-                    1.0, self.tenant.get_instance_name(), 'compiler'
+                    1.0, self.tenant.get_instance_name(), compiled_by
                 )
             else:
                 metrics.sql_compilations.inc(
@@ -1827,20 +2065,55 @@ cdef class DatabaseConnectionView:
                     client_name=self.tenant.get_instance_name(),
                 )
         finally:
+            duration = time.monotonic() - started_at
             metrics.edgeql_query_compilation_duration.observe(
-                time.monotonic() - started_at,
+                duration,
                 self.tenant.get_instance_name(),
             )
             metrics.query_compilation_duration.observe(
-                time.monotonic() - started_at,
+                duration,
                 self.tenant.get_instance_name(),
                 "edgeql",
             )
 
         unit_group, self._last_comp_state, self._last_comp_state_id = result
 
+        if unit_group.compile_phases:
+            self._report_compile_phases(query_req, unit_group, duration)
+
         return unit_group
 
+    cdef _report_compile_phases(self, query_req, unit_group, duration):
+        tenant = self.tenant.get_instance_name()
+        phases = unit_group.compile_phases
+        for name, (phase_duration, allocations) in phases.items():
+            metrics.query_compilation_phase_duration.observe(
+                phase_duration, tenant, name)
+            if allocations is not None:
+                metrics.query_compilation_phase_allocations.observe(
+                    max(allocations, 0), tenant, name)
+
+        if 0 < SLOW_COMPILE_LOG_THRESHOLD <= duration:
+            # Only the hash of the query text is logged, as the text itself
+            # may contain sensitive data.
+            text_hash = hashlib.blake2b(
+                query_req.source.text().encode('utf-8'), digest_size=8,
+            ).hexdigest()
+            logger.warning(
+                "slow compilation of query %s in branch %r: %.3fs (%s)",
+                text_hash,
+                self.dbname,
+                duration,
+                ", ".join(
+                    f"{name}: {phase_duration:.3f}s"
+                    + (
+                        f", {allocations} blocks"
+                        if allocations is not None else ""
+                    )
+                    for name, (phase_duration, allocations) in phases.items()
+                ),
+            )
+
     async def _compile_sql_descriptors(
         self,
         query_req: rpc.CompilationRequest,
@@ -2037,7 +2310,10 @@ cdef class DatabaseIndex:
         return self._global_schema_pickle
 
     def update_global_schema(self, global_schema_pickle):
+        cdef Database db
         self._global_schema_pickle = global_schema_pickle
+        for db in self._dbs.values():
+            db._schema_fingerprint = None
         self.invalidate_caches()
 
     def register_db(
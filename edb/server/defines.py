@@ -59,6 +59,8 @@ BACKEND_COMPILER_POOL_SIZE_MIN = 1
 BACKEND_COMPILER_TEMPLATE_PROC_RESTART_INTERVAL = 1
 
 _MAX_QUERIES_CACHE_SYSTEM = 1000
+_MAX_QUERIES_CACHE_SHARED = 5000
+_MAX_HOT_QUERIES_PRECOMPILE = 500
 
 _QUERY_ROLLING_AVG_LEN = 10
 _QUERIES_ROLLING_AVG_LEN = 300
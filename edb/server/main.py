@@ -216,6 +216,7 @@ async def _run_server(
             instance_name=args.instance_name,
             max_backend_connections=args.max_backend_connections,
             backend_adaptive_ha=args.backend_adaptive_ha,
+            backend_replica_dsns=args.backend_replica_dsns,
             extensions_dir=args.extensions_dir,
         )
         tenant.set_init_con_data(init_con_data)
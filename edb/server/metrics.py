@@ -30,6 +30,9 @@ COUNT_BUCKETS = prom.per_order_buckets(
 BYTES_BUCKETS = prom.per_order_buckets(
     32, 2**20, entries_per_order=1, base=2,
 )
+ALLOCATION_BUCKETS = prom.per_order_buckets(
+    100, 10**7, entries_per_order=1,
+)
 
 compiler_process_spawns = registry.new_counter(
     'compiler_process_spawns_total',
@@ -84,12 +87,39 @@ compiler_pool_wait_time = registry.new_histogram(
     unit=prom.Unit.SECONDS,
 )
 
+compiler_pool_queue_wait_time = registry.new_labeled_histogram(
+    'compiler_pool_queue_wait_time',
+    'Time requests of each scheduling class wait for a compiler process.',
+    unit=prom.Unit.SECONDS,
+    labels=('priority',),
+)
+
 compiler_pool_queue_errors = registry.new_labeled_counter(
     'compiler_pool_queue_errors_total',
     'Number of compiler pool errors in queue.',
     labels=('type',),
 )
 
+compiler_pool_affinity_routing = registry.new_labeled_counter(
+    'compiler_pool_affinity_routing_total',
+    'Number of branch requests served by one of the home compiler '
+    'processes of the branch ("home") or by another one ("spill").',
+    labels=('result',),
+)
+
+compiler_pool_schema_sync_misses = registry.new_labeled_counter(
+    'compiler_pool_schema_sync_misses_total',
+    'Number of compile requests that had to sync the branch state '
+    'to the compiler process.',
+    labels=('client',),
+)
+
+compiler_pool_coalesced_requests = registry.new_labeled_counter(
+    'compiler_pool_coalesced_requests_total',
+    'Number of compile requests served by an identical in-flight request.',
+    labels=('method',),
+)
+
 current_branches = registry.new_labeled_gauge(
     'branches_current',
     'Current number of branches.',
@@ -133,6 +163,62 @@ backend_connection_aborted = registry.new_labeled_counter(
     labels=('tenant', 'pgcode')
 )
 
+backend_replica_available = registry.new_labeled_gauge(
+    'backend_replica_available',
+    'Whether a read replica of the backend is available (1) or not (0).',
+    labels=('tenant', 'replica'),
+)
+
+backend_replica_lag = registry.new_labeled_gauge(
+    'backend_replica_lag',
+    'Last measured replication lag of a read replica of the backend.',
+    unit=prom.Unit.SECONDS,
+    labels=('tenant', 'replica'),
+)
+
+backend_replica_routing = registry.new_labeled_counter(
+    'backend_replica_routing_total',
+    'Number of read-only queries allowed to run on a read replica, by the '
+    'backend they were sent to ("primary" if no replica was usable).',
+    labels=('tenant', 'backend'),
+)
+
+backend_connection_state_reuse = registry.new_labeled_counter(
+    'backend_connection_state_reuse_total',
+    'Number of backend connections acquired for a client session, by '
+    'whether the session state was already applied on the connection '
+    '("hit") or needed to be synced ("miss").',
+    labels=('tenant', 'result'),
+)
+
+backend_prepared_statement_reuse = registry.new_labeled_counter(
+    'backend_prepared_statement_reuse_total',
+    'Number of backend connections acquired to run a prepared statement, by '
+    'whether the statement was already prepared on the connection ("hit") '
+    'or needed to be parsed ("miss").',
+    labels=('tenant', 'branch', 'result'),
+)
+
+backend_connections_pinned = registry.new_labeled_gauge(
+    'backend_connections_pinned',
+    'Current number of backend connections pinned by open transactions.',
+    labels=('tenant', 'branch'),
+)
+
+backend_connections_pinned_ratio = registry.new_labeled_gauge(
+    'backend_connections_pinned_ratio',
+    'Share of the backend connections of a branch that are pinned by '
+    'open transactions.',
+    labels=('tenant', 'branch'),
+)
+
+backend_idle_transactions_aborted = registry.new_labeled_counter(
+    'backend_idle_transactions_aborted_total',
+    'Number of idle transactions aborted to free up backend connections '
+    'for other clients.',
+    labels=('tenant', 'branch'),
+)
+
 backend_query_duration = registry.new_labeled_histogram(
     'backend_query_duration',
     'Time it takes to run a query on a backend connection.',
@@ -178,6 +264,20 @@ edgeql_query_compilation_duration = registry.new_labeled_histogram(
     labels=('tenant',),
 )
 
+query_result_cache_lookups = registry.new_labeled_counter(
+    'query_result_cache_lookups_total',
+    'Number of read-only query executions that looked up the result cache, '
+    'by where the results came from ("cache" or "backend").',
+    labels=('tenant', 'path')
+)
+
+queries_pipelined = registry.new_labeled_counter(
+    'queries_pipelined_total',
+    'Number of queries sent to the backend before the results of the '
+    'preceding queries were read back.',
+    labels=('tenant',)
+)
+
 graphql_query_compilations = registry.new_labeled_counter(
     'graphql_query_compilations_total',
     'Number of compiled/cached GraphQL queries.',
@@ -191,6 +291,21 @@ query_compilation_duration = registry.new_labeled_histogram(
     labels=('tenant', 'interface'),
 )
 
+query_compilation_phase_duration = registry.new_labeled_histogram(
+    'query_compilation_phase_duration',
+    'Time the compiler spends in every phase of compiling a query or script.',
+    unit=prom.Unit.SECONDS,
+    labels=('tenant', 'phase'),
+)
+
+query_compilation_phase_allocations = registry.new_labeled_histogram(
+    'query_compilation_phase_allocations',
+    'Number of memory blocks allocated (and not freed) by the compiler '
+    'in every phase of compiling a query or script.',
+    buckets=ALLOCATION_BUCKETS,
+    labels=('tenant', 'phase'),
+)
+
 sql_queries = registry.new_labeled_counter(
     'sql_queries_total',
     'Number of SQL queries.',
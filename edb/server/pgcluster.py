@@ -165,6 +165,7 @@ class BaseCluster:
                       *,
                       source_description: str,
                       apply_init_script: bool = False,
+                      allow_hot_standby: bool = False,
                       **kwargs: Unpack[pgconnparams.CreateParamsKwargs]
     ) -> pgcon.PGConnection:
         """Connect to this cluster, with optional overriding parameters. If
@@ -182,6 +183,7 @@ class BaseCluster:
             source_description=source_description,
             backend_params=self.get_runtime_params(),
             apply_init_script=apply_init_script,
+            allow_hot_standby=allow_hot_standby,
         )
         return conn
 
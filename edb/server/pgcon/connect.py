@@ -195,6 +195,7 @@ async def pg_connect(
     backend_params: pg_params.BackendRuntimeParams,
     source_description: str,
     apply_init_script: bool = True,
+    allow_hot_standby: bool = False,
 ) -> pgcon.PGConnection:
     global INIT_CON_SCRIPT
 
@@ -238,16 +239,25 @@ async def pg_connect(
     if 'in_hot_standby' in pgconn.parameter_status:
         # in_hot_standby is always present in Postgres 14 and above
         if pgconn.parameter_status['in_hot_standby'] == 'on':
-            # Abort if we're connecting to a hot standby
-            pgconn.terminate()
-            raise pgerror.BackendError(
-                fields=dict(
-                    M="cannot use a hot standby",
-                    C=pgerror.ERROR_READ_ONLY_SQL_TRANSACTION,
+            if allow_hot_standby:
+                pgconn.is_hot_standby = True
+            else:
+                # Abort if we're connecting to a hot standby
+                pgconn.terminate()
+                raise pgerror.BackendError(
+                    fields=dict(
+                        M="cannot use a hot standby",
+                        C=pgerror.ERROR_READ_ONLY_SQL_TRANSACTION,
+                    )
                 )
-            )
-
-    if apply_init_script:
+    elif allow_hot_standby:
+        pgconn.is_hot_standby = await pgconn.sql_fetch_val(
+            b'SELECT pg_is_in_recovery()::text') == b'true'
+
+    # The init script creates temporary tables, which a hot standby
+    # doesn't allow: connections to it can only be used for reading
+    # data that doesn't depend on the session state.
+    if apply_init_script and not pgconn.is_hot_standby:
         if INIT_CON_SCRIPT is None:
             INIT_CON_SCRIPT = _build_init_con_script(
                 # On lower versions of Postgres we use pg_is_in_recovery() to
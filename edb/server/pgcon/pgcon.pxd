@@ -104,9 +104,10 @@ cdef class PGConnection:
 
         public object pinned_by
 
-        object last_state
+        readonly object last_state
         bint state_reset_needs_commit
         public object last_init_con_data
+        public bint is_hot_standby
 
         str last_indirect_return
 
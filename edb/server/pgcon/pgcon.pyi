@@ -47,6 +47,9 @@ class PGConnection(asyncio.Protocol):
     backend_secret: int
     is_ssl: bool
     last_init_con_data: object
+    is_hot_standby: bool
+    last_state: object
+    pinned_by: Any
 
     def __init__(self, dbname): ...
     async def close(self): ...
@@ -92,6 +95,7 @@ class PGConnection(asyncio.Protocol):
     def add_log_listener(self, cb: Callable[[str, str], None]) -> None: ...
     def get_server_parameter_status(self, parameter: str) -> Optional[str]: ...
     def set_stmt_cache_size(self, size: int) -> None: ...
+    def has_prepared_stmt(self, stmt_name: bytes) -> bool: ...
     def set_server(self, server: object) -> None: ...
     async def signal_sysevent(self, event: str, *, dbname: str) -> None: ...
     def abort(self) -> None: ...
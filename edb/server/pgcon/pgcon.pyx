@@ -84,6 +84,11 @@ DEF PREP_STMTS_CACHE = 100
 
 DEF COPY_SIGNATURE = b"PGCOPY\n\377\r\n\0"
 
+# What to do with a column when rewriting restore COPY data
+DEF _COPY_COL_PASS = 0
+DEF _COPY_COL_ELIDE = 1
+DEF _COPY_COL_MEND = 2
+
 cdef object CARD_NO_RESULT = compiler.Cardinality.NO_RESULT
 cdef object FMT_NONE = compiler.OutputFormat.NONE
 cdef dict POSTGRES_SHUTDOWN_ERR_CODES = {
@@ -96,6 +101,16 @@ cdef WriteBuffer NO_ARGS = args_ser.combine_raw_args()
 
 cdef object logger = logging.getLogger('edb.server')
 
+
+cdef bint _restore_block_needs_rewrite(restore_block):
+    if restore_block.compat_elided_cols:
+        return True
+    for desc in restore_block.data_mending_desc:
+        if desc is not None and desc.needs_mending:
+            return True
+    return False
+
+
 include "./pgcon_sql.pyx"
 
 
@@ -153,6 +168,9 @@ cdef class PGConnection:
         self.close_requested = False
 
         self.pinned_by = None
+        # Set by pg_connect() on read-only connections to a hot standby,
+        # which cannot hold the session state.
+        self.is_hot_standby = False
 
         self.idle = True
         self.cancel_fut = None
@@ -371,6 +389,9 @@ cdef class PGConnection:
         else:
             return self.tenant.get_instance_name()
 
+    def has_prepared_stmt(self, bytes stmt_name):
+        return stmt_name in self.prep_stmts
+
     cdef bint before_prepare(
         self,
         bytes stmt_name,
@@ -1301,6 +1322,357 @@ cdef class PGConnection:
             )
             await self.after_command()
 
+    async def _parse_execute_batch(
+        self,
+        query,
+        frontend.AbstractFrontendConnection fe_conn,
+        list bind_datas,
+        list param_data_types,
+        bytes state,
+        int dbver,
+        bint use_pending_func_cache,
+        bytes query_prefix,
+        bint needs_commit_state,
+    ):
+        cdef:
+            WriteBuffer out
+            WriteBuffer buf
+            WriteBuffer bind_data
+            bytes stmt_name
+            bytes sql
+
+            int32_t dat_len
+
+            bint parse
+            bint state_sync = 0
+
+            bint discard_result = (
+                fe_conn is not None and query.output_format == FMT_NONE)
+
+            ssize_t executed = 0
+            ssize_t i
+
+        if not bind_datas:
+            # Nothing to execute; in particular, don't Parse a statement
+            # that would never be recorded as prepared.
+            return None
+
+        out = WriteBuffer.new()
+
+        if state is not None:
+            self._build_apply_state_req(state, out)
+            if needs_commit_state or self.state_reset_needs_commit:
+                # See the comment in _parse_execute()
+                state_sync = 1
+                self.write_sync(out)
+
+        if use_pending_func_cache and query.cache_func_call:
+            sql, stmt_name = query.cache_func_call
+        else:
+            sql = query.sql
+            stmt_name = query.sql_hash
+        sql = query_prefix + sql
+
+        parse = self.before_prepare(stmt_name, dbver, out)
+        if parse:
+            if len(self.last_parse_prep_stmts):
+                for stmt_name_to_clean in self.last_parse_prep_stmts:
+                    out.write_buffer(
+                        self.make_clean_stmt_message(stmt_name_to_clean))
+                self.last_parse_prep_stmts.clear()
+
+            buf = WriteBuffer.new_message(b'P')
+            buf.write_bytestring(stmt_name)
+            buf.write_bytestring(sql)
+            if param_data_types:
+                buf.write_int16(len(param_data_types))
+                for oid in param_data_types:
+                    buf.write_int32(<int32_t>oid)
+            else:
+                buf.write_int16(0)
+            out.write_buffer(buf.end_message())
+            metrics.query_size.observe(
+                len(sql), self.get_tenant_label(), 'compiled'
+            )
+
+        # Every set of arguments is bound to the same statement and
+        # executed before a single SYNC, so they all run in the same
+        # (possibly implicit) transaction.
+        for bind_data in bind_datas:
+            buf = WriteBuffer.new_message(b'B')
+            buf.write_bytestring(b'')  # portal name
+            buf.write_bytestring(stmt_name)  # statement name
+            buf.write_buffer(bind_data)
+            out.write_buffer(buf.end_message())
+
+            buf = WriteBuffer.new_message(b'E')
+            buf.write_bytestring(b'')  # portal name
+            buf.write_int32(0)  # limit: 0 - return all rows
+            out.write_buffer(buf.end_message())
+
+        self.write_sync(out)
+        self.write(out)
+
+        result = None
+
+        try:
+            if state is not None:
+                await self.wait_for_state_resp(
+                    state, state_sync, needs_commit_state)
+
+            buf = None
+            while executed < len(bind_datas):
+                if not self.buffer.take_message():
+                    await self.wait_for_message()
+                mtype = self.buffer.get_message_type()
+
+                try:
+                    if mtype == b'D':
+                        # DataRow
+                        if discard_result:
+                            self.buffer.discard_message()
+                            continue
+
+                        if fe_conn is None:
+                            ncol = self.buffer.read_int16()
+                            row = []
+                            for i in range(ncol):
+                                dat_len = self.buffer.read_int32()
+                                if dat_len == -1:
+                                    row.append(None)
+                                else:
+                                    row.append(
+                                        self.buffer.read_bytes(dat_len))
+                            if result is None:
+                                result = []
+                            result.append(row)
+                        else:
+                            if buf is None:
+                                buf = WriteBuffer.new()
+
+                            self.buffer.redirect_messages(buf, b'D', 0)
+                            if buf.len() >= DATA_BUFFER_SIZE:
+                                fe_conn.write(buf)
+                                buf = None
+
+                    elif mtype == b'C':
+                        # CommandComplete
+                        self.buffer.discard_message()
+                        if buf is not None:
+                            fe_conn.write(buf)
+                            buf = None
+                        executed += 1
+
+                    elif mtype == b'1' and parse:
+                        # ParseComplete
+                        self.buffer.discard_message()
+                        self.prep_stmts[stmt_name] = dbver
+
+                    elif mtype == b'E':
+                        # ErrorResponse
+                        er_cls, er_fields = self.parse_error_message()
+                        raise er_cls(fields=er_fields)
+
+                    elif mtype == b'n' or mtype == b'2' or mtype == b'3':
+                        # NoData, BindComplete, CloseComplete
+                        self.buffer.discard_message()
+
+                    else:
+                        self.fallthrough()
+
+                finally:
+                    self.buffer.finish_message()
+        finally:
+            await self.wait_for_sync()
+
+        return result
+
+    async def parse_execute_batch(
+        self,
+        *,
+        query,
+        list bind_datas,
+        list param_data_types = None,
+        frontend.AbstractFrontendConnection fe_conn = None,
+        bytes state = None,
+        int dbver = 0,
+        bint use_pending_func_cache = 0,
+        query_prefix = None,
+        bint needs_commit_state = False,
+    ):
+        self.before_command()
+        started_at = time.monotonic()
+        try:
+            return await self._parse_execute_batch(
+                query,
+                fe_conn,
+                bind_datas,
+                param_data_types,
+                state,
+                dbver,
+                use_pending_func_cache,
+                query_prefix or b'',
+                needs_commit_state,
+            )
+        finally:
+            metrics.backend_query_duration.observe(
+                time.monotonic() - started_at, self.get_tenant_label()
+            )
+            await self.after_command()
+
+    def start_pipeline(self):
+        self.before_command()
+
+    async def finish_pipeline(self):
+        try:
+            # Discard the results of whatever was not read, e.g.
+            # because an earlier query in the pipeline has failed.
+            while self.waiting_for_sync:
+                try:
+                    await self.wait_for_sync()
+                except pgerror.BackendError:
+                    pass
+        finally:
+            await self.after_command()
+
+    def send_pipelined_query(
+        self,
+        query,
+        WriteBuffer bind_data,
+        list param_data_types,
+        int dbver,
+        bint use_pending_func_cache,
+        bytes query_prefix,
+    ):
+        """Send a query without waiting for its results.
+
+        Every query is followed by its own SYNC, so it runs in its own
+        implicit transaction just like with parse_execute().  The results
+        must be read in the same order with read_pipelined_query(), which
+        takes the returned value.
+        """
+        cdef:
+            WriteBuffer out
+            WriteBuffer buf
+            bytes stmt_name
+            bytes sql
+            bint parse
+
+        out = WriteBuffer.new()
+
+        if use_pending_func_cache and query.cache_func_call:
+            sql, stmt_name = query.cache_func_call
+        else:
+            sql = query.sql
+            stmt_name = query.sql_hash
+        sql = query_prefix + sql
+
+        parse = self.before_prepare(stmt_name, dbver, out)
+        if parse:
+            if len(self.last_parse_prep_stmts):
+                for stmt_name_to_clean in self.last_parse_prep_stmts:
+                    out.write_buffer(
+                        self.make_clean_stmt_message(stmt_name_to_clean))
+                self.last_parse_prep_stmts.clear()
+
+            buf = WriteBuffer.new_message(b'P')
+            buf.write_bytestring(stmt_name)
+            buf.write_bytestring(sql)
+            if param_data_types:
+                buf.write_int16(len(param_data_types))
+                for oid in param_data_types:
+                    buf.write_int32(<int32_t>oid)
+            else:
+                buf.write_int16(0)
+            out.write_buffer(buf.end_message())
+            metrics.query_size.observe(
+                len(sql), self.get_tenant_label(), 'compiled'
+            )
+            # Register the statement right away, so that the following
+            # queries in the pipeline don't parse it again.
+            self.prep_stmts[stmt_name] = dbver
+
+        buf = WriteBuffer.new_message(b'B')
+        buf.write_bytestring(b'')  # portal name
+        buf.write_bytestring(stmt_name)  # statement name
+        buf.write_buffer(bind_data)
+        out.write_buffer(buf.end_message())
+
+        buf = WriteBuffer.new_message(b'E')
+        buf.write_bytestring(b'')  # portal name
+        buf.write_int32(0)  # limit: 0 - return all rows
+        out.write_buffer(buf.end_message())
+
+        self.write_sync(out)
+        self.write(out)
+
+        return stmt_name if parse else None
+
+    async def read_pipelined_query(
+        self,
+        query,
+        frontend.AbstractFrontendConnection fe_conn,
+        bytes parsed_stmt_name,
+    ):
+        cdef:
+            WriteBuffer buf = None
+            bint discard_result = query.output_format == FMT_NONE
+            bint parse_complete = False
+
+        er = None
+        while True:
+            if not self.buffer.take_message():
+                await self.wait_for_message()
+            mtype = self.buffer.get_message_type()
+
+            try:
+                if mtype == b'D':
+                    # DataRow
+                    if discard_result or er is not None:
+                        self.buffer.discard_message()
+                        continue
+                    if buf is None:
+                        buf = WriteBuffer.new()
+                    self.buffer.redirect_messages(buf, b'D', 0)
+                    if buf.len() >= DATA_BUFFER_SIZE:
+                        fe_conn.write(buf)
+                        buf = None
+
+                elif mtype == b'C' or mtype == b'I' or mtype == b's':
+                    # CommandComplete, EmptyQueryResponse, PortalSuspended
+                    self.buffer.discard_message()
+                    if buf is not None:
+                        fe_conn.write(buf)
+                        buf = None
+
+                elif mtype == b'1':
+                    # ParseComplete
+                    self.buffer.discard_message()
+                    parse_complete = True
+
+                elif mtype == b'E':
+                    # ErrorResponse
+                    er = self.parse_error_message()
+
+                elif mtype == b'n' or mtype == b'2' or mtype == b'3':
+                    # NoData, BindComplete, CloseComplete
+                    self.buffer.discard_message()
+
+                elif mtype == b'Z':
+                    self.parse_sync_message()
+                    break
+
+                else:
+                    self.fallthrough()
+
+            finally:
+                self.buffer.finish_message()
+
+        if er is not None:
+            if parsed_stmt_name is not None and not parse_complete:
+                self.prep_stmts.pop(parsed_stmt_name, None)
+            raise er[0](fields=er[1])
+
     async def sql_fetch(
         self,
         sql: bytes,
@@ -1698,10 +2070,7 @@ cdef class PGConnection:
 
         buf = WriteBuffer.new()
         cpython.PyBytes_AsStringAndSize(data, &cbuf, &clen)
-        if (
-            restore_block.compat_elided_cols
-            or any(desc for desc in restore_block.data_mending_desc)
-        ):
+        if _restore_block_needs_rewrite(restore_block):
             self._rewrite_copy_data(
                 buf,
                 cbuf,
@@ -1711,7 +2080,10 @@ cdef class PGConnection:
                 type_map,
                 restore_block.compat_elided_cols,
             )
+            self.write(buf)
         else:
+            # The data can be sent as is, only the binary COPY header
+            # needs to be spliced into the first CopyData message.
             if cbuf[0] != b'd':
                 raise RuntimeError('unexpected dump data message structure')
             ln = <uint32_t>hton.unpack_int32(cbuf + 1)
@@ -1720,9 +2092,8 @@ cdef class PGConnection:
             buf.write_bytes(COPY_SIGNATURE)
             buf.write_int32(0)
             buf.write_int32(0)
-            buf.write_cstr(cbuf + 5, clen - 5)
-
-        self.write(buf)
+            self.write(buf)
+            self.write(memoryview(data)[5:])
 
         qbuf = WriteBuffer.new_message(b'c')
         qbuf.end_message()
@@ -1757,30 +2128,43 @@ cdef class PGConnection:
         dict type_id_map,
         tuple elided_cols,
     ):
-        """Rewrite the binary COPY stream."""
+        """Rewrite the binary COPY stream.
+
+        Runs of adjacent columns that are neither elided nor need mending
+        are copied over with a single write per run.
+        """
         cdef:
             FRBuffer rbuf
             FRBuffer datum_buf
             ssize_t i
             ssize_t real_ncols
-            int8_t *elide
-            int8_t elided
+            int8_t *actions
+            int8_t action
             int32_t datum_len
             char copy_msg_byte
             int16_t copy_msg_ncols
             const char *datum
+            const char *run_start
             bint first = True
             bint received_eof = False
 
         real_ncols = ncols + len(elided_cols)
         frb_init(&rbuf, data, data_len)
 
-        elide = <int8_t*>cpythonx.PyMem_Calloc(
+        actions = <int8_t*>cpythonx.PyMem_Calloc(
             <size_t>real_ncols, sizeof(int8_t))
 
         try:
             for col in elided_cols:
-                elide[col] = 1
+                actions[col] = _COPY_COL_ELIDE
+
+            for i, desc in enumerate(data_mending_desc):
+                if (
+                    actions[i] != _COPY_COL_ELIDE
+                    and desc is not None
+                    and desc.needs_mending
+                ):
+                    actions[i] = _COPY_COL_MEND
 
             mbuf = WriteBuffer.new()
 
@@ -1814,35 +2198,39 @@ cdef class PGConnection:
                     mbuf.write_int16(<int16_t>ncols)
 
                 # Tuple data
-                for i in range(real_ncols):
+                i = 0
+                while i < real_ncols:
+                    action = actions[i]
+                    if action == _COPY_COL_PASS:
+                        run_start = rbuf.buf
+                        while i < real_ncols and actions[i] == _COPY_COL_PASS:
+                            datum_len = hton.unpack_int32(frb_read(&rbuf, 4))
+                            if datum_len != -1:
+                                frb_read(&rbuf, datum_len)
+                            i += 1
+                        mbuf.write_cstr(run_start, rbuf.buf - run_start)
+                        continue
+
                     datum_len = hton.unpack_int32(frb_read(&rbuf, 4))
-                    elided = elide[i]
-                    if not elided:
+                    if action == _COPY_COL_MEND:
                         mbuf.write_int32(datum_len)
                     if datum_len != -1:
                         datum = frb_read(&rbuf, datum_len)
-
-                        if not elided:
-                            datum_mending_desc = data_mending_desc[i]
-                            if (
-                                datum_mending_desc is not None
-                                and datum_mending_desc.needs_mending
-                            ):
-                                frb_init(&datum_buf, datum, datum_len)
-                                self._mend_copy_datum(
-                                    mbuf,
-                                    &datum_buf,
-                                    datum_mending_desc,
-                                    type_id_map,
-                                )
-                            else:
-                                mbuf.write_cstr(datum, datum_len)
+                        if action == _COPY_COL_MEND:
+                            frb_init(&datum_buf, datum, datum_len)
+                            self._mend_copy_datum(
+                                mbuf,
+                                &datum_buf,
+                                data_mending_desc[i],
+                                type_id_map,
+                            )
+                    i += 1
 
                 mbuf.end_message()
                 wbuf.write_buffer(mbuf)
                 mbuf.reset()
         finally:
-            cpython.PyMem_Free(elide)
+            cpython.PyMem_Free(actions)
 
     cdef _mend_copy_datum(
         self,
@@ -2128,6 +2516,10 @@ cdef class PGConnection:
                     self.tenant.on_remote_query_cache_change(
                         dbname, to_add=to_add, to_invalidate=to_invalidate
                     )
+                elif event == 'result-cache-changes':
+                    dbname = event_payload['dbname']
+                    tables = event_payload.get('tables')
+                    self.tenant.on_remote_result_cache_change(dbname, tables)
                 else:
                     raise AssertionError(f'unexpected system event: {event!r}')
 
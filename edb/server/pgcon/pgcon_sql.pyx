@@ -662,6 +662,7 @@ cdef class PGSQLConnection:
                 elif mtype == b'Z':  # ReadyForQuery
                     ignore_till_sync = False
                     dbv.end_implicit()
+                    fe_conn.on_sync()
                     status = self.con.parse_sync_message()
                     msg_buf = WriteBuffer.new_message(b'Z')
                     msg_buf.write_byte(status)
@@ -71,6 +71,7 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         int last_state_id
 
         bint _in_dump_restore
+        bint _pipeline_enabled
 
         bytes _auth_data
         dict  _conn_params
@@ -78,6 +79,10 @@ cdef class EdgeConnection(frontend.FrontendConnection):
     cdef inline dbview.DatabaseConnectionView get_dbview(self)
 
     cdef parse_execute_request(self)
+    cdef bint _next_message_is_execute(self)
+    cdef _finish_execute(self, dbview.CompiledQuery compiled)
+    cdef WriteBuffer _make_execute_complete(
+        self, dbview.CompiledQuery compiled)
     cdef parse_cardinality(self, bytes card)
     cdef char render_cardinality(self, query_unit) except -1
 
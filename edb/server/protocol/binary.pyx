@@ -44,6 +44,7 @@ from edb import edgeql
 from edb.edgeql import qltypes
 from edb.graphql import tokenizer as gql_tokenizer
 
+from edb.pgsql import common as pgcommon
 from edb.pgsql import parser as pgparser
 from edb.graphql import tokenizer as gql_tokenizer
 
@@ -121,6 +122,31 @@ cdef object log_metrics = logging.getLogger('edb.server.metrics')
 DEF QUERY_HEADER_DUMP_SECRETS = 0xFF10
 
 
+class _RestoreQueue(asyncio.Queue):
+    # Data blocks read ahead of the backend COPY, bounded by their total
+    # size as well as by their number, as dumps may have blocks of any
+    # size.  The queue is never too full for a single block.
+
+    def __init__(self, maxsize, maxbytes):
+        super().__init__(maxsize)
+        self._maxbytes = maxbytes
+        self._nbytes = 0
+
+    def full(self):
+        return super().full() or self._nbytes >= self._maxbytes
+
+    def _put(self, item):
+        if item is not None:
+            self._nbytes += len(item[1])
+        super()._put(item)
+
+    def _get(self):
+        item = super()._get()
+        if item is not None:
+            self._nbytes -= len(item[1])
+        return item
+
+
 def parse_catalog_version_header(value: bytes) -> uint64_t:
     if len(value) != 8:
         raise errors.BinaryProtocolError(
@@ -160,6 +186,7 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         self._conn_params = conn_params
 
         self._in_dump_restore = False
+        self._pipeline_enabled = False
 
         # Authentication data supplied by the transport (e.g. the content
         # of an HTTP Authorization header).
@@ -168,6 +195,9 @@ cdef class EdgeConnection(frontend.FrontendConnection):
     cdef is_in_tx(self):
         return self.get_dbview().in_tx()
 
+    cdef _get_backend_state(self):
+        return self.get_dbview().serialize_state()
+
     cdef inline dbview.DatabaseConnectionView get_dbview(self):
         if self._dbview is None:
             raise RuntimeError('Cannot access dbview while it is None')
@@ -279,6 +309,8 @@ cdef class EdgeConnection(frontend.FrontendConnection):
 
         self.dbname = database
         self.username = user
+        self._pipeline_enabled = (
+            params.get('pipeline', '').lower() in ('1', 'true', 'on'))
         # In the tunneled HTTP endpoint, auth gets done after we have
         # set up a dbview, so we need to update it..
         if self._dbview:
@@ -811,7 +843,24 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             pgcon.PGConnection conn
 
         dbv = self.get_dbview()
-        async with self.with_pgcon() as conn:
+        result_cache_key = execute.get_result_cache_key(
+            dbv, compiled, bind_args)
+        if result_cache_key is not None and execute.send_cached_result(
+            dbv, result_cache_key, self
+        ):
+            return
+
+        if (
+            self.tenant.has_replicas()
+            and await self._execute_on_replica(
+                compiled, bind_args, use_prep_stmt, query_req)
+        ):
+            return
+
+        query_unit = compiled.query_unit_group[0]
+        async with self.with_pgcon(
+            stmt_name=query_unit.sql_hash if use_prep_stmt else None
+        ) as conn:
             await execute.execute(
                 conn,
                 dbv,
@@ -820,9 +869,9 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 fe_conn=self,
                 use_prep_stmt=use_prep_stmt,
                 query_req=query_req,
+                result_cache_key=result_cache_key,
             )
 
-        query_unit = compiled.query_unit_group[0]
         if query_unit.config_requires_restart:
             self.write_log(
                 EdgeSeverity.EDGE_SEVERITY_NOTICE,
@@ -830,6 +879,202 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 'server restart is required for the configuration '
                 'change to take effect')
 
+    async def _execute_on_replica(
+        self,
+        compiled: dbview.CompiledQuery,
+        bind_args: bytes,
+        use_prep_stmt: bint,
+        query_req: Optional[rpc.CompilationRequest],
+    ):
+        # Returns False if the query should be run on the primary instead.
+        cdef:
+            dbview.DatabaseConnectionView dbv
+            pgcon.PGConnection conn
+
+        dbv = self.get_dbview()
+        max_staleness = execute.get_replica_max_staleness(dbv, compiled)
+        if not max_staleness:
+            return False
+        acquired = await self.tenant.acquire_replica_pgcon(
+            self.dbname,
+            max_staleness,
+            allow_hot_standby=execute.can_run_on_hot_standby(dbv),
+        )
+        if acquired is None:
+            return False
+
+        replica, conn = acquired
+        discard = True
+        try:
+            # No query_req: an error on the replica (e.g. a function that
+            # it hasn't replayed yet) says nothing about the compiled
+            # query, which must stay cached for the primary.
+            await execute.execute(
+                conn,
+                dbv,
+                compiled,
+                bind_args,
+                fe_conn=self,
+                use_prep_stmt=use_prep_stmt,
+            )
+            discard = False
+        except pgerror.BackendError as ex:
+            discard = False
+            # The replica may not have replayed the schema changes that
+            # the query was compiled against yet.  Such errors are raised
+            # before any data is sent, so just run it on the primary.
+            if not (
+                ex.code_is(pgerror.ERROR_UNDEFINED_TABLE)
+                or ex.code_is(pgerror.ERROR_UNDEFINED_COLUMN)
+                or ex.code_is(pgerror.ERROR_UNDEFINED_FUNCTION)
+            ):
+                raise
+            return False
+        finally:
+            replica.release(self.dbname, conn, discard=discard)
+
+        return True
+
+    cdef bint _next_message_is_execute(self):
+        if not self.buffer.take_message():
+            return False
+        is_execute = self.buffer.get_message_type() == b'O'
+        self.buffer.put_message()
+        return is_execute
+
+    async def _execute_pipeline(
+        self,
+        compiled: dbview.CompiledQuery,
+        bytes args,
+        query_req: rpc.CompilationRequest,
+    ):
+        # Executes the given query together with the subsequent Execute
+        # messages that are already received: as long as they qualify,
+        # they are all sent to the backend before reading any results.
+        #
+        # Messages read ahead are fully parsed (and compiled) before
+        # the results of the preceding queries are sent to the client,
+        # so their output (e.g. type descriptions) is held back until
+        # it is their turn.  Parsing a message applies its session state
+        # to the dbview, so the CommandComplete of every query, which
+        # reports the state, is made right after the query is sent.
+        cdef:
+            dbview.DatabaseConnectionView dbv
+            pgcon.PGConnection conn
+            WriteBuffer deferred = None
+
+        dbv = self.get_dbview()
+        pending = collections.deque()
+        held = None
+        held_error = None
+
+        async with self.with_pgcon() as conn:
+            if conn.last_state != dbv.serialize_state():
+                # The state must be synced first, let the first query
+                # do that and pipeline the rest.
+                await execute.execute(
+                    conn,
+                    dbv,
+                    compiled,
+                    args,
+                    fe_conn=self,
+                    use_prep_stmt=True,
+                    query_req=query_req,
+                )
+                self._finish_execute(compiled)
+                compiled = None
+
+            conn.start_pipeline()
+            try:
+                while True:
+                    # Send as many queries as possible ...
+                    while True:
+                        if compiled is None:
+                            if (
+                                len(pending) >= PIPELINE_MAX_DEPTH
+                                or not self._next_message_is_execute()
+                            ):
+                                break
+
+                            self.buffer.take_message()
+                            self.start_deferring_writes()
+                            try:
+                                next_exec = await self._prepare_execute()
+                            except Exception as ex:
+                                held_error = ex
+                                break
+                            finally:
+                                deferred = self.stop_deferring_writes()
+
+                            if (
+                                execute.can_pipeline(dbv, next_exec[0])
+                                and conn.last_state == dbv.serialize_state()
+                            ):
+                                compiled, args, query_req = next_exec
+                            else:
+                                held = next_exec
+                                break
+
+                        try:
+                            stmt = execute.send_pipelined(
+                                conn, dbv, compiled, args)
+                        except Exception as ex:
+                            # Report after the results of earlier queries
+                            held_error = ex
+                            break
+                        metrics.queries_pipelined.inc(
+                            1.0, self.get_tenant_label())
+                        pending.append((
+                            compiled,
+                            query_req,
+                            deferred,
+                            stmt,
+                            self._make_execute_complete(compiled),
+                        ))
+                        compiled = None
+                        deferred = None
+
+                    # ... and then forward their results in order.
+                    while pending:
+                        (
+                            p_compiled,
+                            p_query_req,
+                            p_deferred,
+                            p_stmt,
+                            p_complete,
+                        ) = pending.popleft()
+                        if p_deferred is not None:
+                            self.write(p_deferred)
+                        await execute.read_pipelined(
+                            conn,
+                            dbv,
+                            p_compiled,
+                            p_stmt,
+                            fe_conn=self,
+                            query_req=p_query_req,
+                        )
+                        if self._cancelled:
+                            raise ConnectionAbortedError
+                        self.write(p_complete)
+                        self.flush()
+
+                    if (
+                        held is not None
+                        or held_error is not None
+                        or not self._next_message_is_execute()
+                    ):
+                        break
+            finally:
+                await conn.finish_pipeline()
+
+        # The message that stopped the pipeline is processed as usual.
+        if deferred is not None:
+            self.write(deferred)
+        if held_error is not None:
+            raise held_error
+        if held is not None:
+            await self._run_execute(*held)
+
     cdef parse_execute_request(self):
         cdef:
             uint64_t allow_capabilities = 0
@@ -974,12 +1219,37 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         self.flush()
 
     async def execute(self):
+        compiled, args, query_req = await self._prepare_execute()
+        await self._run_execute(compiled, args, query_req)
+
+    async def execute_batch(self):
+        cdef:
+            dbview.DatabaseConnectionView _dbview
+
+        compiled, arg_sets, query_req = await self._prepare_execute(
+            batch=True)
+
+        _dbview = self.get_dbview()
+        async with self.with_pgcon() as conn:
+            await execute.execute_batch(
+                conn,
+                _dbview,
+                compiled,
+                arg_sets,
+                fe_conn=self,
+                query_req=query_req,
+            )
+
+        self._finish_execute(compiled)
+
+    async def _prepare_execute(self, bint batch=False):
         cdef:
             rpc.CompilationRequest query_req
             dbview.DatabaseConnectionView _dbview
             bytes in_tid
             bytes out_tid
-            bytes args
+            object args
+            uint32_t num_arg_sets
             uint64_t allow_capabilities
 
         if self.protocol_version >= (3, 0):
@@ -994,9 +1264,21 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         query_req, allow_capabilities = self.parse_execute_request()
         in_tid = self.buffer.read_bytes(16)
         out_tid = self.buffer.read_bytes(16)
-        args = self.buffer.read_len_prefixed_bytes()
+        if batch:
+            num_arg_sets = <uint32_t>self.buffer.read_int32()
+            args = [
+                self.buffer.read_len_prefixed_bytes()
+                for _ in range(num_arg_sets)
+            ]
+        else:
+            args = self.buffer.read_len_prefixed_bytes()
         self.buffer.finish_message()
 
+        if batch and not args:
+            raise errors.BinaryProtocolError(
+                'ExecuteBatch message must contain at least one '
+                'set of arguments')
+
         compiled = None
         if (
             self._last_anon_compiled is not None and
@@ -1024,6 +1306,9 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         #
         # What a pain!
         if query_unit_group.graphql_key_variables:
+            if batch:
+                raise errors.UnsupportedFeatureError(
+                    'batch execution of GraphQL queries is not supported')
             key_vars = _extract_key_vars(query_unit_group, query_req, args)
             query_req = query_req.__copy__()
             query_req.set_key_params(key_vars)
@@ -1084,6 +1369,14 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         if self.debug:
             self.debug_print('EXECUTE', query_req.source.text())
 
+        return compiled, args, query_req
+
+    async def _run_execute(self, compiled, bytes args, query_req):
+        cdef:
+            dbview.DatabaseConnectionView _dbview
+
+        _dbview = self.get_dbview()
+        query_unit_group = compiled.query_unit_group
         force_script = any(x.needs_readback for x in query_unit_group)
         if (
             _dbview.in_tx_error()
@@ -1099,20 +1392,46 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 len(query_unit_group) == 1
                 and bool(query_unit_group[0].sql_hash)
             )
+            if (
+                use_prep
+                and self._pipeline_enabled
+                and execute.can_pipeline(_dbview, compiled)
+                and self._next_message_is_execute()
+            ):
+                await self._execute_pipeline(compiled, args, query_req)
+                return
             await self._execute(compiled, args, use_prep, query_req=query_req)
 
+        self._finish_execute(compiled)
+
+    cdef _finish_execute(self, dbview.CompiledQuery compiled):
         if self._cancelled:
             raise ConnectionAbortedError
 
+        self.write(self._make_execute_complete(compiled))
+        self.flush()
+
+    cdef WriteBuffer _make_execute_complete(
+        self,
+        dbview.CompiledQuery compiled,
+    ):
+        # The messages concluding an Execute: the new state description,
+        # if it changed, and the CommandComplete with the current state.
+        cdef:
+            dbview.DatabaseConnectionView _dbview
+            WriteBuffer buf
+
+        buf = WriteBuffer.new()
+        _dbview = self.get_dbview()
         if _dbview.is_state_desc_changed():
-            self.write(self.make_state_data_description_msg())
-        self.write(
+            buf.write_buffer(self.make_state_data_description_msg())
+        buf.write_buffer(
             self.make_command_complete_msg(
                 compiled.query_unit_group.capabilities,
                 compiled.query_unit_group[-1].status,
             )
         )
-        self.flush()
+        return buf
 
     async def sync(self):
         self.buffer.consume_message()
@@ -1150,6 +1469,9 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             if mtype == b'O':
                 await self.execute()
 
+            elif mtype == b'B':
+                await self.execute_batch()
+
             elif mtype == b'P':
                 await self.parse()
 
@@ -1459,6 +1781,7 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         compiler_pool = server.get_compiler_pool()
 
         dbname = _dbview.dbname
+        parallelism = _dbview._db.lookup_config('dump_parallelism')
         async with self._with_dump_restore_pgcon() as pgcon:
             # To avoid having races, we want to:
             #
@@ -1467,8 +1790,8 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             #   2. in the compiler process we connect to that transaction
             #      and re-introspect the schema in it.
             #
-            #   3. all dump worker pg connection would work on the same
-            #      connection.
+            #   3. all dump worker pg connections would work on the same
+            #      snapshot, exported from this transaction.
             #
             # This guarantees that every pg connection and the compiler work
             # with the same DB state.
@@ -1549,7 +1872,14 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             self.flush()
 
             blocks_queue = collections.deque(blocks)
-            output_queue = asyncio.Queue(maxsize=2)
+            nworkers = max(1, min(parallelism, len(blocks)))
+            output_queue = asyncio.Queue(maxsize=nworkers + 1)
+
+            snapshot_id = None
+            if nworkers > 1:
+                snapshot_id = (
+                    await pgcon.sql_fetch_val(b'SELECT pg_export_snapshot()')
+                ).decode('utf-8')
 
             async with asyncio.TaskGroup() as g:
                 g.create_task(pgcon.dump(
@@ -1557,6 +1887,13 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                     output_queue,
                     DUMP_BLOCK_SIZE,
                 ))
+                for _ in range(nworkers - 1):
+                    g.create_task(self._dump_with_snapshot(
+                        dbname,
+                        snapshot_id,
+                        blocks_queue,
+                        output_queue,
+                    ))
 
                 nstops = 0
                 while True:
@@ -1566,8 +1903,7 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                     out = await output_queue.get()
                     if out is None:
                         nstops += 1
-                        if nstops == 1:
-                            # we only have one worker right now
+                        if nstops == nworkers:
                             break
                     else:
                         block, block_num, data = out
@@ -1602,6 +1938,38 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         self.write(msg_buf.end_message())
         self.flush()
 
+    async def _dump_with_snapshot(
+        self,
+        dbname,
+        snapshot_id,
+        blocks_queue,
+        output_queue,
+    ):
+        # An extra pg connection for a parallel dump, taking blocks off
+        # the same queue as the main one.  The blocks (i.e. the object
+        # types) are independent, their fragments may arrive interleaved.
+        cdef pgcon.PGConnection conn
+
+        conn = await self.tenant.acquire_pgcon(dbname)
+        discard = True
+        try:
+            await conn.sql_execute(
+                b'''START TRANSACTION
+                        ISOLATION LEVEL REPEATABLE READ
+                        READ ONLY;
+                    SET TRANSACTION SNAPSHOT '''
+                + pgcommon.quote_literal(snapshot_id).encode('utf-8')
+                + b''';
+                    SET LOCAL idle_in_transaction_session_timeout = 0;
+                    SET LOCAL statement_timeout = 0;
+                ''',
+            )
+            await conn.dump(blocks_queue, output_queue, DUMP_BLOCK_SIZE)
+            await conn.sql_execute(b"ROLLBACK;")
+            discard = False
+        finally:
+            self.tenant.release_pgcon(dbname, conn, discard=discard)
+
     async def _execute_utility_stmt(self, eql: str, pgcon):
         cdef dbview.DatabaseConnectionView _dbview = self.get_dbview()
 
@@ -1667,7 +2035,9 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         # Parse the "Restore" message
         if self.buffer.read_int16() != 0:  # number of attributes
             raise errors.BinaryProtocolError('unexpected attributes')
-        self.buffer.read_int16()  # discard -j level
+        # The -j level bounds how many data blocks are read ahead of the
+        # backend while it is busy loading the previous ones.
+        jobs = max(1, min(self.buffer.read_int16(), RESTORE_MAX_PARALLELISM))
 
         # Now parse the embedded "DumpHeader" message:
 
@@ -1800,56 +2170,36 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 # Send "RestoreReady" message
                 msg = WriteBuffer.new_message(b'+')
                 msg.write_int16(0)  # no annotations
-                msg.write_int16(1)  # -j1
+                msg.write_int16(jobs)
                 self.write(msg.end_message())
                 self.flush()
 
-                while True:
-                    if not self.buffer.take_message():
-                        # Don't report idling when restoring a dump.
-                        # This is an edge case and the client might be
-                        # legitimately slow.
-                        await self.wait_for_message(report_idling=False)
-                    mtype = self.buffer.get_message_type()
-
-                    if mtype == b'=':  # RestoreBlock
-                        block_type = None
-                        block_id = None
-                        block_num = None
-                        block_data = None
-
-                        num_headers = self.buffer.read_int16()
-                        for _ in range(num_headers):
-                            header = self.buffer.read_int16()
-                            if header == DUMP_HEADER_BLOCK_TYPE:
-                                block_type = self.buffer.read_len_prefixed_bytes()
-                            elif header == DUMP_HEADER_BLOCK_ID:
-                                block_id = self.buffer.read_len_prefixed_bytes()
-                                block_id = pg_UUID(block_id)
-                            elif header == DUMP_HEADER_BLOCK_NUM:
-                                block_num = self.buffer.read_len_prefixed_bytes()
-                            elif header == DUMP_HEADER_BLOCK_DATA:
-                                block_data = self.buffer.read_len_prefixed_bytes()
-
-                        self.buffer.finish_message()
-
-                        if (block_type is None or block_id is None
-                                or block_num is None or block_data is None):
-                            raise errors.ProtocolError('incomplete data block')
-
-                        restore_block = restore_blocks[block_id]
-                        type_id_map = self._build_type_id_map_for_restore_mending(
-                            restore_block)
-                        self._transport.pause_reading()
-                        await pgcon.restore(restore_block, block_data, type_id_map)
-                        self._transport.resume_reading()
-
-                    elif mtype == b'.':  # RestoreEof
-                        self.buffer.finish_message()
-                        break
-
-                    else:
-                        self.fallthrough()
+                # Blocks are loaded in the order they are received by a
+                # separate task, so reading the next blocks from the client
+                # overlaps with COPY of the current one.  Up to -j blocks
+                # (and RESTORE_MAX_READAHEAD_BYTES) are read ahead.  All
+                # of the data must be loaded within the restore transaction,
+                # so there is still only one backend connection doing the
+                # work.
+                restore_queue = _RestoreQueue(
+                    jobs, RESTORE_MAX_READAHEAD_BYTES)
+                restore_stats = {}
+                loader = asyncio.create_task(self._load_restore_blocks(
+                    pgcon, restore_queue, restore_stats))
+                try:
+                    await self._restore_data(restore_blocks, restore_queue, loader)
+                finally:
+                    if not loader.done():
+                        # Let the loader finish the block it is working on
+                        # instead of cancelling it midway through COPY, so
+                        # that the connection can still be rolled back.
+                        while not restore_queue.empty():
+                            restore_queue.get_nowait()
+                        restore_queue.put_nowait(None)
+                        with contextlib.suppress(Exception):
+                            await loader
+
+                self._log_restore_stats(dbname, restore_stats)
 
                 for repopulate_unit in repopulate_units:
                     await pgcon.sql_execute(repopulate_unit.encode())
@@ -1881,6 +2231,120 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         self.write(msg.end_message())
         self.flush()
 
+    async def _restore_data(self, restore_blocks, restore_queue, loader):
+        while True:
+            if not self.buffer.take_message():
+                # Don't report idling when restoring a dump.
+                # This is an edge case and the client might be
+                # legitimately slow.
+                await self.wait_for_message(report_idling=False)
+            mtype = self.buffer.get_message_type()
+
+            if mtype == b'=':  # RestoreBlock
+                block_type = None
+                block_id = None
+                block_num = None
+                block_data = None
+
+                num_headers = self.buffer.read_int16()
+                for _ in range(num_headers):
+                    header = self.buffer.read_int16()
+                    if header == DUMP_HEADER_BLOCK_TYPE:
+                        block_type = self.buffer.read_len_prefixed_bytes()
+                    elif header == DUMP_HEADER_BLOCK_ID:
+                        block_id = self.buffer.read_len_prefixed_bytes()
+                        block_id = pg_UUID(block_id)
+                    elif header == DUMP_HEADER_BLOCK_NUM:
+                        block_num = self.buffer.read_len_prefixed_bytes()
+                    elif header == DUMP_HEADER_BLOCK_DATA:
+                        block_data = self.buffer.read_len_prefixed_bytes()
+
+                self.buffer.finish_message()
+
+                if (block_type is None or block_id is None
+                        or block_num is None or block_data is None):
+                    raise errors.ProtocolError('incomplete data block')
+
+                restore_block = restore_blocks[block_id]
+                type_id_map = self._build_type_id_map_for_restore_mending(
+                    restore_block)
+                await self._put_restore_block(
+                    restore_queue,
+                    loader,
+                    (restore_block, block_data, type_id_map),
+                )
+
+            elif mtype == b'.':  # RestoreEof
+                self.buffer.finish_message()
+                break
+
+            else:
+                self.fallthrough()
+
+        await self._put_restore_block(restore_queue, loader, None)
+        await loader
+
+    async def _put_restore_block(self, restore_queue, loader, item):
+        if loader.done():
+            # The loader has failed, propagate its error
+            loader.result()
+
+        if not restore_queue.full():
+            restore_queue.put_nowait(item)
+            return
+
+        # Apply backpressure to the client until the loader catches up.
+        self._transport.pause_reading()
+        put = asyncio.ensure_future(restore_queue.put(item))
+        try:
+            await asyncio.wait(
+                (put, loader), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not put.done():
+                put.cancel()
+            self._transport.resume_reading()
+
+        if not put.done() or put.cancelled():
+            loader.result()
+
+    async def _load_restore_blocks(self, pgcon, restore_queue, stats):
+        while True:
+            item = await restore_queue.get()
+            if item is None:
+                return
+
+            restore_block, block_data, type_id_map = item
+            started_at = time.monotonic()
+            await pgcon.restore(restore_block, block_data, type_id_map)
+            elapsed = time.monotonic() - started_at
+
+            type_stats = stats.get(restore_block.schema_object_id)
+            if type_stats is None:
+                type_stats = stats[restore_block.schema_object_id] = [0, 0, 0]
+            type_stats[0] += 1
+            type_stats[1] += len(block_data)
+            type_stats[2] += elapsed
+
+    def _log_restore_stats(self, dbname, stats):
+        total_bytes = 0
+        total_time = 0
+        for type_id, (nblocks, nbytes, elapsed) in stats.items():
+            total_bytes += nbytes
+            total_time += elapsed
+            logger.debug(
+                'restore of %r: loaded %d block(s) of %s: '
+                '%.1f MiB in %.3fs (%.1f MiB/s)',
+                dbname, nblocks, type_id,
+                nbytes / 1048576, elapsed,
+                nbytes / 1048576 / elapsed if elapsed else 0,
+            )
+        logger.info(
+            'restore of %r: loaded %.1f MiB of data for %d type(s) '
+            'in %.3fs (%.1f MiB/s)',
+            dbname, total_bytes / 1048576, len(stats), total_time,
+            total_bytes / 1048576 / total_time if total_time else 0,
+        )
+
     def _build_type_id_map_for_restore_mending(self, restore_block):
         type_map = {}
         descriptor_stack = []
@@ -18,6 +18,12 @@
 
 
 DEF DUMP_BLOCK_SIZE = 1024 * 1024 * 10
+# Upper bound of the restore -j level, i.e. of data blocks buffered
+# ahead of the backend COPY.
+DEF RESTORE_MAX_PARALLELISM = 16
+# Upper bound of the total size of the data blocks buffered ahead of the
+# backend COPY, whatever the -j level.
+DEF RESTORE_MAX_READAHEAD_BYTES = 1024 * 1024 * 64
 
 DEF DUMP_HEADER_BLOCK_TYPE = 101
 DEF DUMP_HEADER_BLOCK_TYPE_INFO = b'I'
@@ -31,3 +37,7 @@ DEF DUMP_HEADER_SERVER_CATALOG_VERSION = 105
 DEF DUMP_HEADER_BLOCK_ID = 110
 DEF DUMP_HEADER_BLOCK_NUM = 111
 DEF DUMP_HEADER_BLOCK_DATA = 112
+
+# Max number of queries sent to the backend ahead of their results
+# in the pipeline mode.
+DEF PIPELINE_MAX_DEPTH = 64
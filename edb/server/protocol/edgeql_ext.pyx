@@ -115,7 +115,20 @@ async def handle_request(
         if not query:
             raise TypeError('invalid EdgeQL request: query is missing')
 
-        if variables is not None and not isinstance(variables, dict):
+        batch_variables = None
+        if isinstance(variables, list):
+            # A list of variable sets executes the query once for each
+            # of them in a single batch.
+            if not all(isinstance(v, dict) for v in variables):
+                raise TypeError(
+                    '"variables" must be a JSON object or '
+                    'an array of JSON objects')
+            if not variables:
+                raise TypeError(
+                    '"variables" must not be an empty array')
+            batch_variables = variables
+            variables = None
+        elif variables is not None and not isinstance(variables, dict):
             raise TypeError('"variables" must be a JSON object')
 
         if globals_ is not None and not isinstance(globals_, dict):
@@ -141,6 +154,7 @@ async def handle_request(
             query,
             role_name=role_name,
             variables=variables or {},
+            batch_variables=batch_variables,
             globals_=globals_,
             session_config=config,
         )
@@ -20,6 +20,7 @@ from typing import (
     Any,
     Mapping,
     Optional,
+    Sequence,
 )
 
 from edgedb import scram
@@ -30,6 +31,7 @@ import decimal
 import hashlib
 import json
 import logging
+import time
 
 import immutables
 
@@ -254,6 +256,44 @@ async def _parse(
     return query_req, compiled
 
 
+cdef class ResultRecorder(frontend.AbstractFrontendConnection):
+    # Passes the results of a query on to the client, keeping a copy of
+    # them for the result cache as long as they are small enough.
+
+    cdef:
+        frontend.AbstractFrontendConnection fe_conn
+        list chunks
+        ssize_t nbytes
+        ssize_t max_nbytes
+
+    def __init__(
+        self,
+        frontend.AbstractFrontendConnection fe_conn,
+        ssize_t max_nbytes,
+    ):
+        self.fe_conn = fe_conn
+        self.chunks = []
+        self.nbytes = 0
+        self.max_nbytes = max_nbytes
+
+    cdef write(self, WriteBuffer buf):
+        if self.chunks is not None:
+            self.nbytes += buf.len()
+            if self.nbytes > self.max_nbytes:
+                self.chunks = None
+            else:
+                self.chunks.append(bytes(buf))
+        self.fe_conn.write(buf)
+
+    cdef flush(self):
+        self.fe_conn.flush()
+
+    cdef get_data(self):
+        if self.chunks is None:
+            return None
+        return b''.join(self.chunks)
+
+
 # TODO: can we merge execute and execute_script?
 async def execute(
     be_conn: pgcon.PGConnection,
@@ -265,11 +305,13 @@ async def execute(
     use_prep_stmt: bint = False,
     tx_isolation: edbdef.TxIsolationLevel | None = None,
     query_req: Optional[rpc.CompilationRequest] = None,
+    result_cache_key: Optional[tuple] = None,
 ):
     cdef:
         bytes state = None, orig_state = None
         WriteBuffer bound_args_buf
         bint needs_commit_state = False
+        ResultRecorder recorder = None
 
     query_unit = compiled.query_unit_group[0]
 
@@ -288,6 +330,11 @@ async def execute(
             # the current status in be_conn is in sync with dbview, skip the
             # state restoring
             state = None
+        elif be_conn.is_hot_standby:
+            # A hot standby cannot hold the session state; the queries that
+            # read it fail there and are run on the primary instead (see
+            # EdgeConnection._execute_on_replica()).
+            state = None
         dbv.start(query_unit)
         if query_unit.create_db_template:
             await tenant.on_before_create_db_from_template(
@@ -353,9 +400,18 @@ async def execute(
                     read_data = (
                         query_unit.needs_readback or query_unit.is_explain)
 
+                    out_conn = fe_conn if not read_data else None
+                    if result_cache_key is not None and out_conn is not None:
+                        result_cache = dbv._db.result_cache
+                        recorder = ResultRecorder(
+                            out_conn, result_cache.max_entry_size)
+                        out_conn = recorder
+                        result_cache_gen = result_cache.generation
+                        started_at = time.monotonic()
+
                     data = await be_conn.parse_execute(
                         query=query_unit,
-                        fe_conn=fe_conn if not read_data else None,
+                        fe_conn=out_conn,
                         bind_data=bound_args_buf,
                         param_data_types=data_types,
                         use_prep_stmt=use_prep_stmt,
@@ -437,6 +493,7 @@ async def execute(
                     dbv._last_comp_state,
                 )
                 query_unit.user_schema = new_user_schema
+                query_unit.user_schema_delta = None
 
     except Exception as ex:
         if isinstance(ex, pgerror.BackendError):
@@ -492,6 +549,19 @@ async def execute(
         if compiled.recompiled_cache:
             for req, qu_group in compiled.recompiled_cache:
                 dbv.cache_compiled_query(req, qu_group)
+        if (
+            recorder is not None
+            and (result := recorder.get_data()) is not None
+        ):
+            _, key_args, key_state = result_cache_key
+            result_cache.store(
+                result_cache_key,
+                result,
+                key_size=len(key_args) + len(key_state or b''),
+                tables=query_unit.read_tables,
+                cost=time.monotonic() - started_at,
+                generation=result_cache_gen,
+            )
     finally:
         if query_unit.drop_db:
             tenant.allow_database_connections(query_unit.drop_db)
@@ -499,6 +569,320 @@ async def execute(
     return data
 
 
+def can_pipeline(
+    dbv: dbview.DatabaseConnectionView,
+    compiled: dbview.CompiledQuery,
+):
+    """Whether *compiled* can be sent ahead of the results of other queries.
+
+    Only standalone read-only queries that don't touch any state of the
+    session or of the backend connection qualify: if a query before it in
+    the pipeline fails, it has been executed for nothing, but its results
+    can simply be discarded.
+    """
+    if dbv.in_tx() or len(compiled.query_unit_group) != 1:
+        return False
+    if compiled.recompiled_cache:
+        return False
+
+    query_unit = compiled.query_unit_group[0]
+    return bool(query_unit.sql_hash and _is_read_only(query_unit))
+
+
+def get_replica_max_staleness(
+    dbv: dbview.DatabaseConnectionView,
+    compiled: dbview.CompiledQuery,
+) -> float:
+    """How far behind the primary a replica running *compiled* may be.
+
+    Returns 0 if the query must run on the primary: only standalone
+    read-only queries outside of transactions can run on a replica, and
+    only if the session allows it with the replica_max_staleness setting.
+    """
+    if dbv.in_tx() or len(compiled.query_unit_group) != 1:
+        return 0
+    if not _is_read_only(compiled.query_unit_group[0]):
+        return 0
+
+    max_staleness = dbv.config_lookup('replica_max_staleness')
+    if max_staleness is None:
+        return 0
+    return max_staleness.to_microseconds() / 1e6
+
+
+def get_result_cache_key(
+    dbv: dbview.DatabaseConnectionView,
+    compiled: dbview.CompiledQuery,
+    bytes bind_args,
+):
+    """The key of the results of *compiled* in the result cache.
+
+    Returns None if the results must not be cached: only standalone
+    read-only queries outside of transactions, whose results depend
+    on nothing but the tables they read, qualify.
+    """
+    if dbv._db.result_cache is None:
+        return None
+    if dbv.in_tx() or len(compiled.query_unit_group) != 1:
+        return None
+
+    query_unit = compiled.query_unit_group[0]
+    if (
+        query_unit.read_tables is None
+        or not query_unit.sql_hash
+        or not _is_read_only(query_unit)
+    ):
+        return None
+
+    # The globals and permissions of the session are passed to the
+    # query as arguments, and the rest of the state is the config.
+    bound_args = args_ser.recode_bind_args(
+        dbv, compiled, bind_args, None, None, [])
+    return (query_unit.sql_hash, bytes(bound_args), dbv.serialize_state())
+
+
+def send_cached_result(
+    dbv: dbview.DatabaseConnectionView,
+    result_cache_key: tuple,
+    fe_conn: frontend.AbstractFrontendConnection,
+):
+    """Send the cached results of a query, if any, to *fe_conn*."""
+    cdef WriteBuffer buf
+
+    data = dbv._db.result_cache.get(result_cache_key)
+    metrics.query_result_cache_lookups.inc(
+        1.0,
+        dbv.tenant.get_instance_name(),
+        'cache' if data is not None else 'backend',
+    )
+    if data is None:
+        return False
+
+    buf = WriteBuffer.new()
+    buf.write_bytes(data)
+    fe_conn.write(buf)
+    return True
+
+
+def can_run_on_hot_standby(dbview.DatabaseConnectionView dbv) -> bool:
+    """Whether the session state allows running queries on a hot standby.
+
+    Connections to a hot standby hold no session state (see execute()).
+    The queries reading session settings fail there and are run on the
+    primary, but the settings applied as Postgres settings would be
+    silently ignored, so they rule hot standbys out.
+    """
+    settings = dbv.get_config_spec()
+    for sval in dbv.get_session_config().values():
+        if settings[sval.name].backend_setting:
+            return False
+    return True
+
+
+cdef bint _is_read_only(query_unit):
+    # Whether the query unit doesn't touch any state of the session,
+    # the database or the backend connection.
+    return bool(
+        query_unit.sql
+        and not query_unit.capabilities
+        and query_unit.is_transactional
+        and query_unit.tx_id is None
+        and not query_unit.tx_commit
+        and not query_unit.tx_rollback
+        and not query_unit.append_tx_op
+        and not query_unit.run_and_rollback
+        and not query_unit.user_schema
+        and not query_unit.global_schema
+        and not query_unit.system_config
+        and not query_unit.database_config
+        and not query_unit.config_ops
+        and not query_unit.needs_readback
+        and not query_unit.is_explain
+        and not query_unit.early_non_tx_sql
+        and not query_unit.db_op_trailer
+        and not query_unit.server_param_conversions
+        and not query_unit.create_db
+        and not query_unit.drop_db
+        and query_unit.modaliases is None
+    )
+
+
+def send_pipelined(
+    be_conn: pgcon.PGConnection,
+    dbv: dbview.DatabaseConnectionView,
+    compiled: dbview.CompiledQuery,
+    bind_args: bytes,
+):
+    """Send a query accepted by can_pipeline() without awaiting results.
+
+    The session state must already be synced with the backend connection.
+    """
+    data_types = []
+    bound_args_buf = args_ser.recode_bind_args(
+        dbv, compiled, bind_args, None, None, data_types)
+    return be_conn.send_pipelined_query(
+        compiled.query_unit_group[0],
+        bound_args_buf,
+        data_types,
+        dbv.dbver,
+        compiled.use_pending_func_cache,
+        compiled.make_query_prefix() or b'',
+    )
+
+
+async def read_pipelined(
+    be_conn: pgcon.PGConnection,
+    dbv: dbview.DatabaseConnectionView,
+    compiled: dbview.CompiledQuery,
+    parsed_stmt_name: Optional[bytes],
+    *,
+    fe_conn: frontend.AbstractFrontendConnection,
+    query_req: Optional[rpc.CompilationRequest] = None,
+):
+    query_unit = compiled.query_unit_group[0]
+    try:
+        await be_conn.read_pipelined_query(
+            query_unit, fe_conn, parsed_stmt_name)
+    except Exception as ex:
+        # See execute() for the rationale
+        if (
+            query_req
+            and isinstance(ex, pgerror.BackendError)
+            and ex.code_is(pgerror.ERROR_UNDEFINED_FUNCTION)
+        ):
+            dbv._db.invalidate_cache_entry_object(query_req)
+
+        if query_unit.source_map:
+            ex._from_sql = True
+
+        dbv.on_error()
+        raise
+
+
+def check_batchable(compiled: dbview.CompiledQuery):
+    """Raise if *compiled* cannot be executed for many sets of arguments.
+
+    Only a single query that reads or modifies data can be batched;
+    anything that needs to look at its results on the server, changes
+    the schema, the configuration or the transaction state, is rejected.
+    """
+    if len(compiled.query_unit_group) != 1:
+        raise errors.UnsupportedFeatureError(
+            'batch execution of multiple statements is not supported')
+
+    query_unit = compiled.query_unit_group[0]
+    if (
+        not query_unit.sql
+        or query_unit.capabilities & ~compiler.Capability.MODIFICATIONS
+        or query_unit.tx_id is not None
+        or query_unit.append_tx_op
+        or query_unit.run_and_rollback
+        or query_unit.user_schema
+        or query_unit.global_schema
+        or query_unit.system_config
+        or query_unit.database_config
+        or query_unit.config_ops
+        or query_unit.needs_readback
+        or query_unit.is_explain
+        or query_unit.early_non_tx_sql
+        or query_unit.db_op_trailer
+        or query_unit.server_param_conversions
+    ):
+        raise errors.UnsupportedFeatureError(
+            'this query cannot be executed in a batch')
+
+
+async def execute_batch(
+    be_conn: pgcon.PGConnection,
+    dbv: dbview.DatabaseConnectionView,
+    compiled: dbview.CompiledQuery,
+    list bind_args,
+    *,
+    fe_conn: frontend.AbstractFrontendConnection = None,
+    query_req: Optional[rpc.CompilationRequest] = None,
+):
+    """Execute a single query once for every set of arguments.
+
+    The query is parsed once and all executions are sent to the backend
+    in one go, followed by a single SYNC: either all of them succeed, or
+    the first error aborts the whole batch.
+    """
+    cdef:
+        bytes state = None, orig_state = None
+        bint needs_commit_state = False
+        list bind_datas = []
+        list data_types = None
+
+    check_batchable(compiled)
+    query_unit = compiled.query_unit_group[0]
+
+    if not bind_args:
+        # The front ends reject empty batches; don't touch the backend
+        # (or its recorded session state) if one slips through anyway.
+        return None
+
+    for args in bind_args:
+        types = []
+        bind_datas.append(args_ser.recode_bind_args(
+            dbv, compiled, args, None, None, types))
+        if data_types is None:
+            data_types = types
+
+    if not dbv.in_tx():
+        orig_state = state = dbv.serialize_state()
+        needs_commit_state = dbv.needs_commit_after_state_sync()
+
+    try:
+        if be_conn.last_state == state:
+            state = None
+        dbv.start(query_unit)
+        data = await be_conn.parse_execute_batch(
+            query=query_unit,
+            bind_datas=bind_datas,
+            param_data_types=data_types,
+            fe_conn=fe_conn,
+            state=state,
+            needs_commit_state=needs_commit_state,
+            dbver=dbv.dbver,
+            use_pending_func_cache=compiled.use_pending_func_cache,
+            query_prefix=compiled.make_query_prefix(),
+        )
+        if state is not None:
+            orig_state = None
+    except Exception as ex:
+        # See execute() for the rationale
+        if (
+            query_req
+            and isinstance(ex, pgerror.BackendError)
+            and ex.code_is(pgerror.ERROR_UNDEFINED_FUNCTION)
+        ):
+            dbv._db.invalidate_cache_entry_object(query_req)
+
+        if query_unit.source_map:
+            ex._from_sql = True
+
+        dbv.on_error()
+        raise
+    else:
+        side_effects = dbv.on_success(query_unit, None)
+        state_serializer = compiled.query_unit_group.state_serializer
+        if state_serializer is not None:
+            dbv.set_state_serializer(state_serializer)
+        if side_effects:
+            await process_side_effects(dbv, side_effects, be_conn)
+        if not dbv.in_tx():
+            state = dbv.serialize_state()
+            if state is not orig_state:
+                be_conn.last_state = state
+                be_conn.state_reset_needs_commit = (
+                    dbv.needs_commit_after_state_sync())
+        if compiled.recompiled_cache:
+            for req, qu_group in compiled.recompiled_cache:
+                dbv.cache_compiled_query(req, qu_group)
+
+    return data
+
+
 async def _convert_parameters(
     dbv: dbview.DatabaseConnectionView,
     compiled: dbview.CompiledQuery,
@@ -1013,6 +1397,7 @@ async def parse_execute_json(
     query: str,
     *,
     variables: Mapping[str, Any] = immutables.Map(),
+    batch_variables: Optional[Sequence[Mapping[str, Any]]] = None,
     globals_: Optional[Mapping[str, Any]] = None,
     session_config: Optional[Mapping[str, Any]] = None,
     output_format: compiler.OutputFormat = compiler.OutputFormat.JSON,
@@ -1057,6 +1442,7 @@ async def parse_execute_json(
                 dbv,
                 compiled,
                 variables=variables,
+                batch_variables=batch_variables,
                 globals_=globals_,
                 tx_isolation=tx_isolation,
                 query_req=query_req,
@@ -1076,6 +1462,7 @@ async def execute_json(
     use_prep_stmt: bint = False,
     tx_isolation: edbdef.TxIsolationLevel | None = None,
     query_req: Optional[rpc.CompilationRequest] = None,
+    batch_variables: Optional[Sequence[Mapping[str, Any]]] = None,
 ) -> bytes:
     if globals_ is None:
         globals_ = {}
@@ -1114,13 +1501,31 @@ async def execute_json(
 
     qug = compiled.query_unit_group
 
-    args = []
-    if qug.in_type_args:
-        for param in qug.in_type_args:
-            value = variables.get(param.name)
-            args.append(value)
+    if batch_variables is not None:
+        # Execute the query once for every set of variables, the
+        # result is a JSON array of the results of every execution.
+        if tx_isolation is not None:
+            raise errors.InternalServerError(
+                "execute_batch does not support "
+                "modified transaction isolation"
+            )
+        data = await execute_batch(
+            be_conn,
+            dbv,
+            compiled,
+            [_encode_json_args(qug, v) for v in batch_variables],
+            fe_conn=fe_conn,
+            query_req=query_req,
+        )
+        if fe_conn is None:
+            if data and any(len(row) != 1 for row in data):
+                raise errors.InternalServerError(
+                    f'received incorrect response data for a JSON query')
+            return b'[' + b','.join(row[0] for row in data or ()) + b']'
+        else:
+            return None
 
-    bind_args = _encode_args(args)
+    bind_args = _encode_json_args(qug, variables)
 
     force_script = any(x.needs_readback for x in qug)
     if len(qug) > 1 or force_script:
@@ -1194,6 +1599,16 @@ cdef bytes _encode_json_value(object val):
     return b'\x01' + jarg.encode('utf-8')
 
 
+cdef bytes _encode_json_args(object qug, object variables):
+    args = []
+    if qug.in_type_args:
+        for param in qug.in_type_args:
+            value = variables.get(param.name)
+            args.append(value)
+
+    return _encode_args(args)
+
+
 cdef bytes _encode_args(list args):
     cdef:
         WriteBuffer out_buf = WriteBuffer.new()
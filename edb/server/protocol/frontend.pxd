@@ -45,6 +45,7 @@ cdef class FrontendConnection(AbstractFrontendConnection):
 
         object _transport
         WriteBuffer _write_buf
+        WriteBuffer _deferred_writes
         object _write_waiter
         object connection_made_at
         int _query_count
@@ -52,7 +53,7 @@ cdef class FrontendConnection(AbstractFrontendConnection):
         ReadBuffer buffer
         object _msg_take_waiter
 
-        object started_idling_at
+        readonly object started_idling_at
         bint idling
 
         bint _passive_mode
@@ -69,12 +70,15 @@ cdef class FrontendConnection(AbstractFrontendConnection):
         bint _external_auth
 
     cdef _after_idling(self)
+    cdef start_deferring_writes(self)
+    cdef WriteBuffer stop_deferring_writes(self)
     cdef _main_task_created(self)
     cdef _main_task_stopped_normally(self)
     cdef write_error(self, exc)
     cdef stop_connection(self)
     cdef abort_pinned_pgcon(self)
     cdef is_in_tx(self)
+    cdef _get_backend_state(self)
 
     cdef WriteBuffer _make_authentication_sasl_initial(self, list methods)
     cdef _expect_sasl_initial_response(self)
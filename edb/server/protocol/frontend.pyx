@@ -73,6 +73,7 @@ cdef class FrontendConnection(AbstractFrontendConnection):
         self._query_count = 0
         self._transport = None
         self._write_buf = None
+        self._deferred_writes = None
         self._write_waiter = None
 
         self.buffer = ReadBuffer()
@@ -103,6 +104,11 @@ cdef class FrontendConnection(AbstractFrontendConnection):
     cdef is_in_tx(self):
         return False
 
+    cdef _get_backend_state(self):
+        # The serialized session state that backend connections should
+        # preferably have (see PGConnection.last_state), None if any.
+        return None
+
     # backend connection
 
     def __del__(self):
@@ -113,7 +119,9 @@ cdef class FrontendConnection(AbstractFrontendConnection):
             # fail all tests if this ever happens.
             self.abort_pinned_pgcon()
 
-    async def get_pgcon(self) -> pgcon.PGConnection:
+    async def get_pgcon(self, *, stmt_name=None) -> pgcon.PGConnection:
+        # `stmt_name` is the prepared statement that is going to be run,
+        # if known, see Tenant.acquire_pgcon().
         if self._cancelled or self._pgcon_released_in_connection_lost:
             raise RuntimeError(
                 'cannot acquire a pgconn; the connection is closed')
@@ -130,7 +138,11 @@ cdef class FrontendConnection(AbstractFrontendConnection):
                 return self._pinned_pgcon
             if self._pinned_pgcon is not None:
                 raise RuntimeError('there is already a pinned pgcon')
-            conn = await self.tenant.acquire_pgcon(self.dbname)
+            conn = await self.tenant.acquire_pgcon(
+                self.dbname,
+                state=self._get_backend_state(),
+                stmt_name=stmt_name,
+            )
             self._pinned_pgcon = conn
             conn.pinned_by = self
             return conn
@@ -160,8 +172,9 @@ cdef class FrontendConnection(AbstractFrontendConnection):
                         conn,
                         discard=debug.flags.server_clobber_pg_conns,
                     )
-            else:
+            elif not self._pinned_pgcon_in_tx:
                 self._pinned_pgcon_in_tx = True
+                self.tenant.pin_pgcon(self.dbname, conn)
         else:
             conn.pinned_by = None
             self._pinned_pgcon_in_tx = False
@@ -174,8 +187,8 @@ cdef class FrontendConnection(AbstractFrontendConnection):
                 )
 
     @contextlib.asynccontextmanager
-    async def with_pgcon(self):
-        con = await self.get_pgcon()
+    async def with_pgcon(self, *, stmt_name=None):
+        con = await self.get_pgcon(stmt_name=stmt_name)
         try:
             yield con
         finally:
@@ -205,13 +218,26 @@ cdef class FrontendConnection(AbstractFrontendConnection):
 
     cdef write(self, WriteBuffer buf):
         # One rule for this method: don't write partial messages.
-        if self._write_buf is not None:
+        if self._deferred_writes is not None:
+            self._deferred_writes.write_buffer(buf)
+        elif self._write_buf is not None:
             self._write_buf.write_buffer(buf)
             if self._write_buf.len() >= FLUSH_BUFFER_AFTER:
                 self.flush()
         else:
             self._write_buf = buf
 
+    cdef start_deferring_writes(self):
+        # Collect the messages written from now on aside instead of
+        # sending them, e.g. because they must follow the results
+        # of a query that is still running.
+        self._deferred_writes = WriteBuffer.new()
+
+    cdef WriteBuffer stop_deferring_writes(self):
+        buf = self._deferred_writes
+        self._deferred_writes = None
+        return buf
+
     cdef flush(self):
         if self._transport is None:
             # could be if the connection is lost and a coroutine
@@ -274,6 +300,18 @@ cdef class FrontendConnection(AbstractFrontendConnection):
         # client for too long (even if it is in an open transaction!)
         return self.idling and self.started_idling_at < expiry_time
 
+    def close_for_idle_transaction(self):
+        # The backend connection pinned by our transaction is needed by
+        # other clients, see Tenant._abort_idle_transaction().
+        try:
+            self.write_error(
+                errors.IdleTransactionTimeoutError(
+                    'terminating the transaction idling while other clients '
+                    'are waiting for a backend connection')
+            )
+        finally:
+            self.close()  # will flush
+
     # establishing a new connection
 
     cdef _main_task_created(self):
@@ -73,6 +73,7 @@ cdef class PgConnection(frontend.FrontendConnection):
         dict sql_prepared_stmts_map
         dict wrapping_prepared_stmts
         bint ignore_till_sync
+        bint _wrote_data
 
         object sslctx
         object endpoint_security
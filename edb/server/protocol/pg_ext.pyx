@@ -433,6 +433,7 @@ cdef class PgConnection(frontend.FrontendConnection):
         # on *other* prepared statements.
         self.wrapping_prepared_stmts = {}
         self.ignore_till_sync = False
+        self._wrote_data = False
 
         self.sslctx = sslctx
         self.endpoint_security = endpoint_security
@@ -453,6 +454,9 @@ cdef class PgConnection(frontend.FrontendConnection):
     cdef is_in_tx(self):
         return self._dbview.in_tx()
 
+    cdef _get_backend_state(self):
+        return self._dbview.serialize_state()
+
     cdef write_error(self, exc):
         cdef WriteBuffer buf
 
@@ -847,6 +851,9 @@ cdef class PgConnection(frontend.FrontendConnection):
         cdef:
             PreparedStmt stmt
 
+        if query_unit.capabilities & enums.Capability.MODIFICATIONS:
+            self._wrote_data = True
+
         if query_unit.deallocate is not None:
             stmt_name = query_unit.deallocate.stmt_name
             self.sql_prepared_stmts.pop(stmt_name, None)
@@ -875,6 +882,13 @@ cdef class PgConnection(frontend.FrontendConnection):
                 if stmt is not None:
                     stmt.parse_action.invalidate()
 
+    def on_sync(self):
+        if self._wrote_data and not self._dbview.in_tx():
+            # The tables written to by SQL are not tracked, so drop all
+            # the cached results once the writes are committed.
+            self._wrote_data = False
+            self.database.on_tables_written(None)
+
     async def main_step(self, char mtype):
         try:
             await self._main_step(mtype)
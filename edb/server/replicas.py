@@ -0,0 +1,207 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Read replicas of the backend cluster.
+
+Read-only queries outside of transactions may be sent to a replica
+instead of the primary, as long as the replica is not lagging behind
+more than the session allows (see the ``replica_max_staleness``
+setting).  Every replica has a connection pool of its own, and its
+replication lag is periodically measured on a dedicated connection.
+"""
+
+from __future__ import annotations
+from typing import Awaitable, Callable, Optional, TYPE_CHECKING
+
+import asyncio
+import logging
+import os
+import urllib.parse
+
+from edb.server import connpool
+from edb.server import defines
+from edb.server import metrics
+
+if TYPE_CHECKING:
+    from edb.server import pgcon
+
+
+logger = logging.getLogger('edb.server')
+
+# How often the replication lag of every replica is measured, in seconds.
+LAG_CHECK_INTERVAL = float(
+    os.getenv("GEL_SERVER_REPLICA_LAG_CHECK_INTERVAL", 1.0))
+
+# A standby that has replayed everything it received is considered to be
+# up to date, otherwise the lag is the age of the last replayed
+# transaction.  That only holds while the standby is streaming from the
+# primary: once its WAL receiver is disconnected, it has no way to know
+# how far behind it is, and NULL is returned.  (Reading the status of
+# the WAL receiver requires the pg_read_all_stats role.)  A server that
+# is not in recovery may be a logical replica, in which case the age of
+# the last message from the publisher is used.  Any other server is not
+# known to follow the primary at all, and NULL is returned.
+LAG_QUERY = b'''
+    SELECT (CASE
+        WHEN NOT pg_is_in_recovery() THEN (
+            SELECT max(extract(epoch FROM now() - last_msg_receipt_time))
+            FROM pg_stat_subscription
+        )
+        WHEN NOT EXISTS (
+            SELECT FROM pg_stat_wal_receiver WHERE status = 'streaming'
+        ) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END)::text
+'''
+
+
+class Replica:
+
+    name: str
+    # Replication lag in seconds as of the last check, None if the
+    # replica is not available.
+    lag: Optional[float]
+    # Whether the replica is a (read-only) physical hot standby.
+    is_hot_standby: bool
+
+    _connect: Callable[[str, str], Awaitable[pgcon.PGConnection]]
+    _pool: connpool.Pool
+    _instance_name: str
+
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        connect: Callable[[str, str], Awaitable[pgcon.PGConnection]],
+        max_capacity: int,
+        instance_name: str,
+    ) -> None:
+        # Don't leak the credentials into logs and metrics labels.
+        parsed = urllib.parse.urlparse(dsn)
+        self.name = parsed.netloc.rpartition('@')[2]
+        if not self.name:
+            # e.g. postgres:///?host=/var/run/postgresql
+            self.name = urllib.parse.parse_qs(parsed.query).get(
+                'host', ['localhost'])[0]
+        self.lag = None
+        self.is_hot_standby = False
+        self._connect = connect
+        self._instance_name = instance_name
+        self._pool = connpool.Pool(
+            connect=self._pool_connect,
+            disconnect=self._pool_disconnect,
+            max_capacity=max_capacity,
+        )
+
+    async def _pool_connect(self, dbname: str) -> pgcon.PGConnection:
+        return await self._connect(dbname, "replica pool connection")
+
+    async def _pool_disconnect(self, conn: pgcon.PGConnection) -> None:
+        conn.terminate()
+
+    @property
+    def active_conns(self) -> int:
+        return self._pool.active_conns
+
+    def is_usable(
+        self,
+        max_staleness: float,
+        *,
+        allow_hot_standby: bool = True,
+    ) -> bool:
+        return (
+            self.lag is not None
+            and self.lag <= max_staleness
+            and (allow_hot_standby or not self.is_hot_standby)
+        )
+
+    def mark_unavailable(self) -> None:
+        self._set_lag(None)
+
+    def _set_lag(self, lag: Optional[float]) -> None:
+        if lag is None:
+            if self.lag is not None:
+                logger.warning("read replica %s is unavailable", self.name)
+            metrics.backend_replica_available.set(
+                0.0, self._instance_name, self.name)
+        else:
+            if self.lag is None:
+                logger.info("read replica %s is available", self.name)
+            metrics.backend_replica_available.set(
+                1.0, self._instance_name, self.name)
+            metrics.backend_replica_lag.set(
+                lag, self._instance_name, self.name)
+        self.lag = lag
+
+    async def acquire(self, dbname: str) -> pgcon.PGConnection:
+        return await self._pool.acquire(dbname)
+
+    def release(
+        self,
+        dbname: str,
+        conn: pgcon.PGConnection,
+        *,
+        discard: bool = False,
+    ) -> None:
+        self._pool.release(
+            dbname, conn, discard=discard or not conn.is_healthy())
+
+    async def monitor(self) -> None:
+        """Keep measuring the replication lag until cancelled."""
+        conn = None
+        checked = False
+        try:
+            while True:
+                try:
+                    if conn is None or not conn.is_healthy():
+                        conn = await self._connect(
+                            defines.EDGEDB_SYSTEM_DB,
+                            "replica lag monitor",
+                        )
+                    self.is_hot_standby = conn.is_hot_standby
+                    lag = await conn.sql_fetch_val(LAG_QUERY)
+                except Exception as ex:
+                    if self.lag is not None or not checked:
+                        logger.warning(
+                            "could not check read replica %s: %s",
+                            self.name, ex,
+                        )
+                    self._set_lag(None)
+                    if conn is not None:
+                        conn.terminate()
+                        conn = None
+                else:
+                    if lag is None:
+                        if self.lag is not None or not checked:
+                            logger.warning(
+                                "read replica %s is neither a standby nor "
+                                "a logical replica", self.name,
+                            )
+                        self._set_lag(None)
+                    else:
+                        self._set_lag(float(lag))
+
+                checked = True
+                await asyncio.sleep(LAG_CHECK_INTERVAL)
+        finally:
+            if conn is not None:
+                conn.terminate()
+
+    async def close(self) -> None:
+        await self._pool.close()
@@ -200,6 +200,11 @@ class BaseServer:
             maxsize=defines._MAX_QUERIES_CACHE_SYSTEM
         )
         self._system_compile_cache_locks: dict[Any, Any] = {}
+        # Compiled queries shared by all branches (of all tenants) that
+        # have identical schemas, see Database.get_schema_fingerprint().
+        self._shared_compile_cache = lru.LRUMapping(
+            maxsize=defines._MAX_QUERIES_CACHE_SHARED
+        )
 
         self._listen_sockets = listen_sockets
         if listen_sockets:
@@ -538,6 +543,10 @@ class BaseServer:
     def system_compile_cache(self):
         return self._system_compile_cache
 
+    @property
+    def shared_compile_cache(self):
+        return self._shared_compile_cache
+
     def request_stop_fe_conns(self, dbname: str) -> None:
         for conn in itertools.chain(
             self._binary_conns.keys(), self._pgext_conns.values()
@@ -33,6 +33,7 @@ from typing import (
 import asyncio
 import contextlib
 import dataclasses
+import functools
 import json
 import logging
 import os
@@ -67,7 +68,9 @@ from . import metrics
 from . import pgcon
 from . import compiler as edbcompiler
 from . import pgconnparams
+from . import replicas
 
+from .connpool import config as connpool_config
 from .ha import adaptive as adaptive_ha
 from .ha import base as ha_base
 from .http import HttpClient
@@ -92,6 +95,24 @@ HEALTH_CHECK_MIN_INTERVAL: float = float(
 HEALTH_CHECK_TIMEOUT: float = float(
     os.getenv("GEL_BACKEND_HEALTH_CHECK_TIMEOUT", 10)
 )
+HOT_QUERIES_SAVE_INTERVAL: float = float(
+    os.getenv("GEL_SERVER_HOT_QUERIES_SAVE_INTERVAL", 300)
+)
+
+
+def _backend_conn_score(
+    state: Optional[bytes],
+    stmt_name: Optional[bytes],
+    conn: pgcon.PGConnection,
+) -> int:
+    score = 0
+    # Having the statement prepared saves more than having the session
+    # state synced, as the state sync is usually sent along with the query.
+    if stmt_name is not None and conn.has_prepared_stmt(stmt_name):
+        score += 2
+    if state is not None and conn.last_state == state:
+        score += 1
+    return score
 
 
 class RoleDescriptor(TypedDict):
@@ -129,6 +150,8 @@ class Tenant(ha_base.ClusterProtocol):
     _max_backend_connections: int
     _suggested_client_pool_size: int
     _pg_pool: connpool.Pool
+    _replicas: list[replicas.Replica]
+    _replica_monitors: list[asyncio.Task]
     _pg_unavailable_msg: str | None
     _init_con_data: list[config.ConState]
     _init_con_sql: bytes | None
@@ -142,6 +165,10 @@ class Tenant(ha_base.ClusterProtocol):
 
     _extensions_dirs: tuple[pathlib.Path, ...]
 
+    # Serialized compilation requests of the most used queries of each
+    # database, as of the last shutdown, waiting to be precompiled.
+    _hot_queries: dict[str, list[bytes]]
+
     # A set of databases that should not accept new connections.
     _block_new_connections: set[str]
     _report_config_data: dict[defines.ProtocolVersion, bytes]
@@ -165,6 +192,7 @@ class Tenant(ha_base.ClusterProtocol):
         instance_name: str,
         max_backend_connections: int,
         backend_adaptive_ha: bool = False,
+        backend_replica_dsns: tuple[str, ...] = (),
         extensions_dir: tuple[pathlib.Path, ...] = (),
     ):
         self._cluster = cluster
@@ -184,6 +212,7 @@ class Tenant(ha_base.ClusterProtocol):
         self._sidechannel_email_configs = []
 
         self._extensions_dirs = extensions_dir
+        self._hot_queries = {}
 
         # Never use `self.__sys_pgcon` directly; get it via
         # `async with self.use_sys_pgcon()`.
@@ -216,6 +245,17 @@ class Tenant(ha_base.ClusterProtocol):
             # 1 connection is reserved for the system DB
             max_capacity=max_backend_connections - 1,
         )
+        self._replicas = [
+            replicas.Replica(
+                dsn,
+                connect=functools.partial(self._pg_connect_replica, dsn),
+                # 1 connection is reserved for the lag monitor
+                max_capacity=max_backend_connections - 1,
+                instance_name=instance_name,
+            )
+            for dsn in backend_replica_dsns
+        ]
+        self._replica_monitors = []
         self._pg_unavailable_msg = None
         self._block_new_connections = set()
         self._report_config_data = {}
@@ -578,6 +618,7 @@ class Tenant(ha_base.ClusterProtocol):
             sys_config_spec=self._server.config_settings,
         )
 
+        self._hot_queries = self._load_hot_queries()
         await self._introspect_dbs()
 
         await self.load_extension_packages(buildmeta.get_extension_dir_path())
@@ -744,6 +785,13 @@ class Tenant(ha_base.ClusterProtocol):
         await self._task_group.__aenter__()
         self._accept_new_tasks = True
         await self._cluster.start_watching(self.on_switch_over)
+        self._replica_monitors = [
+            self.create_task(replica.monitor(), interruptable=True)
+            for replica in self._replicas
+        ]
+        self.create_task(
+            self._save_hot_queries_periodically(), interruptable=True
+        )
 
     def start_running(self) -> None:
         self._running = True
@@ -814,7 +862,11 @@ class Tenant(ha_base.ClusterProtocol):
     def stop(self) -> None:
         self._running = False
         self._accept_new_tasks = False
+        self._save_hot_queries()
         self._cluster.stop_watching()
+        for task in self._replica_monitors:
+            task.cancel()
+        self._replica_monitors.clear()
         self._stop_watching_files()
         self._server.request_frontend_stop(self)
 
@@ -828,6 +880,8 @@ class Tenant(ha_base.ClusterProtocol):
             self._task_group = None
             await tg.__aexit__(*sys.exc_info())
         await self._pg_pool.close()
+        for replica in self._replicas:
+            await replica.close()
 
     def terminate_sys_pgcon(self) -> None:
         if self.__sys_pgcon is not None:
@@ -902,6 +956,39 @@ class Tenant(ha_base.ClusterProtocol):
             rv.terminate()
             raise ConnectionError("connected to outdated Postgres master")
 
+    async def _pg_connect_replica(
+        self,
+        dsn: str,
+        dbname: str,
+        source_description: str,
+    ) -> pgcon.PGConnection:
+        if self.get_backend_runtime_params().has_create_database:
+            pg_dbname = self.get_pg_dbname(dbname)
+        else:
+            pg_dbname = self.get_pg_dbname(defines.EDGEDB_SUPERUSER_DB)
+        # Replica connections are set up like the ones to the primary, so
+        # that queries behave the same on both, unless the replica is a hot
+        # standby: those connections are read-only and hold no session
+        # state.  They are not tied to the tenant though, as they must not
+        # take part in the HA handling of the primary.
+        rv = await self._cluster.connect(
+            source_description=source_description,
+            database=pg_dbname,
+            apply_init_script=True,
+            allow_hot_standby=True,
+            dsn=dsn,
+        )
+        try:
+            if self._server.stmt_cache_size is not None:
+                rv.set_stmt_cache_size(self._server.stmt_cache_size)
+            if self._init_con_sql and not rv.is_hot_standby:
+                await rv.sql_execute(self._init_con_sql)
+            rv.last_init_con_data = self._init_con_data
+        except Exception:
+            rv.terminate()
+            raise
+        return rv
+
     async def _pg_disconnect(self, conn: pgcon.PGConnection) -> None:
         metrics.current_backend_connections.dec(1.0, self._instance_name)
         conn.terminate()
@@ -1126,14 +1213,50 @@ class Tenant(ha_base.ClusterProtocol):
         finally:
             self.release_pgcon(dbname, conn, discard=discard)
 
-    async def acquire_pgcon(self, dbname: str) -> pgcon.PGConnection:
+    async def acquire_pgcon(
+        self,
+        dbname: str,
+        *,
+        state: Optional[bytes] = None,
+        stmt_name: Optional[bytes] = None,
+    ) -> pgcon.PGConnection:
+        """Acquire a backend connection to the given branch.
+
+        If *state* is given, a connection that has this session state
+        applied already is preferred, so that it doesn't have to be synced.
+        Likewise, a connection that has the *stmt_name* statement prepared
+        is preferred, so that the statement doesn't have to be parsed again.
+        """
         if self._pg_unavailable_msg is not None:
             raise errors.BackendUnavailableError(
                 "Postgres is not available: " + self._pg_unavailable_msg
             )
 
+        if (
+            connpool_config.IDLE_TX_ABORT_POLICY != "never"
+            and self._pg_pool.is_saturated(dbname)
+        ):
+            self._abort_idle_transaction()
+
+        prefer: Optional[Callable[[pgcon.PGConnection], int]] = None
+        if state is not None or stmt_name is not None:
+            prefer = functools.partial(_backend_conn_score, state, stmt_name)
+
         for _ in range(self._pg_pool.max_capacity):
-            conn = await self._pg_pool.acquire(dbname)
+            conn = await self._pg_pool.acquire(dbname, prefer=prefer)
+            if state is not None:
+                metrics.backend_connection_state_reuse.inc(
+                    1.0,
+                    self._instance_name,
+                    "hit" if conn.last_state == state else "miss",
+                )
+            if stmt_name is not None:
+                metrics.backend_prepared_statement_reuse.inc(
+                    1.0,
+                    self._instance_name,
+                    dbname,
+                    "hit" if conn.has_prepared_stmt(stmt_name) else "miss",
+                )
             if not conn.is_healthy():
                 logger.warning("acquired an unhealthy pgcon; discard now")
             elif conn.last_init_con_data is not self._init_con_data:
@@ -1160,6 +1283,129 @@ class Tenant(ha_base.ClusterProtocol):
                 "please try again."
             )
 
+    def _abort_idle_transaction(self) -> None:
+        # Make room for a client that would otherwise have to wait for a
+        # backend connection by aborting the transaction that has been idle
+        # for the longest time, if the abort policy allows that.
+        max_ratio = connpool_config.MAX_PINNED_RATIO
+        only_over_ratio = connpool_config.IDLE_TX_ABORT_POLICY == "over-ratio"
+        expiry_time = (
+            time.monotonic() - connpool_config.MIN_IDLE_TX_TIME_BEFORE_ABORT
+        )
+        over_ratio: dict[str, bool] = {}
+        victim = None
+        victim_dbname = None
+        for dbname, conn in self._pg_pool.iterate_pinned_connections():
+            fe_conn = conn.pinned_by
+            if fe_conn is None or not fe_conn.is_idle(expiry_time):
+                continue
+            if only_over_ratio:
+                if dbname not in over_ratio:
+                    over_ratio[dbname] = (
+                        self._pg_pool.count_pinned_conns(dbname) >
+                        max_ratio * self._pg_pool.count_conns(dbname)
+                    )
+                if not over_ratio[dbname]:
+                    continue
+            if (
+                victim is None
+                or fe_conn.started_idling_at < victim.started_idling_at
+            ):
+                victim = fe_conn
+                victim_dbname = dbname
+
+        if victim is not None:
+            assert victim_dbname is not None
+            logger.info(
+                "aborting a transaction idle for %.1fs on branch %s: "
+                "clients are waiting for backend connections",
+                time.monotonic() - victim.started_idling_at,
+                victim_dbname,
+            )
+            metrics.backend_idle_transactions_aborted.inc(
+                1.0, self._instance_name, victim_dbname)
+            victim.close_for_idle_transaction()
+
+    def pin_pgcon(self, dbname: str, conn: pgcon.PGConnection) -> None:
+        """Account *conn* as held by its client until released.
+
+        Called when a client keeps the connection for an open transaction
+        instead of releasing it after the request.
+        """
+        self._pg_pool.pin(dbname, conn)
+        self._update_pinned_conns_metrics(dbname)
+
+    def _update_pinned_conns_metrics(self, dbname: str) -> None:
+        npinned = self._pg_pool.count_pinned_conns(dbname)
+        nconns = self._pg_pool.count_conns(dbname)
+        metrics.backend_connections_pinned.set(
+            npinned, self._instance_name, dbname)
+        metrics.backend_connections_pinned_ratio.set(
+            npinned / nconns if nconns else 0.0, self._instance_name, dbname)
+
+    def has_replicas(self) -> bool:
+        return bool(self._replicas)
+
+    async def acquire_replica_pgcon(
+        self,
+        dbname: str,
+        max_staleness: float,
+        *,
+        allow_hot_standby: bool = True,
+    ) -> tuple[replicas.Replica, pgcon.PGConnection] | None:
+        """Acquire a connection to the least busy usable replica.
+
+        Returns None if no replica is lagging behind the primary less
+        than *max_staleness* seconds, the query should then be run on
+        the primary.  Hot standbys are skipped unless *allow_hot_standby*
+        is set.
+        """
+        candidates = sorted(
+            (
+                r for r in self._replicas
+                if r.is_usable(
+                    max_staleness, allow_hot_standby=allow_hot_standby)
+            ),
+            key=lambda r: r.active_conns,
+        )
+        for replica in candidates:
+            try:
+                conn = await replica.acquire(dbname)
+            except Exception as e:
+                logger.warning(
+                    "could not connect to read replica %s: %s",
+                    replica.name, e,
+                )
+                replica.mark_unavailable()
+                continue
+
+            if conn.is_hot_standby:
+                if not allow_hot_standby:
+                    replica.release(dbname, conn)
+                    continue
+                conn.last_init_con_data = self._init_con_data
+            elif conn.last_init_con_data is not self._init_con_data:
+                try:
+                    await conn.sql_execute(
+                        pgcon.RESET_STATIC_CFG_SCRIPT +
+                        (self._init_con_sql or b'')
+                    )
+                except Exception as e:
+                    logger.warning(
+                        "failed to update replica pgcon; discard now: %s", e
+                    )
+                    replica.release(dbname, conn, discard=True)
+                    continue
+                conn.last_init_con_data = self._init_con_data
+
+            metrics.backend_replica_routing.inc(
+                1.0, self._instance_name, replica.name)
+            return replica, conn
+
+        metrics.backend_replica_routing.inc(
+            1.0, self._instance_name, "primary")
+        return None
+
     def release_pgcon(
         self,
         dbname: str,
@@ -1171,6 +1417,7 @@ class Tenant(ha_base.ClusterProtocol):
             if not discard:
                 logger.warning("Released an unhealthy pgcon; discard now.")
             discard = True
+        pinned = self._pg_pool.is_pinned(dbname, conn)
         try:
             self._pg_pool.release(dbname, conn, discard=discard)
         except Exception:
@@ -1178,6 +1425,8 @@ class Tenant(ha_base.ClusterProtocol):
                 1.0, self._instance_name, "release_pgcon"
             )
             raise
+        if pinned:
+            self._update_pinned_conns_metrics(dbname)
 
     def allow_database_connections(self, dbname: str) -> None:
         self._block_new_connections.discard(dbname)
@@ -1451,6 +1700,91 @@ class Tenant(ha_base.ClusterProtocol):
             assert self._dbindex
             self._dbindex.get_db(dbname).clear_query_cache()
 
+        hot_queries = self._hot_queries.pop(dbname, None)
+        if hot_queries and self._accept_new_tasks:
+            self.create_task(
+                self._precompile_hot_queries(db, hot_queries),
+                interruptable=True,
+            )
+
+    async def _precompile_hot_queries(
+        self,
+        db: dbview.Database,
+        hot_queries: list[bytes],
+    ) -> None:
+        compiler_pool = self._server.get_compiler_pool()
+        concurrency = max(1, compiler_pool.get_size_hint() // 2)
+        started_at = time.monotonic()
+        try:
+            compiled = await db.precompile_queries(hot_queries, concurrency)
+        except Exception:
+            logger.exception(
+                "error precompiling hot queries of database '%s'", db.name)
+            metrics.background_errors.inc(
+                1.0, self._instance_name, "precompile_hot_queries"
+            )
+        else:
+            logger.info(
+                "precompiled %d of %d hot queries of database '%s' "
+                "in %.2fs",
+                compiled,
+                len(hot_queries),
+                db.name,
+                time.monotonic() - started_at,
+            )
+
+    def _get_hot_queries_path(self) -> pathlib.Path:
+        return self._server._runstate_dir / f"hot-queries-{self._tenant_id}"
+
+    def _load_hot_queries(self) -> dict[str, list[bytes]]:
+        path = self._get_hot_queries_path()
+        try:
+            with open(path, "rb") as f:
+                catalog_version, hot_queries = pickle.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception:
+            logger.warning(
+                "could not load hot queries from %s", path, exc_info=True)
+            return {}
+        if catalog_version != defines.EDGEDB_CATALOG_VERSION:
+            return {}
+        return hot_queries
+
+    async def _save_hot_queries_periodically(self) -> None:
+        # Also saved on shutdown, but an unclean shutdown would otherwise
+        # lose everything recorded since the last start.
+        while True:
+            await asyncio.sleep(HOT_QUERIES_SAVE_INTERVAL)
+            self._save_hot_queries()
+
+    def _save_hot_queries(self) -> None:
+        # Record the most used queries of each database so that they can
+        # be precompiled in the background after a restart, keeping
+        # entries of databases that were not introspected since then.
+        if self._dbindex is None:
+            return
+        hot_queries = dict(self._hot_queries)
+        for db in self._dbindex.iter_dbs():
+            if db.is_introspected():
+                queries = db.get_hot_queries(
+                    defines._MAX_HOT_QUERIES_PRECOMPILE)
+                if queries:
+                    hot_queries[db.name] = queries
+                else:
+                    hot_queries.pop(db.name, None)
+
+        path = self._get_hot_queries_path()
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(
+                    (defines.EDGEDB_CATALOG_VERSION, hot_queries), f, -1)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning(
+                "could not save hot queries to %s", path, exc_info=True)
+
     async def _early_introspect_db(self, dbname: str) -> None:
         """We need to always introspect the extensions for each database.
 
@@ -2162,6 +2496,14 @@ class Tenant(ha_base.ClusterProtocol):
                 1.0, self._instance_name, "evict_query_cache"
             )
 
+    def on_remote_result_cache_change(
+        self,
+        dbname: str,
+        tables: Optional[list[str]],
+    ) -> None:
+        if db := self.maybe_get_db(dbname=dbname):
+            db.invalidate_result_cache(tables)
+
     def on_remote_query_cache_change(
         self,
         dbname: str,
@@ -2248,6 +2590,7 @@ class Tenant(ha_base.ClusterProtocol):
                     ),
                     extensions=sorted(db.extensions),
                     query_cache_size=db.get_query_cache_size(),
+                    query_cache_memory=db.get_query_cache_memory(),
                     connections=[
                         dict(
                             in_tx=view.in_tx(),
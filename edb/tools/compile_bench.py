@@ -0,0 +1,183 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Measure the time and memory it takes to compile EdgeQL to SQL.
+
+The queries are taken from the docstrings of the compiler test cases
+(tests/test_edgeql_ir_*.py and friends), and every one of them is
+compiled against the schema of its test case.  Alternatively, a single
+query with deeply nested shapes can be generated to stress the scope
+tree.
+"""
+
+
+from __future__ import annotations
+
+import copy
+import gc
+import importlib
+import pathlib
+import sys
+import time
+import tracemalloc
+
+import click
+
+from edb.edgeql import compiler as qlcompiler
+from edb.edgeql import parser as qlparser
+from edb.pgsql import codegen as pg_codegen
+from edb.pgsql import compiler as pg_compiler
+from edb.testbase import lang as tb
+from edb.tools.edb import edbcommands
+
+
+def _collect_queries(module_name: str) -> list[tuple[object, str]]:
+    mod = importlib.import_module(module_name)
+    queries = []
+    for obj in vars(mod).values():
+        if (
+            not isinstance(obj, type)
+            or not issubclass(obj, tb.BaseEdgeQLCompilerTest)
+            or obj is tb.BaseEdgeQLCompilerTest
+        ):
+            continue
+
+        obj.setUpClass()
+        for name in dir(obj):
+            meth = getattr(obj, name)
+            if not name.startswith('test_') or not meth.__doc__:
+                continue
+            if 'must_fail' in getattr(meth, 'test_spec', {}):
+                continue
+            source = meth.__doc__.partition('\n% OK %')[0]
+            queries.append((obj.schema, source))
+    return queries
+
+
+class _CardsSchema(tb.BaseEdgeQLCompilerTest):
+
+    SCHEMA = str(
+        pathlib.Path(__file__).parent.parent.parent
+        / 'tests' / 'schemas' / 'cards.esdl'
+    )
+
+
+def _nested_shapes_query(depth: int) -> str:
+    # Alternate between users and their cards, referring to the outer
+    # levels from the inner ones, so that the paths have to be looked up
+    # through the whole scope tree.
+    shape = 'name'
+    for level in reversed(range(depth)):
+        if level % 2:
+            shape = (
+                f'name, cost, owners: {{ {shape} }} '
+                f'FILTER .name != U{level - 1}.name ORDER BY .name'
+            )
+        else:
+            shape = (
+                f'name, deck_cost, deck: {{ {shape} }} '
+                f'FILTER .cost > count(U{level}.friends)'
+            )
+    aliases = ', '.join(f'U{i} := User' for i in range(0, depth, 2))
+    return f'WITH {aliases} SELECT User {{ {shape} }}'
+
+
+def _compile(schema, source: str) -> None:
+    qltree = qlparser.parse_query(source)
+    ir = qlcompiler.compile_ast_to_ir(
+        qltree,
+        schema,
+        options=qlcompiler.CompilerOptions(
+            modaliases={None: 'default'},
+        ),
+    )
+    sql_res = pg_compiler.compile_ir_to_sql_tree(
+        ir,
+        output_format=pg_compiler.OutputFormat.NATIVE,
+    )
+    pg_codegen.generate_source(sql_res.ast)
+    # Tree rewrites deep-copy the trees all the time
+    copy.deepcopy(sql_res.ast)
+
+
+@edbcommands.command("compile-bench")
+@click.option("-n", "--rounds", type=int, default=5,
+              help="number of times every query is compiled")
+@click.option("--nested-shapes", type=int, default=0, metavar="DEPTH",
+              help="compile a query with shapes nested DEPTH levels deep "
+                   "instead of the test corpus")
+@click.argument("modules", nargs=-1)
+def main(*, rounds, nested_shapes, modules):
+    """Measure EdgeQL compilation time and memory on the test corpus.
+
+    MODULES are the test modules to take the queries from (by default,
+    all of tests/test_edgeql_ir_*.py).
+    """
+    queries = []
+    if nested_shapes:
+        _CardsSchema.setUpClass()
+        queries.append(
+            (_CardsSchema.schema, _nested_shapes_query(nested_shapes)))
+    else:
+        if not modules:
+            root = pathlib.Path(__file__).parent.parent.parent / 'tests'
+            modules = sorted(
+                f'tests.{p.stem}' for p in root.glob('test_edgeql_ir_*.py'))
+        for module in modules:
+            queries.extend(_collect_queries(module))
+
+    compiled = []
+    for schema, source in queries:
+        # Warm up the caches and weed out the queries that don't
+        # compile outside of their test case.
+        try:
+            _compile(schema, source)
+        except Exception:
+            if nested_shapes:
+                raise
+            continue
+        compiled.append((schema, source))
+
+    print(
+        f"Python {sys.version.split()[0]}, "
+        f"{len(compiled)} of {len(queries)} queries, {rounds} rounds"
+    )
+
+    gc.collect()
+    collections = sum(s['collections'] for s in gc.get_stats())
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        for schema, source in compiled:
+            _compile(schema, source)
+    elapsed = time.perf_counter() - started_at
+    collections = sum(s['collections'] for s in gc.get_stats()) - collections
+
+    tracemalloc.start()
+    for schema, source in compiled:
+        _compile(schema, source)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = rounds * len(compiled)
+    print(
+        f"{total / elapsed:10.1f} compiles/s, "
+        f"{elapsed / total * 1000:8.3f} ms/compile, "
+        f"{collections} GC collections, "
+        f"peak traced memory {peak / 1024 / 1024:8.1f} MiB"
+    )
@@ -0,0 +1,174 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Compare the throughput and memory usage of compiler pool modes."""
+
+
+from __future__ import annotations
+
+import asyncio
+import pickle
+import sys
+import tempfile
+import time
+import unittest.mock
+import uuid
+
+import click
+import immutables
+import psutil
+
+from edb import edgeql
+from edb.pgsql import params as pg_params
+from edb.schema import schema as s_schema
+from edb.server import args as srv_args
+from edb.server import compiler as edbcompiler
+from edb.server import config
+from edb.server.compiler import rpc
+from edb.server.compiler_pool import pool
+from edb.server.dbview import dbview
+from edb.testbase import lang as tb
+from edb.tools.edb import edbcommands
+
+
+QUERIES = [
+    "SELECT {n} + 1",
+    "SELECT <str>{n} ++ 'x'",
+    "SELECT schema::ObjectType {{ name }} FILTER .name = 'std::{n}'",
+    "SELECT schema::Function {{ name, params: {{ name }} }} LIMIT {n}",
+]
+
+
+def _get_rss() -> int:
+    proc = psutil.Process()
+    rss = proc.memory_info().rss
+    for child in proc.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return rss
+
+
+async def _bench(
+    mode: srv_args.CompilerPoolMode,
+    *,
+    pool_size: int,
+    concurrency: int,
+    num_requests: int,
+) -> tuple[float, int]:
+    std_schema = tb._load_std_schema()
+    refl_schema, schema_class_layout = tb._load_reflection_schema()
+    assert schema_class_layout is not None
+    global_schema_pickle = pickle.dumps(s_schema.EMPTY_SCHEMA, -1)
+    user_schema_pickle = pickle.dumps(s_schema.EMPTY_SCHEMA, -1)
+
+    compiler = edbcompiler.new_compiler(
+        std_schema=std_schema,
+        reflection_schema=refl_schema,
+        schema_class_layout=schema_class_layout,
+    )
+    cfg_ser = compiler.state.compilation_config_serializer
+
+    with tempfile.TemporaryDirectory() as td:
+        pool_ = await pool.create_compiler_pool(
+            runstate_dir=td,
+            pool_size=pool_size,
+            worker_branch_limit=5,
+            backend_runtime_params=pg_params.get_default_runtime_params(),
+            std_schema=std_schema,
+            refl_schema=refl_schema,
+            schema_class_layout=schema_class_layout,
+            pool_class=mode.pool_class,
+            dbindex=dbview.DatabaseIndex(
+                unittest.mock.MagicMock(),
+                std_schema=std_schema,
+                global_schema_pickle=global_schema_pickle,
+                sys_config={},
+                default_sysconfig=immutables.Map(),
+                sys_config_spec=config.load_spec_from_schema(std_schema),
+            ),
+        )
+        try:
+            sem = asyncio.Semaphore(concurrency)
+
+            async def compile(n: int) -> None:
+                query = QUERIES[n % len(QUERIES)].format(n=n)
+                request = rpc.CompilationRequest(
+                    source=edgeql.Source.from_string(query),
+                    protocol_version=(3, 0),
+                    schema_version=uuid.uuid4(),
+                    compilation_config_serializer=cfg_ser,
+                )
+                async with sem:
+                    await pool_.compile(
+                        "main",
+                        user_schema_pickle,
+                        global_schema_pickle,
+                        immutables.Map(),
+                        immutables.Map(),
+                        immutables.Map(),
+                        request.serialize(),
+                        query,
+                    )
+
+            # Warm up every worker before measuring
+            await asyncio.gather(*(compile(n) for n in range(pool_size)))
+
+            started_at = time.monotonic()
+            await asyncio.gather(*(
+                compile(n) for n in range(pool_size, num_requests + pool_size)
+            ))
+            elapsed = time.monotonic() - started_at
+            return num_requests / elapsed, _get_rss()
+        finally:
+            await pool_.stop()
+
+
+@edbcommands.command("compiler-pool-bench")
+@click.option(
+    "-m",
+    "--mode",
+    "modes",
+    type=click.Choice(["fixed", "on_demand", "threaded"]),
+    multiple=True,
+    help="compiler pool modes to compare (default: fixed and threaded)",
+)
+@click.option("-j", "--pool-size", type=int, default=4,
+              help="number of compiler workers")
+@click.option("-c", "--concurrency", type=int, default=16,
+              help="number of concurrent compile requests")
+@click.option("-n", "--requests", "num_requests", type=int, default=1000,
+              help="number of compile requests to measure")
+def main(*, modes, pool_size, concurrency, num_requests):
+    """Compare throughput and RSS of compiler pool modes."""
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'on' if gil else 'off'}")
+    for mode_name in modes or ("fixed", "threaded"):
+        mode = srv_args.CompilerPoolMode(mode_name)
+        rps, rss = asyncio.run(_bench(
+            mode,
+            pool_size=pool_size,
+            concurrency=concurrency,
+            num_requests=num_requests,
+        ))
+        print(
+            f"{mode_name:>10}: {rps:10.1f} compiles/s, "
+            f"RSS {rss / 1024 / 1024:8.1f} MiB"
+        )
@@ -80,6 +80,21 @@ class ASTBaseTests(unittest.TestCase):
         assert ctree22.left.args[0].node['lconst'] is not lconst
         assert ctree22.left.args[0].node['lconst'].value == lconst.value
 
+    def test_common_ast_deepcopy_sharing(self):
+        lconst = tast.Constant(value='foo')
+        args = [lconst, lconst]
+        tree = tast.BinOp(
+            left=tast.FunctionCall(args=args),
+            right=tast.FunctionCall(args=args),
+        )
+
+        ctree = copy.deepcopy(tree)
+        assert ctree.left.args is not args
+        assert ctree.left.args is ctree.right.args
+        assert ctree.left.args[0] is not lconst
+        assert ctree.left.args[0] is ctree.left.args[1]
+        assert ctree.left.args[0].value == 'foo'
+
     @unittest.mock.patch(
         'edb.common.ast.base._check_type',
         ast.base._check_type_real,
@@ -0,0 +1,79 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import annotations
+
+import unittest
+import unittest.mock
+
+from edb.common import phases
+
+
+class ManualClock:
+    def __init__(self, value: float) -> None:
+        self.value = value
+
+    def __call__(self) -> float:
+        return self.value
+
+
+class PhasesTests(unittest.TestCase):
+    def test_common_phases_nested(self) -> None:
+        clock = ManualClock(0)
+        with unittest.mock.patch("time.perf_counter", clock):
+            with phases.collect() as timings:
+                with phases.phase('outer'):
+                    clock.value += 1
+                    with phases.phase('inner'):
+                        clock.value += 2
+                    clock.value += 1
+                    with phases.phase('inner'):
+                        clock.value += 3
+
+        summary = timings.summary()
+        self.assertEqual(set(summary), {'outer', 'inner'})
+        self.assertEqual(summary['outer'][0], 2)
+        self.assertEqual(summary['inner'][0], 5)
+
+    def test_common_phases_not_collected(self) -> None:
+        with phases.phase('ignored'):
+            pass
+
+        with phases.collect() as timings:
+            pass
+        with phases.phase('ignored'):
+            pass
+
+        self.assertEqual(timings.summary(), {})
+
+    def test_common_phases_allocations(self) -> None:
+        blocks = ManualClock(0)
+        with unittest.mock.patch("sys.getallocatedblocks", blocks):
+            with phases.collect() as timings:
+                with phases.phase('outer'):
+                    blocks.value += 10
+            self.assertIsNone(timings.summary()['outer'][1])
+
+            with phases.collect(count_allocations=True) as timings:
+                with phases.phase('outer'):
+                    blocks.value += 10
+                    with phases.phase('inner'):
+                        blocks.value += 5
+
+        summary = timings.summary()
+        self.assertEqual(summary['outer'][1], 10)
+        self.assertEqual(summary['inner'][1], 5)
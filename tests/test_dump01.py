@@ -1892,6 +1892,18 @@ class TestDump01(tb.StableDumpTestCase, DumpTestCaseMixin):
         await self.check_dump_restore(
             DumpTestCaseMixin.ensure_schema_data_integrity)
 
+    async def test_dump01_dump_restore_parallel(self):
+        await self.con.execute('''
+            configure instance set dump_parallelism := 4;
+        ''')
+        try:
+            await self.check_dump_restore(
+                DumpTestCaseMixin.ensure_schema_data_integrity)
+        finally:
+            await self.con.execute('''
+                configure instance reset dump_parallelism;
+            ''')
+
     async def test_dump01_branch_schema(self):
         await self.check_branching(
             include_data=False,
@@ -79,6 +79,53 @@ class TestDump03(tb.StableDumpTestCase, DumpTestCaseMixin):
         await self.check_dump_restore(
             DumpTestCaseMixin.ensure_schema_data_integrity)
 
+    async def test_dump03_dump_restore_bulk(self):
+        # Enough rows to span many COPY messages, with some columns that
+        # need their OIDs mended and some that are passed through.
+        await self.con.execute('''
+            FOR i IN range_unpack(range(0, 5000)) UNION (
+                INSERT Test {
+                    name := 'bulk' ++ <str>i,
+                    array_of_tuples := [(i, <MyStr><str>i, -i)],
+                    tuple_of_arrays := (
+                        <MyStr>'x', [<MyStr><str>i], (i, i, <array<MyStr>>[]),
+                    ),
+                }
+            );
+        ''')
+
+        async def check_bulk(self):
+            await self.assert_query_result(
+                r'''
+                    WITH bulk := (SELECT Test FILTER .name LIKE 'bulk%')
+                    SELECT (
+                        count(bulk),
+                        sum(bulk.array_of_tuples[0].0),
+                        sum(<int64>bulk.tuple_of_arrays.1[0]),
+                    )
+                ''',
+                [[5000, 12497500, 12497500]],
+            )
+            await self.assert_query_result(
+                r'''
+                    SELECT Test {
+                        array_of_tuples,
+                        tuple_of_arrays,
+                    } FILTER .name = 'bulk42'
+                ''',
+                [{
+                    'array_of_tuples': [[42, '42', -42]],
+                    'tuple_of_arrays': ['x', ['42'], [42, 42, []]],
+                }],
+            )
+
+        try:
+            await self.check_dump_restore(check_bulk)
+        finally:
+            await self.con.execute('''
+                DELETE Test FILTER .name LIKE 'bulk%';
+            ''')
+
     async def test_dump03_zbranch_data(self):
         await self.check_branching(
             include_data=True,
@@ -18,6 +18,7 @@
 
 
 import os.path
+import pickle
 
 from edb.testbase import lang as tb
 from edb.ir import pathid
@@ -248,3 +249,34 @@ class TestEdgeQLIRPathID(tb.BaseEdgeQLCompilerTest):
             ptr_1, base_1, base_2, permissive_ptr_path=True)
 
         self.assertEqual(repr(ptr_2), repr(ptr_1b))
+
+    def test_edgeql_ir_pathid_memoized(self):
+        pid_1 = self.mk_path('User', 'deck', ns={'foo'})
+        pid_2 = self.mk_path('User', 'deck', ns={'foo'})
+
+        self.assertIsNot(pid_1, pid_2)
+        self.assertEqual(pid_1, pid_2)
+        self.assertIs(pid_1.ptr_path(), pid_1.ptr_path())
+        self.assertIs(pid_1.src_path(), pid_1.src_path())
+        self.assertIs(
+            pid_1.replace_namespace({'bar'}),
+            pid_1.replace_namespace({'bar'}),
+        )
+        self.assertIs(
+            pid_1.strip_namespace({'foo'}),
+            pid_1.strip_namespace({'foo'}),
+        )
+        self.assertEqual(
+            pid_1.strip_namespace({'foo'}),
+            self.mk_path('User', 'deck'),
+        )
+        self.assertEqual(
+            list(pid_1.iter_prefixes(include_ptr=True)),
+            list(pid_2.iter_prefixes(include_ptr=True)),
+        )
+
+        # Derived PathIds are not pickled along
+        ptr_pid = pickle.loads(pickle.dumps(pid_1.ptr_path()))
+        self.assertEqual(ptr_pid, pid_1.ptr_path())
+        self.assertIsNot(ptr_pid.tgt_path(), pid_1)
+        self.assertEqual(ptr_pid.tgt_path(), pid_1)
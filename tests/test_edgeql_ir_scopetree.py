@@ -17,7 +17,9 @@
 #
 
 
+import collections
 import os.path
+import pickle
 
 from edb import errors
 
@@ -25,6 +27,7 @@ from edb.testbase import lang as tb
 
 from edb.edgeql import compiler
 from edb.edgeql import parser as qlparser
+from edb.ir import scopetree
 
 
 class TestEdgeQLIRScopeTree(tb.BaseEdgeQLCompilerTest):
@@ -104,3 +107,144 @@ class TestEdgeQLIRScopeTree(tb.BaseEdgeQLCompilerTest):
         """
         UPDATE User SET { avatar := (UPDATE .avatar SET { text := "foo" }) }
         """
+
+    def _compile_scope_tree(self, source):
+        ir = compiler.compile_ast_to_ir(
+            qlparser.parse_query(source),
+            self.schema,
+            options=compiler.CompilerOptions(
+                apply_query_rewrites=False,
+                modaliases={None: 'default'},
+            )
+        )
+        return ir.scope_tree
+
+    def _assert_path_keys(self, root):
+        # The path key counts kept up to date incrementally must match
+        # the ones recomputed from scratch for every node.
+        for node in root.descendants:
+            expected = collections.Counter(
+                d.path_id.namespace_free_hash()
+                for d in node.descendants
+                if d.path_id is not None
+            )
+            self.assertEqual(node._path_keys, dict(expected), node)
+
+    def _search_all(self, root):
+        path_ids = set()
+        for node in root.descendants:
+            if node.path_id is not None:
+                path_ids.add(node.path_id)
+                path_ids.add(
+                    node.path_id.strip_namespace(node.path_id.namespace))
+        results = []
+        for node in root.descendants:
+            for path_id in path_ids:
+                results.append((
+                    node,
+                    path_id,
+                    node.find_visible_ex(path_id, allow_group=True),
+                    node.find_descendant(path_id),
+                    node.find_factorable_nodes(path_id),
+                ))
+        return results
+
+    def _assert_searches_unpruned(self, root):
+        # The searches pruned by the path key counts must return the
+        # same results as the ones walking the whole tree.
+        pruned = self._search_all(root)
+
+        class AllKeys(dict):
+            def __contains__(self, key):
+                return True
+
+        nodes = list(root.descendants)
+        saved = [node._path_keys for node in nodes]
+        for node in nodes:
+            node._path_keys = AllKeys()
+        try:
+            unpruned = self._search_all(root)
+        finally:
+            for node, path_keys in zip(nodes, saved):
+                node._path_keys = path_keys
+
+        self.assertEqual(len(pruned), len(unpruned))
+        for p, u in zip(pruned, unpruned):
+            self.assertEqual(p, u, f'{p[0]!r}, {p[1]}')
+
+    def _check_scope_tree(self, root):
+        self._assert_path_keys(root)
+        self._assert_searches_unpruned(root)
+
+    def test_edgeql_ir_scope_tree_path_keys(self):
+        class Ctx:
+            def log_warning(self, warning):
+                pass
+
+        # Building the tree attaches, factors and fuses paths, and the
+        # WITH alias puts namespaced paths into it.
+        root = self._compile_scope_tree('''
+            WITH
+                U := (SELECT User FILTER .name != 'x')
+            SELECT U {
+                name,
+                deck: {
+                    name,
+                    owners: { name, friends: { name } },
+                } FILTER .cost > 1,
+                friends: {
+                    deck_cost,
+                    avatar: { name, @text },
+                },
+                n := count(U.deck),
+            }
+            ORDER BY .name
+        ''')
+        self._check_scope_tree(root)
+
+        # Reparent a subtree holding path nodes.
+        fences = [
+            node for node in root.strict_descendants
+            if node.fenced and any(
+                c.path_id is not None for c in node.strict_descendants)
+        ]
+        self.assertGreater(len(fences), 2)
+        moved, target = fences[-1], fences[0]
+        moved.remove()
+        self._assert_path_keys(moved)
+        self._check_scope_tree(root)
+        target.attach_child(moved)
+        self._check_scope_tree(root)
+
+        # Reassign the path ids of a subtree.
+        for node in list(root.descendants):
+            if node.path_id is not None and node.path_id.namespace:
+                node.strip_path_namespace(node.path_id.namespace)
+                break
+        else:
+            self.fail('no namespaced path in the scope tree')
+        self._check_scope_tree(root)
+
+        # Fuse a copy of a path node and its path child onto the node,
+        # which factors the copied child into the existing one.
+        existing = next(
+            node for node in root.descendants
+            if node.path_id is not None
+            and any(c.path_id is not None for c in node.children)
+        )
+        existing_child = next(
+            c for c in existing.children if c.path_id is not None)
+        copy = scopetree.ScopeTreeNode(path_id=existing.path_id)
+        copy.attach_child(
+            scopetree.ScopeTreeNode(path_id=existing_child.path_id))
+        existing.fuse_subtree(copy, ctx=Ctx())
+        self.assertEqual(
+            [c for c in existing.children
+             if c.path_id == existing_child.path_id],
+            [existing_child],
+        )
+        self._check_scope_tree(root)
+
+        # Unpickled trees rebuild the counts.
+        unpickled = pickle.loads(pickle.dumps(root))
+        self._check_scope_tree(unpickled)
@@ -297,6 +297,57 @@ class TestHttpEdgeQL(tb.EdgeQLTestCase):
                 r'''SELECT <positive_int_t>-1''',
             )
 
+    def test_http_edgeql_query_batch_01(self):
+        for use_http_post in [True, False]:
+            self.assert_edgeql_query_result(
+                r"""
+                    SELECT Setting { value }
+                    FILTER .name = <str>$name
+                    ORDER BY .value;
+                """,
+                [
+                    [{'value': 'full'}],
+                    [{'value': 'blue'}, {'value': 'none'}],
+                    [],
+                ],
+                variables=[
+                    {'name': 'perks'},
+                    {'name': 'template'},
+                    {'name': 'missing'},
+                ],
+                use_http_post=use_http_post,
+            )
+
+    def test_http_edgeql_query_batch_02(self):
+        # The first error aborts the whole batch.
+        with self.assertRaisesRegex(
+                edgedb.DivisionByZeroError, r'division by zero'):
+            self.edgeql_query(
+                r'''SELECT 1 // <int64>$x''',
+                variables=[{'x': 1}, {'x': 0}, {'x': 2}],
+            )
+
+        with self.assertRaisesRegex(
+                edgedb.UnsupportedFeatureError,
+                r'multiple statements'):
+            self.edgeql_query(
+                r'''SELECT <int64>$x; SELECT <int64>$x + 1;''',
+                variables=[{'x': 1}],
+            )
+
+    def test_http_edgeql_query_batch_03(self):
+        with self.http_con() as con:
+            data, headers, status = self.http_con_request(
+                con,
+                {'query': 'SELECT <int64>$x', 'variables': '[]'},
+                headers={
+                    'Authorization': self.make_auth_header(),
+                },
+            )
+
+            self.assertEqual(status, 400)
+            self.assertIn(b'must not be an empty array', data)
+
     def test_http_edgeql_query_globals_01(self):
         Q = r'''select GlobalTest { gstr, garray, gid, gdef, gdef2 }'''
 
@@ -19,10 +19,12 @@
 
 import asyncio
 import contextlib
+import io
 import struct
 
 import edgedb
 
+from edb.common import binwrapper
 from edb.server import args as srv_args
 from edb.server import compiler
 from edb import protocol
@@ -222,6 +224,66 @@ class TestProtocol(ProtocolTestCase):
             transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
         )
 
+    async def test_proto_execute_pipeline(self):
+        # Test that queries pipelined to the backend produce the same
+        # results, and that an error skips the rest until Sync.
+        def pipelined():
+            return sum(
+                v for k, v in tb.parse_metrics(self.fetch_metrics()).items()
+                if k.startswith('edgedb_server_queries_pipelined_total')
+            )
+
+        con = await protocol.new_connection(
+            server_settings={'pipeline': 'true'},
+            **self.get_connect_args(database=self.get_database_name())
+        )
+        try:
+            await con.connect()
+
+            before = pipelined()
+            for i in range(3):
+                await self._execute(f'SELECT {i}', sync=False, data=True,
+                                    con=con)
+            await con.send(protocol.Sync())
+            for i in range(3):
+                await con.recv_match(protocol.CommandDataDescription)
+                await con.recv_match(protocol.Data)
+                await con.recv_match(protocol.CommandComplete, status='SELECT')
+            await con.recv_match(
+                protocol.ReadyForCommand,
+                transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
+            )
+            # At most the first query syncs the session state on its own,
+            # the others are sent to the backend without waiting.
+            self.assertGreaterEqual(pipelined() - before, 2)
+
+            await self._execute('SELECT 1', sync=False, data=True, con=con)
+            await self._execute('SELECT 1/0', sync=False, data=True, con=con)
+            await self._execute('SELECT 3', sync=False, data=True, con=con)
+            await con.send(protocol.Sync())
+            await con.recv_match(protocol.CommandDataDescription)
+            await con.recv_match(protocol.Data)
+            await con.recv_match(protocol.CommandComplete, status='SELECT')
+            await con.recv_match(
+                protocol.ErrorResponse,
+                message='division by zero',
+                _ignore_msg=protocol.CommandDataDescription,
+            )
+            await con.recv_match(
+                protocol.ReadyForCommand,
+                transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
+            )
+
+            # Test that the protocol has recovered.
+            await self._execute('SELECT 42', con=con)
+            await con.recv_match(protocol.CommandComplete, status='SELECT')
+            await con.recv_match(
+                protocol.ReadyForCommand,
+                transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
+            )
+        finally:
+            await con.aclose()
+
     async def test_proto_flush_01(self):
 
         await self.con.connect()
@@ -725,6 +787,108 @@ class TestProtocol(ProtocolTestCase):
             message='unsupported array dimensions'
         )
 
+    async def _execute_batch(self, query, arg_sets):
+        output_format = protocol.OutputFormat.BINARY
+        await self._parse(query, output_format=output_format)
+        res = await self.con.recv_match(protocol.CommandDataDescription)
+
+        await self.con.send(
+            protocol.ExecuteBatch(
+                annotations=[],
+                allowed_capabilities=protocol.Capability.ALL,
+                compilation_flags=protocol.CompilationFlag(0),
+                implicit_limit=0,
+                command_text=query,
+                input_language=protocol.InputLanguage.EDGEQL,
+                output_format=output_format,
+                expected_cardinality=protocol.Cardinality.MANY,
+                input_typedesc_id=res.input_typedesc_id,
+                output_typedesc_id=res.output_typedesc_id,
+                state_typedesc_id=b'\0' * 16,
+                argument_sets=arg_sets,
+                state_data=b'',
+            ),
+            protocol.Sync(),
+        )
+
+    async def test_proto_execute_batch(self):
+        def int64_args(val):
+            return pack_i32s(
+                1,  # num args
+                0,  # reserved
+                8,  # len
+            ) + struct.pack('!q', val)
+
+        await self.con.connect()
+
+        await self._execute_batch(
+            'SELECT <int64>$0 * 2',
+            [int64_args(i) for i in (1, 2, 3)],
+        )
+        for i in (1, 2, 3):
+            msg = await self.con.recv_match(protocol.Data)
+            self.assertEqual(
+                bytes(msg.data[0].data), struct.pack('!q', i * 2))
+        await self.con.recv_match(protocol.CommandComplete, status='SELECT')
+        await self.con.recv_match(
+            protocol.ReadyForCommand,
+            transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
+        )
+
+        await self._execute(
+            'CREATE TYPE BatchTest { CREATE PROPERTY n: int64 }')
+        await self.con.recv_match(protocol.CommandComplete)
+        await self.con.recv_match(protocol.ReadyForCommand)
+        try:
+            # An error in the middle of a batch aborts all of it.
+            await self._execute_batch(
+                'INSERT BatchTest { n := 10 // <int64>$0 }',
+                [int64_args(i) for i in (1, 0, 2)],
+            )
+            await self.con.recv_match(
+                protocol.ErrorResponse,
+                message='division by zero',
+                # The result of the first execution may precede the error
+                _ignore_msg=protocol.Data,
+            )
+            await self.con.recv_match(
+                protocol.ReadyForCommand,
+                transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
+            )
+
+            await self._execute_batch(
+                'SELECT count(BatchTest) + <int64>$0',
+                [int64_args(0)],
+            )
+            msg = await self.con.recv_match(protocol.Data)
+            self.assertEqual(bytes(msg.data[0].data), struct.pack('!q', 0))
+            await self.con.recv_match(protocol.CommandComplete)
+            await self.con.recv_match(protocol.ReadyForCommand)
+
+            # An empty batch is rejected and the connection recovers.
+            await self._execute_batch(
+                'INSERT BatchTest { n := <int64>$0 }', [])
+            await self.con.recv_match(
+                protocol.ErrorResponse,
+                message='ExecuteBatch message must contain at least one',
+            )
+            await self.con.recv_match(
+                protocol.ReadyForCommand,
+                transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
+            )
+
+            await self._execute_batch(
+                'INSERT BatchTest { n := <int64>$0 }',
+                [int64_args(i) for i in (1, 2)],
+            )
+            await self.con.recv_match(protocol.Data)
+            await self.con.recv_match(protocol.Data)
+            await self.con.recv_match(
+                protocol.CommandComplete, status='INSERT')
+            await self.con.recv_match(protocol.ReadyForCommand)
+        finally:
+            await self.con.execute('DROP TYPE BatchTest')
+
     async def test_proto_global_bad_array(self):
         await self.con.connect()
 
@@ -897,6 +1061,142 @@ class TestProtocol(ProtocolTestCase):
             await self.con.recv_match(protocol.ReadyForCommand)
 
 
+class _RawMessage:
+    # A client message sent as is, e.g. a RestoreBlock carrying the
+    # contents of a DumpBlock.
+
+    def __init__(self, mtype: bytes, data: bytes):
+        self._mtype = mtype
+        self._data = data
+
+    def dump(self) -> bytes:
+        return (
+            self._mtype + (len(self._data) + 4).to_bytes(4, 'big') + self._data
+        )
+
+
+def _dump_contents(msg: protocol.ServerMessage) -> bytes:
+    iobuf = io.BytesIO()
+    type(msg).dump(msg, binwrapper.BinWrapper(iobuf))
+    return iobuf.getvalue()
+
+
+class TestProtocolRestore(ProtocolTestCase):
+
+    NUM_TYPES = 6
+
+    SETUP = [
+        f'''
+            CREATE TYPE default::Restore{i} {{
+                CREATE PROPERTY n -> int64;
+            }};
+            FOR n IN {{range_unpack(range(0, 1000))}}
+            UNION (INSERT default::Restore{i} {{ n := n }});
+        '''
+        for i in range(NUM_TYPES)
+    ]
+
+    async def _dump(self):
+        await self.con.send(
+            protocol.Dump(annotations=[], flags=protocol.DumpFlag(0)),
+            protocol.Sync(),
+        )
+        header = await self.con.recv_match(protocol.DumpHeader)
+        blocks = []
+        while isinstance(msg := await self.con.recv(), protocol.DumpBlock):
+            blocks.append(msg)
+        self.assertIsInstance(msg, protocol.CommandComplete)
+        await self.con.recv_match(protocol.ReadyForCommand)
+        self.assertGreaterEqual(len(blocks), self.NUM_TYPES)
+        return header, blocks
+
+    @contextlib.asynccontextmanager
+    async def _new_branch(self, suffix):
+        dbname = f'{self.get_database_name()}_{suffix}'
+        await self.con.execute(f'CREATE EMPTY BRANCH {dbname}')
+        try:
+            con = await protocol.new_connection(
+                **self.get_connect_args(database=dbname))
+            try:
+                yield dbname, con
+            finally:
+                await con.aclose()
+        finally:
+            await self.con.execute(f'DROP BRANCH {dbname}')
+
+    async def _restore(self, con, header, blocks, jobs):
+        await con.send(
+            _RawMessage(
+                b'<',
+                b'\0\0'  # no attributes
+                + jobs.to_bytes(2, 'big')
+                + _dump_contents(header),
+            )
+        )
+        ready = await con.recv_match(protocol.RestoreReady)
+        await con.send(
+            *(_RawMessage(b'=', _dump_contents(block)) for block in blocks),
+            _RawMessage(b'.', b''),
+        )
+        return ready
+
+    async def _count_objects(self, dbname):
+        con = await self.connect(database=dbname)
+        try:
+            return await con.query(f'''
+                SELECT {{{", ".join(
+                    f"count(Restore{i})" for i in range(self.NUM_TYPES)
+                )}}}
+            ''')
+        finally:
+            await con.aclose()
+
+    async def test_proto_restore_parallel(self):
+        header, blocks = await self._dump()
+
+        async with self._new_branch('restore_j4') as (dbname, con):
+            ready = await self._restore(con, header, blocks, jobs=4)
+            # The -j level bounds the data blocks read ahead of the backend
+            self.assertEqual(ready.jobs, 4)
+            await con.recv_match(protocol.CommandComplete, status='RESTORE')
+
+            self.assertEqual(
+                await self._count_objects(dbname),
+                [1000] * self.NUM_TYPES,
+            )
+
+    async def test_proto_restore_parallel_failed_block(self):
+        header, blocks = await self._dump()
+
+        # Truncate the COPY data of the first block, so that loading it
+        # fails midway while the next blocks are being read ahead.
+        attrs = blocks[0].attributes
+        for i, attr in enumerate(attrs):
+            if attr.code == 112:  # DUMP_HEADER_BLOCK_DATA
+                attrs[i] = protocol.KeyValue(
+                    code=attr.code, value=attr.value[:len(attr.value) // 2])
+        broken = [protocol.DumpBlock(attributes=attrs), *blocks[1:]]
+
+        async with self._new_branch('restore_fail') as (dbname, con):
+            await self._restore(con, header, broken, jobs=4)
+            await con.send(protocol.Sync())
+            await con.recv_match(protocol.ErrorResponse)
+            await con.recv_match(
+                protocol.ReadyForCommand,
+                transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
+            )
+
+            # The restore transaction was rolled back: the branch is still
+            # empty, so that restoring again works.
+            await self._restore(con, header, blocks, jobs=4)
+            await con.recv_match(protocol.CommandComplete, status='RESTORE')
+
+            self.assertEqual(
+                await self._count_objects(dbname),
+                [1000] * self.NUM_TYPES,
+            )
+
+
 class TestServerCancellation(tb.TestCase):
     @contextlib.asynccontextmanager
     async def _fixture(self):
@@ -18,7 +18,6 @@
 
 
 from __future__ import annotations
-from typing import TYPE_CHECKING
 
 import random
 import re
@@ -37,14 +36,12 @@ from edb.schema import name as s_name
 from edb.schema import objtypes as s_objtypes
 from edb.schema import properties as s_props
 from edb.schema import operators as s_oper
+from edb.schema import schema as s_schema
 from edb.schema import functions as s_func
 
 from edb.testbase import lang as tb
 from edb.tools import test
 
-if TYPE_CHECKING:
-    from edb.schema import schema as s_schema
-
 
 class TestSchema(tb.BaseSchemaLoadTest):
     DEFAULT_MODULE = 'test'
@@ -3913,6 +3910,41 @@ class TestSchema(tb.BaseSchemaLoadTest):
         function foo(x: array<array<Foo>>) -> int64 using (1);
         """
 
+    def test_schema_flat_schema_delta(self):
+        base = self.load_schema("""
+            type Foo {
+                property name -> str;
+            };
+            type Bar;
+            type Baz;
+        """)
+
+        schema = self.run_ddl(base, """
+            ALTER TYPE default::Foo {
+                CREATE LINK bar -> default::Bar;
+                ALTER PROPERTY name SET REQUIRED;
+            };
+            DROP TYPE default::Baz;
+        """)
+
+        delta = schema.get_delta(base)
+        self.assertLess(
+            sum(len(updated) for _, updated, _ in delta.maps),
+            len(schema._id_to_data),
+        )
+
+        synced = base.apply_delta(delta)
+        for attr in s_schema._FLAT_SCHEMA_MAPS:
+            self.assertEqual(getattr(synced, attr), getattr(schema, attr))
+        self.assertIsNone(synced.get('default::Baz', default=None))
+        self.assertIsNotNone(
+            synced.get('default::Foo').getptr(synced, s_name.UnqualName('bar'))
+        )
+
+        # A delta only applies on top of the schema it was made from.
+        with self.assertRaises(ValueError):
+            synced.apply_delta(delta)
+
 
 class TestGetMigration(tb.BaseSchemaLoadTest):
     """Test migration deparse consistency.
@@ -19,7 +19,9 @@
 from typing import Any
 
 import asyncio
+import collections
 import contextlib
+import functools
 import os
 import pickle
 import signal
@@ -27,6 +29,7 @@ import subprocess
 import sys
 import tempfile
 import time
+import types
 import unittest.mock
 import uuid
 
@@ -44,6 +47,9 @@ from edb.server.compiler import rpc
 from edb.server import config
 from edb.server.compiler_pool import amsg
 from edb.server.compiler_pool import pool
+from edb.server.compiler_pool import queue
+from edb.server.compiler_pool import shared_schema
+from edb.server.compiler_pool import state
 from edb.server.dbview import dbview
 
 
@@ -617,6 +623,62 @@ class TestCompilerPool(tbs.TestCase):
     async def test_server_compiler_pool_disconnect_queue_adaptive(self):
         await self._test_pool_disconnect_queue(pool.SimpleAdaptivePool)
 
+    async def test_server_compiler_pool_threaded(self):
+        with tempfile.TemporaryDirectory() as td:
+            pool_ = await pool.create_compiler_pool(
+                runstate_dir=td,
+                pool_size=2,
+                worker_branch_limit=5,
+                backend_runtime_params=pg_params.get_default_runtime_params(),
+                std_schema=self._std_schema,
+                refl_schema=self._refl_schema,
+                schema_class_layout=self._schema_class_layout,
+                pool_class=pool.ThreadPool,
+            )
+            try:
+                compiler = edbcompiler.new_compiler(
+                    std_schema=self._std_schema,
+                    reflection_schema=self._refl_schema,
+                    schema_class_layout=self._schema_class_layout,
+                )
+                context = edbcompiler.new_compiler_context(
+                    compiler_state=compiler.state,
+                    user_schema=self._std_schema,
+                    modaliases={None: 'default'},
+                )
+
+                orig_query = 'SELECT 123'
+                cfg_ser = compiler.state.compilation_config_serializer
+                request = rpc.CompilationRequest(
+                    source=edgeql.Source.from_string(orig_query),
+                    protocol_version=(1, 0),
+                    schema_version=uuid.uuid4(),
+                    compilation_config_serializer=cfg_ser,
+                    implicit_limit=101,
+                )
+
+                user_schema_pickle = pickle.dumps(
+                    context.state.root_user_schema)
+                results = await asyncio.gather(*(pool_.compile_in_tx(
+                    None,
+                    user_schema_pickle,
+                    context.state.current_tx().id,
+                    pickle.dumps(context.state),
+                    0,
+                    request.serialize(),
+                    orig_query,
+                ) for _ in range(4)))
+                for units, state_pickle, _ in results:
+                    self.assertEqual(len(units), 1)
+                    self.assertIsInstance(state_pickle, bytes)
+
+                with self.assertRaises(AttributeError):
+                    await pool_._simple_call('nonexist')
+                self.assertTrue(await pool_.health_check())
+                self.assertEqual(pool_.get_debug_info()['free'], 2)
+            finally:
+                await pool_.stop()
+
     def test_server_compiler_rpc_hash_eq(self):
         compiler = edbcompiler.new_compiler(
             std_schema=self._std_schema,
@@ -646,3 +708,225 @@ class TestCompilerPool(tbs.TestCase):
 
         test(edgeql.Source.from_string("SELECT 42"))
         test(edgeql.NormalizedSource.from_string("SELECT 42"))
+
+    async def test_server_compiler_pool_coalesce(self):
+        calls = []
+
+        class CountingPool(pool.AbstractPool):
+            async def _compile(self, *args, **compiler_args):
+                calls.append(args[6:])
+                await asyncio.sleep(0.05)
+                return args[6:]
+
+        pool_ = CountingPool(
+            loop=asyncio.get_running_loop(),
+            worker_branch_limit=1,
+            backend_runtime_params=None,
+            std_schema=None,
+            refl_schema=None,
+            schema_class_layout=None,
+        )
+        state_args = (
+            'main',
+            b'user_schema',
+            b'global_schema',
+            immutables.Map(),
+            immutables.Map(),
+            immutables.Map(),
+        )
+
+        def compile(*args, client_id=1):
+            return pool_.compile(*state_args, *args, client_id=client_id)
+
+        cancelled = asyncio.create_task(compile(b'req1', 'SELECT 1'))
+        results = asyncio.gather(
+            compile(b'req1', 'SELECT 1'),
+            compile(b'req1', 'SELECT 1'),
+            compile(b'req2', 'SELECT 2'),
+            compile(b'req1', 'SELECT 1', client_id=2),
+            compile(b'req3', {'vars': [1, 2]}),
+            compile(b'req3', {'vars': [1, 2]}),
+        )
+        await asyncio.sleep(0.01)
+        # A cancelled caller must not affect the others waiting
+        # on the same compilation.
+        cancelled.cancel()
+
+        self.assertEqual(
+            await results,
+            [
+                (b'req1', 'SELECT 1'),
+                (b'req1', 'SELECT 1'),
+                (b'req2', 'SELECT 2'),
+                (b'req1', 'SELECT 1'),
+                (b'req3', {'vars': [1, 2]}),
+                (b'req3', {'vars': [1, 2]}),
+            ],
+        )
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(pool_._inflight_compiles, {})
+
+        await compile(b'req1', 'SELECT 1')
+        self.assertEqual(len(calls), 5)
+
+    async def test_server_compiler_pool_fair_queue(self):
+        q = queue.WorkerQueue(asyncio.get_running_loop())
+        order = []
+
+        async def acquire(label, priority, flow):
+            await q.acquire(priority=priority, flow=flow)
+            order.append(label)
+
+        tasks = [
+            asyncio.create_task(acquire(label, priority, flow))
+            for label, priority, flow in [
+                ('dump1', queue.Priority.INTROSPECTION, 'a'),
+                ('ddl1', queue.Priority.DDL, 'a'),
+                ('ddl2', queue.Priority.DDL, 'a'),
+                ('b1', queue.Priority.INTERACTIVE, 'b'),
+                ('b2', queue.Priority.INTERACTIVE, 'b'),
+                ('c1', queue.Priority.INTERACTIVE, 'c'),
+                ('gql1', queue.Priority.GRAPHQL, 'c'),
+            ]
+        ]
+        await asyncio.sleep(0)
+        self.assertEqual(q.count_waiters(), len(tasks))
+
+        # A cancelled waiter must not take the worker from the others
+        cancelled = asyncio.create_task(
+            acquire('cancelled', queue.Priority.INTERACTIVE, 'd'))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+
+        for _ in tasks:
+            q.release(object())
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(
+            order,
+            ['b1', 'c1', 'b2', 'gql1', 'ddl1', 'dump1', 'ddl2'],
+        )
+        self.assertEqual(q.count_waiters(), 0)
+        self.assertEqual(q.qsize(), 0)
+
+    def test_server_compiler_pool_affinity_ring(self):
+        branches = [f'branch{i}' for i in range(200)]
+        ring = queue.AffinityRing(range(4))
+
+        homes = {b: ring.get_candidates(b, 2) for b in branches}
+        for b, candidates in homes.items():
+            self.assertEqual(len(candidates), 2)
+            self.assertEqual(len(set(candidates)), 2)
+        # Every worker is the primary home of some branches
+        self.assertEqual({c[0] for c in homes.values()}, {0, 1, 2, 3})
+
+        # Removing a worker only moves the branches homed there
+        ring2 = queue.AffinityRing([0, 1, 2])
+        for b, candidates in homes.items():
+            if candidates[0] != 3:
+                self.assertEqual(ring2.get_candidates(b, 1)[0], candidates[0])
+
+        self.assertEqual(queue.AffinityRing([7]).get_candidates('a', 2), (7,))
+        self.assertEqual(queue.AffinityRing([]).get_candidates('a', 2), ())
+
+    def test_server_compiler_pool_affinity_bounded_load(self):
+        class FakeWorker:
+            def __init__(self, pid):
+                self._pid = pid
+                self._dbs = {}
+
+            def get_pid(self):
+                return self._pid
+
+        ring = queue.AffinityRing(range(4))
+        workers = [FakeWorker(pid) for pid in range(4)]
+        candidates = ring.get_candidates('hot', 2)
+        weighter = functools.partial(
+            pool.BaseLocalPool._affinity_weighter,
+            types.SimpleNamespace(_affinity_ring=ring),
+            'hot',
+            candidates,
+        )
+
+        # All the requests are for one branch, and all the workers are
+        # idle every time: the home worker of the branch would take all
+        # of them, if its load wasn't bounded.
+        served = collections.Counter()
+        for _ in range(400):
+            worker = max(workers, key=weighter)
+            worker._dbs['hot'] = None
+            ring.add_load(worker.get_pid())
+            served[worker.get_pid()] += 1
+
+        self.assertEqual(served.total(), 400)
+        self.assertGreater(len(served), 2)
+        fair_share = 400 / len(workers)
+        for pid in candidates:
+            self.assertLessEqual(
+                served[pid], pool.AFFINITY_LOAD_FACTOR * fair_share)
+
+    def test_server_compiler_pool_shared_schema_store(self):
+        schema_pickle = pickle.dumps(self._std_schema, -1)
+        live = [schema_pickle]
+
+        with tempfile.TemporaryDirectory() as td:
+            store = shared_schema.SharedSchemaStore(
+                runstate_dir=td,
+                min_size=1024,
+                get_live_pickles=lambda: live,
+            )
+            try:
+                small, release = store.acquire(b'small')
+                self.assertEqual(small, b'small')
+                release()
+
+                ref, release = store.acquire(schema_pickle)
+                self.assertIsInstance(ref, state.SharedSchemaRef)
+                self.assertEqual(ref.size, len(schema_pickle))
+                ref2, release2 = store.acquire(schema_pickle)
+                self.assertIs(ref, ref2)
+
+                loaded = shared_schema.load_user_schema(ref)
+                self.assertIs(shared_schema.load_user_schema(ref), loaded)
+                shared_schema.retain_user_schemas([])
+                self.assertIsNot(
+                    shared_schema.load_user_schema(ref), loaded)
+                release()
+                release2()
+
+                # A schema no longer used by any branch is unpublished
+                # once a new one is published...
+                new_pickle = pickle.dumps(self._refl_schema, -1)
+                live[:] = [new_pickle]
+                ref3, release3 = store.acquire(new_pickle)
+                self.assertFalse(os.path.exists(ref.path))
+                self.assertEqual(store.get_total_size(), len(new_pickle))
+
+                # ... or once the last request referring to it is done.
+                live.clear()
+                self.assertTrue(os.path.exists(ref3.path))
+                release3()
+                self.assertFalse(os.path.exists(ref3.path))
+                self.assertEqual(store.get_total_size(), 0)
+            finally:
+                store.close()
+            shared_schema.retain_user_schemas([])
+
+    def test_server_compiler_pool_shared_schema_stale_dirs(self):
+        proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+        proc.wait()
+
+        with tempfile.TemporaryDirectory() as td:
+            stale = os.path.join(td, f'gel-schema-{proc.pid}-abc')
+            alive = os.path.join(td, f'gel-schema-{os.getpid()}-abc')
+            other = os.path.join(td, 'gel-schema-abc')
+            for path in (stale, alive, other):
+                os.mkdir(path)
+
+            # Only the directories of dead servers are removed
+            shared_schema._remove_stale_dirs(td)
+            self.assertFalse(os.path.exists(stale))
+            self.assertTrue(os.path.exists(alive))
+            self.assertTrue(os.path.exists(other))
@@ -563,6 +563,145 @@ class TestServerOps(tb.TestCaseWithHttpClient, tb.CLITestCaseMixin):
             finally:
                 await cluster.stop()
 
+    async def test_server_ops_backend_replica(self):
+        # A streaming hot standby of the backend serves as a read replica,
+        # while the backend itself, which doesn't replicate anything, must
+        # not be used as one.
+        def routed(sd, backend):
+            total = 0.0
+            for k, v in tb.parse_metrics(sd.fetch_metrics()).items():
+                if (
+                    k.startswith('edgedb_server_backend_replica_routing_total')
+                    and f'backend="{backend}"' in k
+                ):
+                    total += v
+            return total
+
+        def available(sd, replica):
+            for k, v in tb.parse_metrics(sd.fetch_metrics()).items():
+                if (
+                    k.startswith('edgedb_server_backend_replica_available')
+                    and f'replica="{replica}"' in k
+                ):
+                    return v
+            return None
+
+        with tempfile.TemporaryDirectory() as td:
+            primary_dir = os.path.join(td, 'primary')
+            standby_dir = os.path.join(td, 'standby')
+            primary_dsn = f'postgres:///?user=postgres&host={primary_dir}'
+            standby_dsn = f'postgres:///?user=postgres&host={standby_dir}'
+
+            cluster = await pgcluster.get_local_pg_cluster(
+                primary_dir, log_level='s')
+            cluster.update_connection_params(
+                user='postgres',
+                database='template1',
+            )
+            self.assertTrue(await cluster.ensure_initialized())
+            await cluster.start()
+            standby = None
+            try:
+                pg_bin_dir = await pgcluster.get_pg_bin_dir()
+                proc = await asyncio.create_subprocess_exec(
+                    str(pg_bin_dir / 'pg_basebackup'),
+                    '-D', standby_dir, '-R',
+                    '-h', primary_dir, '-U', 'postgres',
+                    stdout=subprocess.DEVNULL,
+                )
+                self.assertEqual(await proc.wait(), 0)
+                standby = await pgcluster.get_local_pg_cluster(
+                    standby_dir, log_level='s')
+                await standby.start()
+
+                async with tb.start_edgedb_server(
+                    backend_dsn=primary_dsn,
+                    reset_auth=True,
+                    runstate_dir=None if devmode.is_in_dev_mode() else td,
+                    http_endpoint_security=(
+                        args.ServerEndpointSecurityMode.Optional),
+                    extra_args=[
+                        '--backend-replica-dsn', standby_dsn,
+                        '--backend-replica-dsn', primary_dsn,
+                    ],
+                ) as sd:
+                    con = await sd.connect()
+                    try:
+                        # Replicas are not used unless the session allows.
+                        self.assertEqual(await con.query_single('select 1'), 1)
+                        self.assertEqual(routed(sd, standby_dir), 0)
+
+                        await con.execute("""
+                            configure session set
+                                replica_max_staleness := <duration>'1 minute'
+                        """)
+                        async for tr in self.try_until_succeeds(
+                            ignore=AssertionError
+                        ):
+                            async with tr:
+                                self.assertEqual(
+                                    await con.query_single('select 2'), 2)
+                                self.assertGreater(
+                                    routed(sd, standby_dir), 0)
+                        self.assertEqual(routed(sd, primary_dir), 0)
+
+                        # Session settings are not available on the standby,
+                        # queries reading them run on the primary.
+                        self.assertEqual(
+                            await con.query_single("""
+                                select <str>assert_single(
+                                    cfg::Config.replica_max_staleness)
+                            """),
+                            'PT1M',
+                        )
+
+                        # Queries in transactions stay on the primary.
+                        before = routed(sd, standby_dir)
+                        async with con.transaction():
+                            await con.query_single('select 3')
+                        self.assertEqual(routed(sd, standby_dir), before)
+
+                        # So do the queries of sessions with settings that
+                        # are applied as Postgres settings.
+                        await con.execute("""
+                            configure session set
+                                query_execution_timeout := <duration>'1 hour'
+                        """)
+                        self.assertEqual(await con.query_single('select 4'), 4)
+                        self.assertEqual(routed(sd, standby_dir), before)
+
+                        # A standby that stopped streaming from the primary
+                        # cannot tell how far behind it is: it is no longer
+                        # considered available.
+                        self.assertEqual(available(sd, standby_dir), 1)
+                        standby.update_connection_params(
+                            user='postgres',
+                            database='template1',
+                        )
+                        pg_con = await standby.connect(
+                            source_description="test_server_ops",
+                            allow_hot_standby=True,
+                        )
+                        try:
+                            await pg_con.sql_execute(
+                                b"ALTER SYSTEM SET primary_conninfo = ''")
+                            await pg_con.sql_execute(
+                                b"SELECT pg_reload_conf()")
+                        finally:
+                            pg_con.terminate()
+                        async for tr in self.try_until_succeeds(
+                            ignore=AssertionError
+                        ):
+                            async with tr:
+                                self.assertEqual(
+                                    available(sd, standby_dir), 0)
+                    finally:
+                        await con.aclose()
+            finally:
+                if standby is not None:
+                    await standby.stop()
+                await cluster.stop()
+
     async def test_server_ops_postgres_multitenant(self):
         async def test(pgdata_path, tenant):
             async with tb.start_edgedb_server(
@@ -980,6 +1119,123 @@ class TestServerOps(tb.TestCaseWithHttpClient, tb.CLITestCaseMixin):
                 finally:
                     await con.aclose()
 
+    async def test_server_ops_shared_compile_cache(self):
+        def measure_compilations(
+            sd: tb._EdgeDBServerData, path: str
+        ) -> Callable[[], float | int]:
+            return lambda: tb.parse_metrics(sd.fetch_metrics()).get(
+                'edgedb_server_edgeql_query_compilations_total'
+                f'{{tenant="localtest",path="{path}"}}'
+            ) or 0
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            async with tb.start_edgedb_server(
+                data_dir=temp_dir,
+                default_auth_method=args.ServerAuthMethod.Trust,
+                net_worker_mode='disabled',
+            ) as sd:
+                compiled = measure_compilations(sd, 'compiler')
+                shared = measure_compilations(sd, 'shared_cache')
+
+                con = await sd.connect()
+                try:
+                    await con.execute('''
+                        create type Shared { create property n -> int64 }
+                    ''')
+                    await con.execute('create schema branch shared1 from main')
+                    await con.execute('create schema branch shared2 from main')
+                finally:
+                    await con.aclose()
+
+                con1 = await sd.connect(database='shared1')
+                con2 = await sd.connect(database='shared2')
+                try:
+                    qry = 'select Shared { n } filter .n = <int64>$0'
+
+                    # Branches with identical schemas share the compiled
+                    # queries
+                    with self.assertChange(compiled, 1):
+                        await con1.query(qry, 1)
+                    with self.assertChange(compiled, 0), \
+                            self.assertChange(shared, 1):
+                        await con2.query(qry, 1)
+
+                    # Not anymore once the schema of one of them changes
+                    await con2.execute('create type Other')
+                    qry = 'select Shared { n } filter .n > <int64>$0'
+                    with self.assertChange(compiled, 1):
+                        await con1.query(qry, 1)
+                    with self.assertChange(compiled, 1), \
+                            self.assertChange(shared, 0):
+                        await con2.query(qry, 1)
+                finally:
+                    await con1.aclose()
+                    await con2.aclose()
+
+    async def test_server_ops_hot_queries_precompile(self):
+        qry = 'select schema::Object { name } filter .name = <str>$0'
+
+        def measure_compilations(
+            sd: tb._EdgeDBServerData
+        ) -> Callable[[], float | int]:
+            return lambda: tb.parse_metrics(sd.fetch_metrics()).get(
+                'edgedb_server_edgeql_query_compilations_total'
+                '{tenant="localtest",path="compiler"}'
+            ) or 0
+
+        def query_cache_size(sd: tb._EdgeDBServerData) -> int:
+            info = sd.fetch_server_info()
+            return info['databases']['main']['query_cache_size']
+
+        with tempfile.TemporaryDirectory() as data_dir, \
+                tempfile.TemporaryDirectory() as runstate_dir:
+            server_args = dict(
+                data_dir=data_dir,
+                runstate_dir=runstate_dir,
+                default_auth_method=args.ServerAuthMethod.Trust,
+                net_worker_mode='disabled',
+                env={
+                    'GEL_SERVER_HOT_QUERIES_SAVE_INTERVAL': '0.5',
+                    # Make sure nothing comes from the persistent cache
+                    'EDGEDB_SERVER_CONFIG_cfg::query_cache_mode': 'InMemory',
+                },
+            )
+
+            async with tb.start_edgedb_server(**server_args) as sd:
+                con = await sd.connect()
+                try:
+                    for _ in range(3):
+                        await con.query(qry, 'std::str')
+                finally:
+                    await con.aclose()
+
+                # The manifest is saved while the server is running, so
+                # that it survives an unclean shutdown.
+                async for tr in self.try_until_succeeds(
+                    ignore=AssertionError,
+                ):
+                    async with tr:
+                        manifests = list(
+                            pathlib.Path(runstate_dir).glob('hot-queries-*'))
+                        self.assertEqual(len(manifests), 1)
+
+            async with tb.start_edgedb_server(**server_args) as sd:
+                con = await sd.connect()
+                try:
+                    # The hot queries are compiled in the background once
+                    # the branch is introspected ...
+                    async for tr in self.try_until_succeeds(
+                        ignore=AssertionError,
+                    ):
+                        async with tr:
+                            self.assertGreater(query_cache_size(sd), 0)
+
+                    # ... so the first run after the restart is a cache hit.
+                    with self.assertChange(measure_compilations(sd), 0):
+                        await con.query(qry, 'std::str')
+                finally:
+                    await con.aclose()
+
     async def test_server_ops_schema_metrics_01(self):
         def _extkey(extension: str) -> str:
             return (
@@ -54,6 +54,7 @@ import unittest.mock
 
 from edb.server import connpool
 from edb.server.connpool import pool as pool_impl
+from edb.server.connpool import prewarm
 from edb.tools.test import async_timeout
 
 # TIME_SCALE is used to run the simulation for longer time, the default is 1x.
@@ -1631,6 +1632,280 @@ class TestServerConnectionPool(unittest.TestCase):
 
         asyncio.run(main())
 
+    def test_connpool_pinned_conns(self):
+        async def fake_connect(dbname):
+            return FakeConnection(dbname)
+
+        @async_timeout(timeout=3)
+        async def test():
+            pool = pool_impl.Pool(
+                connect=fake_connect,
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=2,
+            )
+
+            conn1 = await pool.acquire('aaa')
+            conn2 = await pool.acquire('aaa')
+            self.assertTrue(pool.is_saturated('aaa'))
+            self.assertTrue(pool.is_saturated('bbb'))
+
+            pool.pin('aaa', conn1)
+            pool.pin('aaa', conn1)
+            self.assertTrue(pool.is_pinned('aaa', conn1))
+            self.assertFalse(pool.is_pinned('aaa', conn2))
+            self.assertEqual(pool.count_pinned_conns('aaa'), 1)
+            self.assertEqual(pool.count_conns('aaa'), 2)
+            self.assertEqual(
+                list(pool.iterate_pinned_connections()), [('aaa', conn1)])
+
+            pool.release('aaa', conn2)
+            self.assertFalse(pool.is_saturated('aaa'))
+            with self.assertRaises(RuntimeError):
+                pool.pin('aaa', conn2)
+
+            # Releasing a pinned connection unpins it.
+            pool.release('aaa', conn1)
+            self.assertFalse(pool.is_pinned('aaa', conn1))
+            self.assertEqual(pool.count_pinned_conns('aaa'), 0)
+            self.assertEqual(list(pool.iterate_pinned_connections()), [])
+
+            conn = await pool.acquire('aaa')
+            self.assertFalse(pool.is_pinned('aaa', conn))
+            pool.release('aaa', conn)
+
+        asyncio.run(test())
+
+    def test_connpool2_pinned_conns(self):
+        async def fake_connect(dbname):
+            return FakeConnection(dbname)
+
+        @async_timeout(timeout=3)
+        async def test():
+            pool = connpool.Pool2Impl(
+                connect=fake_connect,
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=2,
+            )
+            try:
+                self.assertFalse(pool.is_saturated('aaa'))
+
+                conn1 = await pool.acquire('aaa')
+                conn2 = await pool.acquire('aaa')
+                self.assertTrue(pool.is_saturated('aaa'))
+                self.assertTrue(pool.is_saturated('bbb'))
+
+                pool.pin('aaa', conn1)
+                self.assertTrue(pool.is_pinned('aaa', conn1))
+                self.assertFalse(pool.is_pinned('aaa', conn2))
+                self.assertEqual(pool.count_pinned_conns('aaa'), 1)
+
+                # The pool stays at its full capacity, but an idle
+                # connection can be handed out right away.
+                pool.release('aaa', conn2)
+                self.assertFalse(pool.is_saturated('aaa'))
+                self.assertTrue(pool.is_saturated('bbb'))
+
+                pool.release('aaa', conn1)
+                self.assertFalse(pool.is_pinned('aaa', conn1))
+                self.assertEqual(pool.count_pinned_conns('aaa'), 0)
+            finally:
+                await pool.close()
+
+        asyncio.run(test())
+
+    def test_connpool_prefer(self):
+        async def fake_connect(dbname):
+            return FakeConnection(dbname)
+
+        @async_timeout(timeout=3)
+        async def test():
+            pool = pool_impl.Pool(
+                connect=fake_connect,
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=10,
+            )
+
+            conns = [await pool.acquire('aaa') for _ in range(3)]
+            for conn in conns:
+                pool.release('aaa', conn)
+
+            # The preferred connection is picked, even if it's not the most
+            # recently used one.
+            conn = await pool.acquire('aaa', prefer=lambda c: c is conns[0])
+            self.assertIs(conn, conns[0])
+            pool.release('aaa', conn)
+
+            # Falls back to the most recently used connection.
+            conn = await pool.acquire('aaa', prefer=lambda c: False)
+            self.assertIs(conn, conns[0])
+            pool.release('aaa', conn)
+
+            # The best scoring connection is picked.
+            scores = {conns[0]: 1, conns[1]: 2, conns[2]: 1}
+            conn = await pool.acquire(
+                'aaa', prefer=lambda c: scores.get(c, 0))
+            self.assertIs(conn, conns[1])
+            pool.release('aaa', conn)
+
+            await pool.close()
+
+        asyncio.run(test())
+
+    @unittest.mock.patch('edb.server.connpool.config.MIN_WARM_CONNS', 2)
+    def test_connpool_prewarm(self):
+        async def fake_connect(dbname):
+            return FakeConnection(dbname)
+
+        @async_timeout(timeout=3)
+        async def test():
+            pool = pool_impl.Pool(
+                connect=fake_connect,
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=10,
+                min_idle_time_before_gc=0.01,
+                prewarm_interval=0.1,
+            )
+
+            conns = [await pool.acquire('aaa') for _ in range(4)]
+            await asyncio.sleep(0.15)
+            for conn in conns:
+                pool.release('aaa', conn)
+
+            # The recent demand keeps the connections from GC...
+            await asyncio.sleep(0.02)
+            self.assertEqual(pool.count_conns('aaa'), 4)
+
+            # ... until it goes down to the minimum warm floor.
+            await asyncio.sleep(1)
+            self.assertEqual(pool.count_conns('aaa'), 2)
+
+            await pool.close()
+
+        asyncio.run(test())
+
+    # Always predict enough demand to warm up any branch seen before.
+    @unittest.mock.patch.object(
+        prewarm.DemandHistory, 'predict', lambda self, timestamp: 4)
+    def test_connpool_prewarm_pruned(self):
+        async def fake_connect(dbname):
+            return FakeConnection(dbname)
+
+        @async_timeout(timeout=3)
+        async def test():
+            pool = pool_impl.Pool(
+                connect=fake_connect,
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=10,
+                min_idle_time_before_gc=0.01,
+                prewarm_interval=0.1,
+            )
+
+            conns = [await pool.acquire('aaa') for _ in range(4)]
+            await asyncio.sleep(0.15)
+            for conn in conns:
+                pool.release('aaa', conn)
+
+            # A pruned branch (e.g. one being dropped) is not pre-warmed
+            # again, despite its recent demand.
+            await pool.prune_inactive_connections('aaa')
+            self.assertEqual(pool.count_conns('aaa'), 0)
+            # Keep the pool busy, so that the empty block gets dropped.
+            conn = await pool.acquire('bbb')
+            await asyncio.sleep(0.5)
+            pool.release('bbb', conn)
+            self.assertEqual(pool.count_conns('aaa'), 0)
+            self.assertNotIn('aaa', pool._demand_history)
+
+            await pool.close()
+
+        asyncio.run(test())
+
+    def test_connpool_prewarm_quiet_period(self):
+        async def fake_connect(dbname):
+            return FakeConnection(dbname)
+
+        demand = 0
+
+        def predict(history, timestamp):
+            return demand
+
+        @async_timeout(timeout=3)
+        async def test():
+            nonlocal demand
+            pool = pool_impl.Pool(
+                connect=fake_connect,
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=10,
+                min_idle_time_before_gc=0.01,
+                prewarm_interval=0.1,
+            )
+
+            conns = [await pool.acquire('aaa') for _ in range(3)]
+            await asyncio.sleep(0.15)
+            for conn in conns:
+                pool.release('aaa', conn)
+
+            # Quiet period: the idle connections of the branch are closed
+            # and its block is dropped, but its demand history is kept.
+            # Another branch stays busy, so that the empty block is dropped.
+            for _ in range(10):
+                conn = await pool.acquire('bbb')
+                await asyncio.sleep(0.05)
+                pool.release('bbb', conn)
+            self.assertNotIn('aaa', pool._blocks)
+            self.assertIn('aaa', pool._demand_history)
+
+            # The next peak is expected: the branch is warmed up again
+            # before anything is acquired from it.
+            demand = 3
+            await asyncio.sleep(0.25)
+            self.assertIn('aaa', pool._blocks)
+            self.assertEqual(pool.count_conns('aaa'), 3)
+
+            await pool.close()
+
+        with unittest.mock.patch.object(
+            prewarm.DemandHistory, 'predict', predict
+        ):
+            asyncio.run(test())
+
+
+class TestServerConnpoolPrewarm(unittest.TestCase):
+
+    def test_connpool_demand_history_trend(self):
+        h = prewarm.DemandHistory(interval=60)
+        self.assertEqual(h.predict(timestamp=0), 0)
+        self.assertTrue(h.is_idle())
+
+        for i, peak in enumerate([1, 2, 3, 4, 5], 1):
+            h.add(peak, timestamp=i * 60)
+        self.assertEqual(h.predict(timestamp=360), 6)
+
+        for i, peak in enumerate([4, 3, 2, 1, 0], 6):
+            h.add(peak, timestamp=i * 60)
+        self.assertEqual(h.predict(timestamp=660), 0)
+
+    def test_connpool_demand_history_daily(self):
+        day = prewarm.SECONDS_PER_DAY
+        h = prewarm.DemandHistory(interval=60, trend_history=2)
+
+        # A spike at 9:00 yesterday...
+        h.add(10, timestamp=9 * 3600 + 60)
+        for i in range(2, 10):
+            h.add(0, timestamp=9 * 3600 + i * 60)
+        self.assertEqual(h.predict(timestamp=12 * 3600), 0)
+        self.assertFalse(h.is_idle())
+
+        # ... is expected at 9:00 today.
+        self.assertEqual(h.predict(timestamp=day + 9 * 3600), 10)
+        self.assertEqual(h.predict(timestamp=day + 9 * 3600 + 60), 0)
+
+        # Quiet days make it forgotten.
+        for d in range(1, 6):
+            h.add(0, timestamp=d * day + 9 * 3600 + 60)
+        self.assertEqual(h.predict(timestamp=6 * day + 9 * 3600), 0)
+        self.assertTrue(h.is_idle())
+
 
 HTML_TPL = R'''<!DOCTYPE html>
 <html>
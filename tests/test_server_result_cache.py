@@ -0,0 +1,197 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import json
+import unittest
+
+from edb.server import cache
+from edb.testbase import server as tb
+
+
+class TestResultCache(unittest.TestCase):
+
+    def _store(self, c, key, data, tables, *, cost=1.0, generation=None):
+        c.store(
+            key,
+            data,
+            key_size=0,
+            tables=frozenset(tables),
+            cost=cost,
+            generation=c.generation if generation is None else generation,
+        )
+
+    def test_server_result_cache_invalidate(self):
+        c = cache.ResultCache(maxbytes=100_000)
+
+        self._store(c, 'users', b'u', {'User'})
+        self._store(c, 'posts', b'p', {'Post', 'User'})
+        self._store(c, 'tags', b't', {'Tag'})
+        self._store(c, 'empty', b'', ())
+        self.assertEqual(c.get('users'), b'u')
+        self.assertEqual(c.get('empty'), b'')
+
+        c.invalidate(['User'])
+        self.assertIsNone(c.get('users'))
+        self.assertIsNone(c.get('posts'))
+        self.assertEqual(c.get('tags'), b't')
+        self.assertEqual(c.get('empty'), b'')
+
+        c.invalidate(None)
+        self.assertEqual(len(c), 0)
+        self.assertEqual(c.nbytes, 0)
+
+    def test_server_result_cache_generation(self):
+        c = cache.ResultCache(maxbytes=100_000)
+
+        # A write committed while the query was running
+        generation = c.generation
+        c.invalidate(['Unrelated'])
+        self._store(c, 'users', b'u', {'User'}, generation=generation)
+        self.assertIsNone(c.get('users'))
+
+        self._store(c, 'users', b'u', {'User'})
+        self.assertEqual(c.get('users'), b'u')
+
+    def test_server_result_cache_maxbytes(self):
+        c = cache.ResultCache(maxbytes=10_000)
+
+        # Too big for the cache
+        self._store(c, 'huge', b'x' * 5000, {'User'})
+        self.assertIsNone(c.get('huge'))
+
+        for i in range(100):
+            self._store(c, i, b'x' * 1000, {'User'})
+        self.assertLessEqual(c.nbytes, 10_000)
+        self.assertGreater(len(c), 0)
+
+        # Evicted entries are not left behind in the table index.
+        c.invalidate(['User'])
+        self.assertEqual(len(c), 0)
+        self.assertEqual(c._by_table, {})
+
+    def test_server_result_cache_replace(self):
+        c = cache.ResultCache(maxbytes=100_000)
+
+        self._store(c, 'q', b'1', {'User'})
+        self._store(c, 'q', b'2', {'Post'})
+        self.assertEqual(c.get('q'), b'2')
+
+        c.invalidate(['User'])
+        self.assertEqual(c.get('q'), b'2')
+        c.invalidate(['Post'])
+        self.assertIsNone(c.get('q'))
+
+
+class TestResultCacheServer(tb.TestCase):
+
+    async def test_server_result_cache_invalidation(self):
+        # The results of a query must not be served from the cache after
+        # a write to any table it reads, be it directly, through a link
+        # or through an access policy.
+        def hits(sd):
+            return sum(
+                v for k, v in tb.parse_metrics(sd.fetch_metrics()).items()
+                if k.startswith(
+                    'edgedb_server_query_result_cache_lookups_total')
+                and 'path="cache"' in k
+            )
+
+        async with tb.start_edgedb_server(
+            env={
+                'EDGEDB_SERVER_CONFIG_cfg::query_result_cache_max_memory':
+                    '10MiB',
+            },
+        ) as sd:
+            con = await sd.connect()
+            try:
+                await con.execute("""
+                    create type User {
+                        create required property name -> str;
+                        create property active -> bool;
+                    };
+                    create type Post {
+                        create required property body -> str;
+                        create link author -> User;
+                    };
+                    create type Secret {
+                        create required property val -> str;
+                        create link owner -> User;
+                        create access policy ins
+                            allow insert, update, delete;
+                        create access policy sel
+                            allow select using (.owner.active ?? false);
+                    };
+                    insert User { name := 'alice', active := true };
+                    insert Post {
+                        body := 'hello',
+                        author := (select User filter .name = 'alice'),
+                    };
+                    insert Secret {
+                        val := 'x',
+                        owner := (select User filter .name = 'alice'),
+                    };
+                """)
+
+                async def check(query, expected):
+                    before = hits(sd)
+                    # Twice, so that the second result comes from the cache.
+                    for _ in range(2):
+                        self.assertEqual(
+                            json.loads(await con.query_json(query)), expected)
+                    self.assertGreater(hits(sd), before)
+
+                users = 'select User.name order by User.name'
+                posts = 'select Post { body, author_name := .author.name }'
+                secrets = 'select count(Secret)'
+
+                await check(users, ['alice'])
+                await check(posts, [{'body': 'hello', 'author_name': 'alice'}])
+                await check(secrets, [1])
+
+                # INSERT into the same table
+                await con.execute("insert User { name := 'bob' }")
+                await check(users, ['alice', 'bob'])
+
+                # UPDATE of the same table
+                await con.execute("""
+                    update User filter .name = 'bob' set { name := 'carol' }
+                """)
+                await check(users, ['alice', 'carol'])
+
+                # UPDATE of a table read through a link
+                await con.execute("""
+                    update User filter .name = 'alice' set { name := 'dave' }
+                """)
+                await check(posts, [{'body': 'hello', 'author_name': 'dave'}])
+
+                # UPDATE of a table read by an access policy
+                await con.execute("""
+                    update User filter .name = 'dave' set { active := false }
+                """)
+                await check(secrets, [0])
+
+                # The same, within an explicit transaction
+                async with con.transaction():
+                    await con.execute("""
+                        update User filter .name = 'dave'
+                        set { active := true }
+                    """)
+                await check(secrets, [1])
+            finally:
+                await con.aclose()
@@ -0,0 +1,149 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import unittest
+
+from edb.server import cache
+
+
+def _weigher(value):
+    # Values in these tests are (size, cost) tuples themselves
+    return value
+
+
+class TestCostAwareStatementsCache(unittest.TestCase):
+
+    def _evict_all(self, c):
+        evicted = []
+        while c.needs_cleanup():
+            evicted.append(c.cleanup_one()[0])
+        return evicted
+
+    def test_server_stmt_cache_maxsize(self):
+        c = cache.CostAwareStatementsCache(maxsize=2, weigher=_weigher)
+
+        c['a'] = (10, 1.0)
+        c['b'] = (10, 1.0)
+        self.assertFalse(c.needs_cleanup())
+
+        # Make 'a' more frequently used than 'b'
+        self.assertEqual(c.get('a', None), (10, 1.0))
+        c['c'] = (10, 1.0)
+
+        self.assertEqual(self._evict_all(c), ['b'])
+        self.assertEqual(set(c), {'a', 'c'})
+
+    def test_server_stmt_cache_cost_and_size(self):
+        c = cache.CostAwareStatementsCache(maxsize=10, weigher=_weigher)
+
+        c['cheap'] = (10, 0.001)
+        c['expensive'] = (10, 1.0)
+        c['huge'] = (10000, 1.0)
+        c['small'] = (1, 1.0)
+
+        c.resize(2)
+        self.assertEqual(self._evict_all(c), ['cheap', 'huge'])
+        self.assertEqual(set(c), {'expensive', 'small'})
+
+    def test_server_stmt_cache_maxbytes(self):
+        c = cache.CostAwareStatementsCache(
+            maxsize=100, maxbytes=100, weigher=_weigher)
+
+        c['hot'] = (30, 1.0)
+        for _ in range(10):
+            c.get('hot', None)
+        c['one-off'] = (60, 1.0)
+        self.assertEqual(c.nbytes, 90)
+        self.assertFalse(c.needs_cleanup())
+
+        c['new'] = (30, 1.0)
+        self.assertEqual(c.nbytes, 120)
+        self.assertEqual(self._evict_all(c), ['one-off'])
+        self.assertEqual(c.nbytes, 60)
+
+    def test_server_stmt_cache_aging(self):
+        c = cache.CostAwareStatementsCache(maxsize=1, weigher=_weigher)
+
+        c['old'] = (1, 1.0)
+        for _ in range(3):
+            c.get('old', None)
+        c['new'] = (1, 1.0)
+        # 'old' is still more valuable than a newcomer
+        self.assertEqual(self._evict_all(c), ['new'])
+
+        # ... but evictions inflate the priority of new entries,
+        # so an entry that is no longer used eventually ages out.
+        for _ in range(5):
+            c['new'] = (1, 1.0)
+            self._evict_all(c)
+        self.assertEqual(set(c), {'new'})
+
+    def test_server_stmt_cache_mapping(self):
+        c = cache.CostAwareStatementsCache(
+            maxsize=10, maxbytes=1000, weigher=_weigher)
+
+        c['a'] = (10, 1.0)
+        c['b'] = (20, 1.0)
+        c['c'] = (30, 1.0)
+        c['a'] = (40, 1.0)
+        self.assertEqual(c.nbytes, 90)
+        self.assertEqual(len(c), 3)
+
+        # items() are in the LRU order
+        self.assertEqual(
+            [k for k, _ in c.items()],
+            ['b', 'c', 'a'],
+        )
+        c['b']
+        self.assertEqual(
+            [k for k, _ in reversed(c.items())],
+            ['b', 'a', 'c'],
+        )
+
+        self.assertEqual(c.pop('c'), (30, 1.0))
+        self.assertIsNone(c.pop('c', None))
+        with self.assertRaises(KeyError):
+            c.pop('c')
+        del c['b']
+        self.assertEqual(c.nbytes, 40)
+        self.assertNotIn('b', c)
+        self.assertIn('a', c)
+
+        c.clear()
+        self.assertEqual(len(c), 0)
+        self.assertEqual(c.nbytes, 0)
+        self.assertFalse(c.needs_cleanup())
+        with self.assertRaises(KeyError):
+            c.cleanup_one()
+
+    def test_server_stmt_cache_most_used(self):
+        c = cache.CostAwareStatementsCache(maxsize=10, weigher=_weigher)
+
+        c['a'] = (10, 1.0)
+        c['b'] = (10, 1.0)
+        c['c'] = (10, 1.0)
+        for _ in range(3):
+            c.get('b', None)
+        c.get('c', None)
+
+        self.assertEqual(
+            [k for k, _ in c.most_used(10)],
+            ['b', 'c', 'a'],
+        )
+        self.assertEqual(c.most_used(1), [('b', (10, 1.0))])